@@ -86,6 +86,42 @@ class DatabaseConfig:
 @dataclass()
 class WorkerConfig:
     keep_sandbox: bool = False
+    # Whether to reuse sandboxes among the jobs of a job group.
+    reuse_sandboxes: bool = True
+    # Whether to reuse the executables of a previous compilation of the
+    # same sources and managers, and how many compilations to remember.
+    compilation_cache: bool = True
+    compilation_cache_size: int = 1000
+
+
+@dataclass()
+class EvaluationServiceConfig:
+    # Share of the workers given to each contest (by name) when several
+    # have operations with the same priority; the default is 1.
+    contest_weights: dict[str, float] = dataclasses.field(
+        default_factory=dict)
+    # Whether to send a busy worker the operations to execute after
+    # its current ones, so that it prefetches their files meanwhile.
+    worker_look_ahead: bool = True
+
+    def __post_init__(self):
+        for name, weight in self.contest_weights.items():
+            if weight <= 0:
+                raise ConfigError(
+                    f"Weight of contest {name} must be positive")
+
+
+@dataclass()
+class FileCacherConfig:
+    # Where files are persistently stored: "database" (as large objects
+    # in PostgreSQL) or "filesystem" (in a sharded directory tree).
+    backend: str = "database"
+    # Root directory of the "filesystem" backend; None means a "files"
+    # subdirectory of data_dir.
+    backend_path: str | None = None
+    # Soft limit on the size of the local file cache, in MiB. None means
+    # that the cache is allowed to grow without bounds.
+    cache_max_size_mib: int | None = None
 
 
 @dataclass()
@@ -101,6 +137,9 @@ class SandboxConfig:
     trusted_sandbox_max_processes: int = 1000
     trusted_sandbox_max_time_s: float = 10.0
     trusted_sandbox_max_memory_kib: int = 4 * 1024 * 1024  # 4 GiB
+    # Whether to put read-only files in the sandbox as links to the
+    # local cache instead of copies.
+    link_cached_files: bool = False
 
 
 @dataclass()
@@ -229,6 +268,9 @@ class Config:
     global_: GlobalConfig = field_helper(GlobalConfig)
     database: DatabaseConfig
     worker: WorkerConfig = field_helper(WorkerConfig)
+    evaluation_service: EvaluationServiceConfig = \
+        field_helper(EvaluationServiceConfig)
+    file_cacher: FileCacherConfig = field_helper(FileCacherConfig)
     sandbox: SandboxConfig = field_helper(SandboxConfig)
     web_server: WebServerConfig = field_helper(WebServerConfig)
     contest_web_server: CWSConfig = field_helper(CWSConfig)
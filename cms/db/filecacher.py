@@ -30,16 +30,19 @@ import atexit
 import io
 import logging
 import os
+import re
 import tempfile
 import fcntl
 from abc import ABCMeta, abstractmethod
 import typing
+from collections.abc import Iterable, Iterator
 
 import gevent
 from sqlalchemy.exc import IntegrityError
 
-from cms import config, mkdir, rmtree
-from cms.db import SessionGen, Digest, FSObject, LargeObject
+from cms import ConfigError, config, mkdir, rmtree
+from cms.db import SessionGen, Digest, FSObject, LargeObject, \
+    custom_psycopg2_connection
 from cms.db.session import Session
 from cmscommon.digest import Digester
 if typing.TYPE_CHECKING:
@@ -49,6 +52,10 @@ if typing.TYPE_CHECKING:
 logger = logging.getLogger(__name__)
 
 
+# The ioctl request to clone a file's data (see ioctl_ficlone(2)).
+FICLONE = 0x40049409
+
+
 def copyfileobj(source_fobj: typing.IO, destination_fobj: typing.IO,
                 buffer_size: int = io.DEFAULT_BUFFER_SIZE):
     """Read all content from one file object and write it to another.
@@ -76,6 +83,39 @@ def copyfileobj(source_fobj: typing.IO, destination_fobj: typing.IO,
         gevent.sleep(0)
 
 
+def sendfile(source_fobj: typing.IO[bytes], destination_fobj: typing.IO[bytes],
+             buffer_size: int = io.DEFAULT_BUFFER_SIZE) -> bool:
+    """Copy all content from one real file to another in the kernel.
+
+    Like copyfileobj, but the data is copied with os.sendfile, without
+    going through user space. This only works if both file objects are
+    backed by actual file descriptors.
+
+    source_fobj: a binary file object open for reading.
+    destination_fobj: a binary file object open for writing.
+    buffer_size: the maximum amount of data to copy at once.
+
+    return: True if the content was copied, False if the file objects
+        don't support it (and nothing was copied).
+
+    """
+    try:
+        source_fd = source_fobj.fileno()
+        destination_fd = destination_fobj.fileno()
+    except (AttributeError, OSError):
+        return False
+    destination_fobj.flush()
+    offset = source_fobj.tell()
+    while True:
+        sent = os.sendfile(destination_fd, source_fd, offset, buffer_size)
+        if sent == 0:
+            break
+        offset += sent
+        gevent.sleep(0)
+    source_fobj.seek(offset)
+    return True
+
+
 class TombstoneError(RuntimeError):
     """An error that represents the file cacher trying to read
     files that have been deleted from the database.
@@ -103,6 +143,31 @@ class FileCacherBackend(metaclass=ABCMeta):
         """
         pass
 
+    def get_files(
+        self, digests: Iterable[str]
+    ) -> Iterator[tuple[str, typing.IO[bytes]]]:
+        """Retrieve many files from the storage.
+
+        Backends that can fetch many files more efficiently than one
+        at a time should override this method.
+
+        digests: the digests of the files to retrieve.
+
+        return: an iterator yielding, for each file that can be found,
+            a pair of its digest and a readable binary file-like object
+            from which to read its contents. Files that cannot be found
+            are skipped. Each file object must be consumed before
+            advancing the iterator, which takes care of closing it.
+
+        """
+        for digest in digests:
+            try:
+                fobj = self.get_file(digest)
+            except KeyError:
+                continue
+            with fobj:
+                yield digest, fobj
+
     @abstractmethod
     def create_file(self, digest: str) -> typing.IO[bytes] | None:
         """Create an empty file that will live in the storage.
@@ -304,6 +369,144 @@ class FSBackend(FileCacherBackend):
         return list((x, "") for x in os.listdir(self.path))
 
 
+class ShardedFSBackend(FileCacherBackend):
+    """This class implements a backend for FileCacher that keeps the
+    files in a file system directory tree, sharded by the first
+    characters of their digest (e.g., 'ROOT/ab/cd/abcdef...'), so that
+    no directory grows too large. The directory can be shared among
+    machines (for example with NFS or a mounted object store), acting
+    as the actual persistent storage instead of the database.
+
+    Files are written to a temporary directory under the root and
+    hard-linked into place when committed, so that readers never see a
+    partial file and concurrent commits of the same digest are safe.
+    Descriptions are stored in a '.desc' file next to each file.
+
+    """
+
+    TEMP_DIR = ".tmp"
+    DESCRIPTION_SUFFIX = ".desc"
+
+    def __init__(self, path: str):
+        """Initialize the backend.
+
+        path: the base path for the storage.
+
+        """
+        self.path = path
+        self.temp_path = os.path.join(self.path, self.TEMP_DIR)
+        os.makedirs(self.temp_path, exist_ok=True)
+
+    def _file_path(self, digest: str) -> str:
+        """Return the path where the file with the given digest is."""
+        return os.path.join(self.path, digest[0:2], digest[2:4], digest)
+
+    def get_file(self, digest):
+        """See FileCacherBackend.get_file().
+
+        """
+        try:
+            return open(self._file_path(digest), 'rb')
+        except FileNotFoundError:
+            raise KeyError("File not found.")
+
+    def create_file(self, digest):
+        """See FileCacherBackend.create_file().
+
+        """
+        if os.path.exists(self._file_path(digest)):
+            return None
+
+        return tempfile.NamedTemporaryFile('wb', delete=False,
+                                           prefix=digest,
+                                           dir=self.temp_path)
+
+    def commit_file(self, fobj, digest, desc=""):
+        """See FileCacherBackend.commit_file().
+
+        """
+        fobj.flush()
+        os.fsync(fobj.fileno())
+        fobj.close()
+
+        file_path = self._file_path(digest)
+        try:
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            with tempfile.NamedTemporaryFile(
+                    'w', encoding="utf-8", delete=False,
+                    prefix=digest, dir=self.temp_path) as desc_fobj:
+                desc_fobj.write(desc)
+            os.replace(desc_fobj.name,
+                       file_path + self.DESCRIPTION_SUFFIX)
+            # Unlike rename, link fails if the destination exists, so
+            # only the first of many concurrent commits succeeds.
+            os.link(fobj.name, file_path)
+        except FileExistsError:
+            return False
+        finally:
+            os.unlink(fobj.name)
+        return True
+
+    def describe(self, digest):
+        """See FileCacherBackend.describe().
+
+        """
+        file_path = self._file_path(digest)
+        if not os.path.exists(file_path):
+            raise KeyError("File not found.")
+
+        try:
+            with open(file_path + self.DESCRIPTION_SUFFIX,
+                      encoding="utf-8") as desc_fobj:
+                return desc_fobj.read()
+        except FileNotFoundError:
+            return ""
+
+    def get_size(self, digest):
+        """See FileCacherBackend.get_size().
+
+        """
+        try:
+            return os.stat(self._file_path(digest)).st_size
+        except FileNotFoundError:
+            raise KeyError("File not found.")
+
+    def delete(self, digest):
+        """See FileCacherBackend.delete().
+
+        """
+        file_path = self._file_path(digest)
+        for path in (file_path, file_path + self.DESCRIPTION_SUFFIX):
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+    def list(self):
+        """See FileCacherBackend.list().
+
+        """
+        res = []
+        for first in sorted(os.listdir(self.path)):
+            first_path = os.path.join(self.path, first)
+            # Stray files are not shards, and neither is the temp dir.
+            if first == self.TEMP_DIR or not os.path.isdir(first_path):
+                continue
+            for second in sorted(os.listdir(first_path)):
+                shard_path = os.path.join(first_path, second)
+                if not os.path.isdir(shard_path):
+                    continue
+                for name in sorted(os.listdir(shard_path)):
+                    if name.endswith(self.DESCRIPTION_SUFFIX):
+                        continue
+                    try:
+                        res.append((name, self.describe(name)))
+                    except KeyError:
+                        # Deleted in the meantime.
+                        pass
+        return res
+
+
 class DBBackend(FileCacherBackend):
     """This class implements an actual backend for FileCacher that
     stores the files as lobjects (encapsuled in a FSObject) into a
@@ -323,6 +526,30 @@ class DBBackend(FileCacherBackend):
 
             return fso.get_lobject(mode='rb')
 
+    def get_files(self, digests):
+        """See FileCacherBackend.get_files().
+
+        All the FSObjects are looked up with a single query, and all the
+        large objects are then read sequentially over the same
+        connection.
+
+        """
+        digests = list(digests)
+        if len(digests) == 0:
+            return
+
+        with SessionGen() as session:
+            loids = session.query(FSObject.digest, FSObject.loid)\
+                .filter(FSObject.digest.in_(digests)).all()
+
+        conn = custom_psycopg2_connection()
+        try:
+            for digest, loid in loids:
+                with LargeObject(loid, mode='rb', conn=conn) as fobj:
+                    yield digest, fobj
+        finally:
+            conn.close()
+
     def create_file(self, digest):
         """See FileCacherBackend.create_file().
 
@@ -348,12 +575,15 @@ class DBBackend(FileCacherBackend):
         """See FileCacherBackend.commit_file().
 
         """
+        # We only ever write sequentially, so the position is the size.
+        size = fobj.tell()
         fobj.close()
         try:
             with SessionGen() as session:
                 fso = FSObject(description=desc)
                 fso.digest = digest
                 fso.loid = fobj.loid
+                fso.size = size
 
                 session.add(fso)
 
@@ -391,16 +621,20 @@ class DBBackend(FileCacherBackend):
         """See FileCacherBackend.get_size().
 
         """
-        # TODO - The business logic may be moved in FSObject, for
-        # better generality
         with SessionGen() as session:
             fso = FSObject.get_from_digest(digest, session)
 
             if fso is None:
                 raise KeyError("File not found.")
 
-            with fso.get_lobject(mode='rb') as lobj:
-                return lobj.seek(0, io.SEEK_END)
+            # Files stored before sizes were recorded: compute it once
+            # from the large object and remember it.
+            if fso.size is None:
+                with fso.get_lobject(mode='rb') as lobj:
+                    fso.size = lobj.seek(0, io.SEEK_END)
+                session.commit()
+
+            return fso.size
 
     def delete(self, digest):
         """See FileCacherBackend.delete().
@@ -490,21 +724,34 @@ class FileCacher:
     # CHUNK_SIZE should be a multiple of these values.
     # Note that a too-small value can cause issues on high-latency networks.
     CHUNK_SIZE = 1024 * 1024  # 1 MiB
+    # When the size of the local cache exceeds its limit, files are
+    # evicted until it drops below this fraction of the limit, so that
+    # evictions are done in batches rather than at every new file.
+    EVICTION_TARGET_RATIO = 0.9
+    # Cached files are named after their digest; everything else in the
+    # cache directory (lock files, temporary directories) is ignored by
+    # the eviction.
+    CACHED_FILE_NAME_RE = re.compile(r"^[0-9a-f]{40}$")
+    # The permissions of the cached files, set once when they are
+    # cached: they may be hard-linked in sandboxes, which then must not
+    # change them, and need to be readable by their users.
+    CACHED_FILE_MODE = 0o644
     backend: FileCacherBackend
 
     def __init__(self, service: "Service | None" = None, path: str | None = None, null: bool = False):
         """Initialize.
 
-        By default the database-powered backend will be used, but this
-        can be changed using the parameters.
+        By default the backend chosen in the configuration (usually the
+        database-powered one) will be used, but this can be changed
+        using the parameters.
 
         service: the service we are running for. Only
             used if present to determine the location of the
             file-system cache (and to provide the shard number to the
             Sandbox... sigh!).
         path: if specified, back the FileCacher with a
-            file system-based storage instead of the default
-            database-based one. The specified directory will be used
+            file system-based storage instead of the one given in the
+            configuration. The specified directory will be used
             as root for the storage and it will be created if it
             doesn't exist.
         null: if True, back the FileCacher with a NullBackend,
@@ -516,10 +763,18 @@ class FileCacher:
 
         if null:
             self.backend = NullBackend()
-        elif path is None:
+        elif path is not None:
+            self.backend = FSBackend(path)
+        elif config.file_cacher.backend == "database":
             self.backend = DBBackend()
+        elif config.file_cacher.backend == "filesystem":
+            backend_path = config.file_cacher.backend_path
+            if backend_path is None:
+                backend_path = os.path.join(config.global_.data_dir, "files")
+            self.backend = ShardedFSBackend(backend_path)
         else:
-            self.backend = FSBackend(path)
+            raise ConfigError("Unknown file cacher backend `%s'."
+                              % config.file_cacher.backend)
 
         # First we create the config directories.
         self._create_directory_or_die(config.global_.temp_dir)
@@ -541,6 +796,21 @@ class FileCacher:
         # Just to make sure it was created.
         self._create_directory_or_die(self.file_dir)
 
+        # Maximum size of the local cache in bytes (None if unbounded),
+        # and our estimate of its current size (None if not computed
+        # yet). The estimate only accounts for the files added by this
+        # object since the last scan of the cache directory, hence it
+        # can be lower than the real size if the cache is shared.
+        max_size_mib = config.file_cacher.cache_max_size_mib
+        self.max_cache_size: int | None = \
+            max_size_mib * 1024 * 1024 if max_size_mib is not None else None
+        self._cache_size: int | None = None
+
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._evicted_bytes = 0
+
     def is_shared(self):
         """Return whether the cache directory is shared with other services."""
         return self.service is not None
@@ -598,22 +868,47 @@ class FileCacher:
 
         if cache_only:
             if os.path.exists(cache_file_path):
+                self._hits += 1
+                self._touch(cache_file_path)
                 return
         else:
             try:
-                return open(cache_file_path, 'rb')
+                fd = open(cache_file_path, 'rb')
             except FileNotFoundError:
                 pass
+            else:
+                self._hits += 1
+                self._touch(cache_file_path)
+                return fd
 
+        self._misses += 1
         logger.debug("File %s not in cache, downloading "
                      "from database.", digest)
 
+        with self.backend.get_file(digest) as fobj:
+            return self._store_in_cache(digest, fobj, cache_only)
+
+    def _store_in_cache(
+        self, digest: str, fobj: typing.IO[bytes], cache_only: bool
+    ) -> typing.IO[bytes] | None:
+        """Copy a file coming from the backend into the cache.
+
+        digest: the digest of the file.
+        fobj: a readable binary file-like object with the contents of
+            the file.
+        cache_only: don't open the file for reading.
+
+        return: a readable binary file-like object from which to read the
+            contents of the file, or None if cache_only is True.
+
+        """
         ftmp_handle, temp_file_path = tempfile.mkstemp(dir=self.temp_dir,
                                                        text=False)
-        with open(ftmp_handle, 'wb') as ftmp, \
-                self.backend.get_file(digest) as fobj:
-            copyfileobj(fobj, ftmp, self.CHUNK_SIZE)
+        with open(ftmp_handle, 'wb') as ftmp:
+            if not sendfile(fobj, ftmp, self.CHUNK_SIZE):
+                copyfileobj(fobj, ftmp, self.CHUNK_SIZE)
 
+        cache_file_path = os.path.join(self.file_dir, digest)
         if not cache_only:
             # We allow anyone to delete files from the cache directory
             # self.file_dir at any time. Hence, cache_file_path might no
@@ -624,9 +919,12 @@ class FileCacher:
 
         # Then move it to its real location (this operation is atomic
         # by POSIX requirement)
+        size = os.stat(temp_file_path).st_size
+        os.chmod(temp_file_path, FileCacher.CACHED_FILE_MODE)
         os.rename(temp_file_path, cache_file_path)
 
         logger.debug("File %s downloaded.", digest)
+        self._account(size)
 
         if not cache_only:
             return fd
@@ -651,6 +949,84 @@ class FileCacher:
 
         self._load(digest, True)
 
+    def cache_files(self, digests: Iterable[str], parallelism: int = 1) \
+            -> set[str]:
+        """Load many files into the cache.
+
+        Like cache_file, but the files that are not cached yet are
+        requested to the backend all together, which is much faster
+        than doing it one by one (see FileCacherBackend.get_files()).
+        The tombstone is silently ignored.
+
+        digests: the digests of the files to get.
+        parallelism: the number of concurrent requests to split the
+            download into.
+
+        return: the digests of the files that cannot be found.
+
+        """
+        to_fetch = []
+        for digest in dict.fromkeys(digests):
+            if digest == Digest.TOMBSTONE:
+                continue
+            cache_file_path = os.path.join(self.file_dir, digest)
+            if os.path.exists(cache_file_path):
+                self._hits += 1
+                self._touch(cache_file_path)
+            else:
+                to_fetch.append(digest)
+        if len(to_fetch) == 0:
+            return set()
+
+        self._misses += len(to_fetch)
+        logger.debug("Downloading %d files from the database.",
+                     len(to_fetch))
+
+        def _fetch(digests):
+            fetched = set()
+            for digest, fobj in self.backend.get_files(digests):
+                self._store_in_cache(digest, fobj, True)
+                fetched.add(digest)
+            return fetched
+
+        parallelism = max(1, min(parallelism, len(to_fetch)))
+        greenlets = [gevent.spawn(_fetch, to_fetch[i::parallelism])
+                     for i in range(parallelism)]
+        gevent.joinall(greenlets, raise_error=True)
+
+        missing = set(to_fetch)
+        for greenlet in greenlets:
+            missing -= greenlet.value
+        logger.debug("%d files downloaded.", len(to_fetch) - len(missing))
+        return missing
+
+    def get_files(
+        self, digests: Iterable[str]
+    ) -> Iterator[tuple[str, typing.IO[bytes]]]:
+        """Retrieve many files from the storage.
+
+        See `get_file' and `cache_files'. The files that are not in the
+        cache are downloaded all together before returning any of them.
+
+        digests: the digests of the files to get.
+
+        return: an iterator yielding pairs of a digest and a readable
+            binary file-like object from which to read the contents of
+            the file, in the same order as digests. The caller is
+            responsible for closing the file objects.
+
+        raise (KeyError): if any of the files cannot be found.
+        raise (TombstoneError): if any of the digests is the tombstone
+
+        """
+        digests = list(digests)
+        if Digest.TOMBSTONE in digests:
+            raise TombstoneError()
+        missing = self.cache_files(digests)
+        if len(missing) > 0:
+            raise KeyError("Files not found: %s." % ", ".join(sorted(missing)))
+        return ((digest, self.get_file(digest)) for digest in digests)
+
     def get_file(self, digest: str) -> typing.IO[bytes]:
         """Retrieve a file from the storage.
 
@@ -735,6 +1111,65 @@ class FileCacher:
             with open(dst_path, 'wb') as dst:
                 copyfileobj(src, dst, self.CHUNK_SIZE)
 
+    def link_file_to_path(self, digest: str, dst_path: str,
+                          allow_hardlink: bool = False) -> bool:
+        """Make a file available at a path without copying its data.
+
+        The file at dst_path shares its data with the copy in the local
+        cache, either as a reflink (a copy-on-write clone, only on file
+        systems that support it) or, if allowed, as a hard link. Note
+        that with a hard link the two paths are the same inode: the
+        caller must ensure that nobody can modify the file (or its
+        permissions) through dst_path, as that would corrupt the cache
+        shared by all the users of the cache directory. A hard-linked
+        file has the permissions CACHED_FILE_MODE.
+
+        digest: the digest of the file to get.
+        dst_path: the path of the file to create, which must not exist
+            and should be on the same file system as the cache.
+        allow_hardlink: whether to fall back to a hard link if a
+            reflink is not possible.
+
+        return: True if the file was created, False if it was not
+            possible to do so without copying (in which case nothing
+            is created).
+
+        raise (KeyError): if the file cannot be found.
+        raise (TombstoneError): if the digest is the tombstone
+
+        """
+        if digest == Digest.TOMBSTONE:
+            raise TombstoneError()
+
+        with self.get_file(digest) as src:
+            dst_fd = os.open(dst_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            try:
+                fcntl.ioctl(dst_fd, FICLONE, src.fileno())
+            except OSError:
+                reflinked = False
+            else:
+                reflinked = True
+            finally:
+                os.close(dst_fd)
+            if reflinked:
+                return True
+            os.unlink(dst_path)
+
+            if allow_hardlink:
+                # This fails if the cached file has been evicted in the
+                # meantime, but then copying is fine. Files cached with
+                # other permissions (by older versions) are copied too.
+                cache_file_path = os.path.join(self.file_dir, digest)
+                try:
+                    if os.stat(cache_file_path).st_mode & 0o777 \
+                            == FileCacher.CACHED_FILE_MODE:
+                        os.link(cache_file_path, dst_path)
+                        return True
+                except OSError:
+                    pass
+
+        return False
+
     def put_file_from_fobj(self, src: typing.IO[bytes], desc: str = "") -> str:
         """Store a file in the storage.
 
@@ -796,8 +1231,11 @@ class FileCacher:
                     copyfileobj(src, fobj, self.CHUNK_SIZE)
                     self.backend.commit_file(fobj, digest, desc)
 
+            size = os.stat(dst.name).st_size
+            os.chmod(dst.name, FileCacher.CACHED_FILE_MODE)
             os.rename(dst.name, cache_file_path)
 
+        self._account(size)
         return digest
 
     def put_file_content(self, content: bytes, desc: str = "") -> str:
@@ -888,6 +1326,131 @@ class FileCacher:
         except OSError:
             pass
 
+    def _touch(self, cache_file_path: str):
+        """Mark a cached file as recently used.
+
+        The modification time of the files in the cache is used as
+        their last access time for the LRU eviction (access times are
+        unreliable, as file systems are often mounted with noatime or
+        relatime). Cached files are never modified, so this is safe.
+
+        cache_file_path: the path of the file in the cache.
+
+        """
+        if self.max_cache_size is None:
+            return
+        try:
+            os.utime(cache_file_path)
+        except OSError:
+            # The file might have been evicted in the meantime.
+            pass
+
+    def _scan_cache(self) -> list[tuple[float, int, str]]:
+        """List the files currently in the local cache.
+
+        return: a list of triples (last use time, size, digest).
+
+        """
+        entries = []
+        with os.scandir(self.file_dir) as it:
+            for entry in it:
+                if not self.CACHED_FILE_NAME_RE.match(entry.name):
+                    continue
+                try:
+                    if not entry.is_file(follow_symlinks=False):
+                        continue
+                    st = entry.stat(follow_symlinks=False)
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, entry.name))
+        return entries
+
+    def _account(self, size: int):
+        """Record that a file was added to the local cache.
+
+        If this brings the (estimated) size of the cache over its
+        limit, trigger an eviction.
+
+        size: the size of the added file, in bytes.
+
+        """
+        if self.max_cache_size is None:
+            return
+        if self._cache_size is None:
+            self._cache_size = sum(size for _, size, _ in self._scan_cache())
+        else:
+            self._cache_size += size
+        if self._cache_size > self.max_cache_size:
+            self.evict()
+
+    def evict(self) -> int:
+        """Evict the least recently used files from the local cache.
+
+        If the cache is larger than its limit, delete files starting
+        from the least recently used, until its size is below a fraction
+        (EVICTION_TARGET_RATIO) of the limit. Only one process at a time
+        evicts from a shared cache directory: if another one is already
+        doing it, return immediately. Deleting files that other
+        processes are reading is safe, as they keep their open file
+        descriptors, and they will download the files again if needed.
+
+        return: the number of files evicted.
+
+        """
+        if self.max_cache_size is None:
+            return 0
+
+        lock_file = os.path.join(self.file_dir, "evict_lock")
+        with open(lock_file, 'w') as fobj:
+            try:
+                fcntl.flock(fobj, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                # Someone else is evicting, their scan will include
+                # our files too.
+                return 0
+
+            entries = self._scan_cache()
+            total_size = sum(size for _, size, _ in entries)
+            evicted = 0
+            if total_size > self.max_cache_size:
+                target_size = self.max_cache_size * self.EVICTION_TARGET_RATIO
+                entries.sort()
+                for _, size, digest in entries:
+                    if total_size <= target_size:
+                        break
+                    try:
+                        os.unlink(os.path.join(self.file_dir, digest))
+                    except FileNotFoundError:
+                        continue
+                    total_size -= size
+                    evicted += 1
+                    self._evicted_bytes += size
+                self._evictions += evicted
+                logger.info("Evicted %d files from the local cache, which "
+                            "now uses %d bytes.", evicted, total_size)
+            self._cache_size = total_size
+
+        return evicted
+
+    def get_cache_stats(self) -> dict[str, int | None]:
+        """Return the usage counters of the local cache.
+
+        return: a dictionary with the number of hits, misses and
+            evictions (and evicted bytes) since this object was
+            created, the size limit of the cache, and the estimated
+            current size of the cache (both in bytes, or None if
+            unbounded or unknown).
+
+        """
+        return {
+            "hits": self._hits,
+            "misses": self._misses,
+            "evictions": self._evictions,
+            "evicted_bytes": self._evicted_bytes,
+            "max_size": self.max_cache_size,
+            "size": self._cache_size,
+        }
+
     def purge_cache(self):
         """Empty the local cache.
 
@@ -898,6 +1461,7 @@ class FileCacher:
         if not mkdir(config.global_.cache_dir) or not mkdir(self.file_dir):
             logger.error("Cannot create necessary directories.")
             raise RuntimeError("Cannot create necessary directories.")
+        self._cache_size = 0
 
     def destroy_cache(self):
         """Completely remove and destroy the cache.
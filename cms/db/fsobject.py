@@ -32,7 +32,7 @@ import psycopg2
 import psycopg2.extensions
 from sqlalchemy.dialects.postgresql import OID
 from sqlalchemy.schema import Column
-from sqlalchemy.types import String, Unicode
+from sqlalchemy.types import BigInteger, String, Unicode
 
 from . import Base, custom_psycopg2_connection, Session
 
@@ -71,13 +71,17 @@ class LargeObject(io.RawIOBase, typing.BinaryIO):
     INV_READ = 0x40000
     INV_WRITE = 0x20000
 
-    def __init__(self, loid: int, mode: str = 'rb'):
+    def __init__(self, loid: int, mode: str = 'rb', conn=None):
         """Open a large object, creating it if required.
 
         loid: the large object ID.
         mode: how to open the file (`r' -> read, `w' -> write,
             `b' -> binary, which must be always specified). If not
             given, `rb' is used.
+        conn: a psycopg2 connection to use instead of creating a new
+            one. It must not be used for anything else until this
+            object is closed (which commits the connection's current
+            transaction), and it is left open afterwards.
 
         """
         io.RawIOBase.__init__(self)
@@ -96,7 +100,8 @@ class LargeObject(io.RawIOBase, typing.BinaryIO):
         self._readable = 'r' in modeset
         self._writable = 'w' in modeset
 
-        self._conn = custom_psycopg2_connection()
+        self._conn = conn if conn is not None \
+            else custom_psycopg2_connection()
         cursor = self._conn.cursor()
 
         # If the loid is 0, create the large object.
@@ -380,6 +385,14 @@ class FSObject(Base):
         Unicode,
         nullable=True)
 
+    # Size of the file in bytes, recorded when the file is stored so
+    # that it can be known without opening the large object. It is None
+    # for files stored before this column was introduced, until their
+    # size is computed for the first time.
+    size: int | None = Column(
+        BigInteger,
+        nullable=True)
+
     def get_lobject(self, mode: str = 'rb') -> LargeObject:
         """Return an open file bound to the represented large object.
 
@@ -523,6 +523,24 @@ class Dataset(Base):
         JSONB,
         nullable=False)
 
+    # Whether ES can skip the testcases that cannot change the score
+    # anymore, because the subtasks they belong to are already decided
+    # by the outcomes of other testcases (see
+    # ScoreType.testcases_to_skip).
+    short_circuit_evaluation: bool = Column(
+        Boolean,
+        nullable=False,
+        default=False)
+
+    # Whether ES can copy the evaluations of a submission whose
+    # executables are identical to those of another submission, instead
+    # of evaluating it again. Only to enable when the graders are
+    # deterministic.
+    deduplicate_evaluations: bool = Column(
+        Boolean,
+        nullable=False,
+        default=False)
+
     # These one-to-many relationships are the reversed directions of
     # the ones defined in the "child" classes using foreign keys.
 
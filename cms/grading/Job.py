@@ -82,6 +82,15 @@ def _is_sandbox_multithreaded(submission: Submission) -> bool:
     return False
 
 
+def _freeze(value: object) -> object:
+    """Return a hashable version of a value that can be sent as JSON."""
+    if isinstance(value, dict):
+        return frozenset((k, _freeze(v)) for k, v in value.items())
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
 class Job:
     """Base class for all jobs.
 
@@ -174,15 +183,36 @@ class Job:
 
     def export_to_dict(self) -> dict:
         """Return a dict representing the job."""
+        res = self.export_context_to_dict()
+        res.update(self.export_specific_to_dict())
+        return res
+
+    def export_context_to_dict(self) -> dict:
+        """Return a dict with the fields of the job that depend only
+        on the submission (or user test) and on the dataset.
+
+        """
         res = {
-            'operation': (self.operation.to_dict()
-                          if self.operation is not None
-                          else None),
             'task_type': self.task_type,
             'task_type_parameters': self.task_type_parameters,
             'language': self.language,
             'multithreaded_sandbox': self.multithreaded_sandbox,
             'archive_sandbox': self.archive_sandbox,
+            'files': dict((k, v.digest)
+                          for k, v in self.files.items()),
+            'managers': dict((k, v.digest)
+                             for k, v in self.managers.items()),
+            'executables': dict((k, v.digest)
+                                for k, v in self.executables.items()),
+            }
+        return res
+
+    def export_specific_to_dict(self) -> dict:
+        """Return a dict with the other fields of the job."""
+        res = {
+            'operation': (self.operation.to_dict()
+                          if self.operation is not None
+                          else None),
             'shard': self.shard,
             'keep_sandbox': self.keep_sandbox,
             'sandboxes': self.sandboxes,
@@ -190,15 +220,25 @@ class Job:
             'info': self.info,
             'success': self.success,
             'text': self.text,
-            'files': dict((k, v.digest)
-                          for k, v in self.files.items()),
-            'managers': dict((k, v.digest)
-                             for k, v in self.managers.items()),
-            'executables': dict((k, v.digest)
-                                for k, v in self.executables.items()),
             }
         return res
 
+    def get_context_key(self) -> tuple:
+        """Return a hashable value that identifies the output of
+        export_context_to_dict, without computing it.
+
+        """
+        return (
+            self.task_type,
+            _freeze(self.task_type_parameters),
+            self.language,
+            self.multithreaded_sandbox,
+            self.archive_sandbox,
+            frozenset((k, v.digest) for k, v in self.files.items()),
+            frozenset((k, v.digest) for k, v in self.managers.items()),
+            frozenset((k, v.digest) for k, v in self.executables.items()),
+        )
+
     @staticmethod
     def import_from_dict_with_type(data: dict) -> "Job":
         """Create a Job from a dict having a type information.
@@ -276,6 +316,18 @@ class Job:
             job = EvaluationJob.from_user_test(operation, object_, dataset)
         return job
 
+    def get_input_digests(self) -> list[str]:
+        """Return the digests of the files needed to execute the job.
+
+        return: the digests of the files, managers and executables of
+            the job (without duplicates).
+
+        """
+        digests = [f.digest for f in self.files.values()]
+        digests += [m.digest for m in self.managers.values()]
+        digests += [e.digest for e in self.executables.values()]
+        return list(dict.fromkeys(digests))
+
     def get_sandbox_digest_list(self) -> list[str] | None:
         """
         Convert self.sandbox_digests into a list, where each index matches the
@@ -347,15 +399,24 @@ class CompilationJob(Job):
         self.compilation_success = compilation_success
         self.plus = plus
 
-    def export_to_dict(self) -> dict:
-        res = Job.export_to_dict(self)
+    def export_context_to_dict(self) -> dict:
+        res = Job.export_context_to_dict(self)
         res.update({
             'type': 'compilation',
+            })
+        return res
+
+    def export_specific_to_dict(self) -> dict:
+        res = Job.export_specific_to_dict(self)
+        res.update({
             'compilation_success': self.compilation_success,
             'plus': self.plus,
             })
         return res
 
+    def get_context_key(self) -> tuple:
+        return ('compilation',) + Job.get_context_key(self)
+
     @staticmethod
     def from_submission(
         operation: ESOperation, submission: Submission, dataset: Dataset
@@ -590,22 +651,40 @@ class EvaluationJob(Job):
         self.only_execution = only_execution
         self.get_output = get_output
 
-    def export_to_dict(self) -> dict:
-        res = Job.export_to_dict(self)
+    def get_input_digests(self) -> list[str]:
+        """See Job.get_input_digests()."""
+        digests = Job.get_input_digests(self)
+        digests += [d for d in (self.input, self.output)
+                    if d is not None and d not in digests]
+        return digests
+
+    def export_context_to_dict(self) -> dict:
+        res = Job.export_context_to_dict(self)
         res.update({
             'type': 'evaluation',
-            'input': self.input,
-            'output': self.output,
             'time_limit': self.time_limit,
             'memory_limit': self.memory_limit,
+            'only_execution': self.only_execution,
+            'get_output': self.get_output,
+            })
+        return res
+
+    def export_specific_to_dict(self) -> dict:
+        res = Job.export_specific_to_dict(self)
+        res.update({
+            'input': self.input,
+            'output': self.output,
             'outcome': self.outcome,
             'user_output': self.user_output,
             'plus': self.plus,
-            'only_execution': self.only_execution,
-            'get_output': self.get_output,
             })
         return res
 
+    def get_context_key(self) -> tuple:
+        return ('evaluation', self.time_limit, self.memory_limit,
+                self.only_execution, self.get_output) \
+            + Job.get_context_key(self)
+
     @staticmethod
     def from_submission(
         operation: ESOperation, submission: Submission, dataset: Dataset
@@ -664,16 +743,28 @@ class EvaluationJob(Job):
         # only if it is True.
 
         sr.evaluations += [Evaluation(
-            text=self.text,
-            outcome=self.outcome,
-            execution_time=self.plus.get('execution_time'),
-            execution_wall_clock_time=self.plus.get(
+            testcase=sr.dataset.testcases[self.operation.testcase_codename],
+            **self.get_evaluation_values())]
+
+    def get_evaluation_values(self) -> dict[str, object]:
+        """Return the values of the evaluation described by the job.
+
+        return: the values of the columns of the Evaluation for the
+            job result, except those identifying the submission, the
+            dataset and the testcase.
+
+        """
+        return {
+            "text": self.text,
+            "outcome": self.outcome,
+            "execution_time": self.plus.get('execution_time'),
+            "execution_wall_clock_time": self.plus.get(
                 'execution_wall_clock_time'),
-            execution_memory=self.plus.get('execution_memory'),
-            evaluation_shard=self.shard,
-            evaluation_sandbox_paths=self.sandboxes,
-            evaluation_sandbox_digests=self.get_sandbox_digest_list(),
-            testcase=sr.dataset.testcases[self.operation.testcase_codename])]
+            "execution_memory": self.plus.get('execution_memory'),
+            "evaluation_shard": self.shard,
+            "evaluation_sandbox_paths": self.sandboxes,
+            "evaluation_sandbox_digests": self.get_sandbox_digest_list(),
+        }
 
     @staticmethod
     def from_user_test(
@@ -764,20 +855,45 @@ class EvaluationJob(Job):
 
 
 class JobGroup:
-    """A simple collection of jobs."""
+    """A simple collection of jobs.
+
+    The jobs of a group usually come from the same submission (or user
+    test) and dataset, and thus have many fields in common. When
+    exported, these are sent only once per group, in a "context" that
+    the jobs refer to (see Job.export_context_to_dict).
+
+    """
 
     def __init__(self, jobs: list[Job] | None = None):
         self.jobs = jobs if jobs is not None else []
 
     def export_to_dict(self):
+        contexts: list[dict] = []
+        context_indices: dict[tuple, int] = {}
+        jobs = []
+        for job in self.jobs:
+            key = job.get_context_key()
+            index = context_indices.get(key)
+            if index is None:
+                index = context_indices[key] = len(contexts)
+                contexts.append(job.export_context_to_dict())
+            job_dict = job.export_specific_to_dict()
+            job_dict["context"] = index
+            jobs.append(job_dict)
         return {
-            "jobs": [job.export_to_dict() for job in self.jobs],
+            "contexts": contexts,
+            "jobs": jobs,
         }
 
     @classmethod
     def import_from_dict(cls, data: dict) -> Self:
+        contexts = data.get("contexts", [])
         jobs = []
         for job in data["jobs"]:
+            # Groups exported without contexts have complete jobs.
+            if "context" in job:
+                job = dict(contexts[job["context"]], **job)
+                del job["context"]
             jobs.append(Job.import_from_dict_with_type(job))
         return cls(jobs)
 
@@ -24,6 +24,7 @@ import logging
 import os
 import resource
 import select
+import shutil
 import stat
 import tempfile
 import time
@@ -191,6 +192,11 @@ class SandboxBase(metaclass=ABCMeta):
     EXIT_MEM_LIMIT = 'memory limit exceeded'
     EXIT_NONZERO_RETURN = 'nonzero return'
 
+    # Whether the sandboxed processes run as a user that cannot modify
+    # (or change the permissions of) the files created by us, which
+    # makes it safe to hard-link files from the cache in the sandbox.
+    HARDLINK_SAFE = False
+
     def __init__(
         self,
         file_cacher: FileCacher,
@@ -216,6 +222,15 @@ class SandboxBase(metaclass=ABCMeta):
         # These are not necessarily used, but are here for API compatibility
         # TODO: move all other common properties here.
         self.box_id: int = 0
+        SandboxBase._set_default_parameters(self)
+
+    def _set_default_parameters(self):
+        """Set the parameters of the executions to their defaults.
+
+        Subclasses extend this with their own parameters, so that
+        reset() can restore them.
+
+        """
         self.fsize: int | None = None
         self.dirs: list[tuple[str | None, str, str | None]] = []
         self.preserve_env: bool = False
@@ -360,22 +375,59 @@ class SandboxBase(metaclass=ABCMeta):
                          "evalulate this submission. This may be due to "
                          "cheating. %s", real_path, e, exc_info=True)
             raise
+        self._set_file_permissions(real_path, executable)
+        return file_
+
+    @staticmethod
+    def _set_file_permissions(real_path: str, executable: bool):
+        """Make a file we created readable (and possibly executable)
+        by everybody, and writable only by us.
+
+        real_path: the path of the file in the system.
+        executable: whether to make the file executable.
+
+        """
+        if SandboxBase._is_hard_linked(real_path):
+            # The file is the one in the cache, already readable.
+            return
         mod = stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH | stat.S_IWUSR
         if executable:
             mod |= stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH
         os.chmod(real_path, mod)
-        return file_
+
+    @staticmethod
+    def _is_hard_linked(real_path: str) -> bool:
+        """Return whether a file is (possibly) a hard link to the
+        cache, whose permissions must not be changed.
+
+        """
+        st = os.lstat(real_path)
+        return stat.S_ISREG(st.st_mode) and st.st_nlink > 1
 
     def create_file_from_storage(
         self, path: str, digest: str, executable: bool = False
     ):
         """Write a file taken from FS in the sandbox.
 
+        If configured to, the file is linked from the local cache of
+        the file cacher rather than copied (falling back to a copy if
+        that is not possible, e.g., across file systems). Executables
+        are never hard-linked, as the permissions of a hard link are
+        those of the cached file, which is not executable.
+
         path: relative path of the file inside the sandbox.
         digest: digest of the file in FS.
         executable: to set permissions.
 
         """
+        if config.sandbox.link_cached_files:
+            real_path = self.relative_path(path)
+            if self.file_cacher.link_file_to_path(
+                    digest, real_path,
+                    allow_hardlink=self.HARDLINK_SAFE and not executable):
+                logger.debug("Linked file %s in sandbox.", path)
+                self._set_file_permissions(real_path, executable)
+                return
         with self.create_file(path, executable) as dest_fobj:
             self.file_cacher.get_file_to_fobj(digest, dest_fobj)
 
@@ -524,6 +576,17 @@ class SandboxBase(metaclass=ABCMeta):
         """
         pass
 
+    @abstractmethod
+    def reset(self):
+        """Bring the sandbox back to the state it had when created.
+
+        This deletes all the files in the sandbox and restores the
+        default parameters, but is cheaper than creating a new sandbox,
+        so that the same sandbox can be used for several jobs.
+
+        """
+        pass
+
     @abstractmethod
     def cleanup(self, delete: bool = False):
         """Cleanup the sandbox.
@@ -589,6 +652,12 @@ class StupidSandbox(SandboxBase):
 
         logger.debug("Sandbox in `%s' created, using stupid box.", self._path)
 
+        self._set_default_parameters()
+
+    def _set_default_parameters(self):
+        """See SandboxBase._set_default_parameters()."""
+        super()._set_default_parameters()
+
         # Box parameters
         self.chdir = self._path
         self.stdin_file = None
@@ -865,6 +934,17 @@ class StupidSandbox(SandboxBase):
         """
         return True
 
+    def reset(self):
+        """See Sandbox.reset()."""
+        logger.debug("Resetting sandbox in %s.", self._path)
+        for filename in os.listdir(self._path):
+            path = os.path.join(self._path, filename)
+            if os.path.isdir(path) and not os.path.islink(path):
+                rmtree(path)
+            else:
+                os.remove(path)
+        self._set_default_parameters()
+
     def cleanup(self, delete=False):
         """See Sandbox.cleanup()."""
         # This sandbox doesn't have any cleanup, but we might want to delete.
@@ -890,12 +970,19 @@ class IsolateSandbox(SandboxBase):
 
     """
     next_id = 0
+    # The box ids of the sandboxes not cleaned up yet, which cannot be
+    # given to a new sandbox.
+    box_ids_in_use: set[int] = set()
 
     # If the command line starts with this command name, we are just
     # going to execute it without sandboxing, and with all permissions
     # on the current directory.
     SECURE_COMMANDS = ["/bin/cp", "/bin/mv", "/usr/bin/zip", "/usr/bin/unzip"]
 
+    # Isolate runs the sandboxed processes as a different user, who
+    # can't write files we own unless we explicitly allow it.
+    HARDLINK_SAFE = True
+
     def __init__(self, file_cacher, name=None, temp_dir=None):
         """Initialization.
 
@@ -911,12 +998,23 @@ class IsolateSandbox(SandboxBase):
         # sequentially, with a wrap-around.
         # FIXME This is the only use of FileCacher.service, and it's an
         # improper use! Avoid it!
+        # Ids of sandboxes that are still alive (for example, kept idle
+        # to be reused) are skipped, unless all of them are.
         if file_cacher is not None and file_cacher.service is not None:
-            box_id = ((file_cacher.service.shard + 1) * 10
-                      + (IsolateSandbox.next_id % 10)) % 1000
+            first_id = (file_cacher.service.shard + 1) * 10
         else:
-            box_id = IsolateSandbox.next_id % 10
-        IsolateSandbox.next_id += 1
+            first_id = 0
+        start = IsolateSandbox.next_id
+        for i in range(10):
+            box_id = (first_id + (start + i) % 10) % 1000
+            if box_id not in IsolateSandbox.box_ids_in_use:
+                IsolateSandbox.next_id = start + i + 1
+                break
+        else:
+            box_id = (first_id + start % 10) % 1000
+            IsolateSandbox.next_id = start + 1
+            logger.warning("All the box ids in [%d, %d) are in use, "
+                           "reusing box %d.", first_id, first_id + 10, box_id)
 
         # We create a directory "home" inside the outer temporary directory,
         # that will be bind-mounted to "/tmp" inside the sandbox (some
@@ -945,8 +1043,26 @@ class IsolateSandbox(SandboxBase):
         logger.debug("Sandbox in `%s' created, using box `%s'.",
                      self._home, self.box_exec)
 
-        # Default parameters for isolate
         self.box_id = box_id  # -b
+        self._set_default_parameters()
+
+        # Tell isolate to get the sandbox ready. We do our best to cleanup
+        # after ourselves, but we might have missed something if a previous
+        # worker was interrupted in the middle of an execution, so we issue an
+        # idempotent cleanup.
+        IsolateSandbox.box_ids_in_use.add(box_id)
+        try:
+            self._cleanup_box()
+            self.initialize_isolate()
+        except BaseException:
+            IsolateSandbox.box_ids_in_use.discard(box_id)
+            raise
+
+    def _set_default_parameters(self):
+        """See SandboxBase._set_default_parameters()."""
+        super()._set_default_parameters()
+
+        # Default parameters for isolate
         self.chdir = self._home_dest  # -c
         self.dirs = []  # -d
         self.preserve_env = False  # -e
@@ -984,13 +1100,6 @@ class IsolateSandbox(SandboxBase):
         # particular, the System.Native assembly.
         self.maybe_add_mapped_directory("/etc/mono", options="noexec")
 
-        # Tell isolate to get the sandbox ready. We do our best to cleanup
-        # after ourselves, but we might have missed something if a previous
-        # worker was interrupted in the middle of an execution, so we issue an
-        # idempotent cleanup.
-        self.cleanup()
-        self.initialize_isolate()
-
     def add_mapped_directory(
         self,
         src: str,
@@ -1027,7 +1136,9 @@ class IsolateSandbox(SandboxBase):
         """
         os.chmod(self._home, 0o777)
         for filename in os.listdir(self._home):
-            os.chmod(os.path.join(self._home, filename), 0o777)
+            path = os.path.join(self._home, filename)
+            if not self._is_hard_linked(path):
+                os.chmod(path, 0o777)
 
     def allow_writing_none(self):
         """Set permissions in such a way that the user cannot write anything.
@@ -1035,7 +1146,9 @@ class IsolateSandbox(SandboxBase):
         """
         os.chmod(self._home, 0o755)
         for filename in os.listdir(self._home):
-            os.chmod(os.path.join(self._home, filename), 0o755)
+            path = os.path.join(self._home, filename)
+            if not self._is_hard_linked(path):
+                os.chmod(path, 0o755)
 
     def allow_writing_only(self, inner_paths: list[str]):
         """Set permissions in so that the user can write only some paths.
@@ -1066,16 +1179,31 @@ class IsolateSandbox(SandboxBase):
             outer_paths.append(outer_path)
 
         # If one of the specified file do not exists, we touch it to
-        # assign the correct permissions.
+        # assign the correct permissions. If it is hard-linked from the
+        # cache, we replace it with a copy, so that the cache is not
+        # modified through it.
         for path in outer_paths:
             if not os.path.exists(path):
                 open(path, "wb").close()
+            elif os.stat(path).st_nlink > 1:
+                self._unlink_from_cache(path)
 
         # Close everything, then open only the specified.
         self.allow_writing_none()
         for path in outer_paths:
             os.chmod(path, 0o722)
 
+    @staticmethod
+    def _unlink_from_cache(path: str):
+        """Replace a (hard-linked) file with a copy of it.
+
+        path: the path of the file in the system.
+
+        """
+        temp_path = path + ".copy"
+        shutil.copy2(path, temp_path)
+        os.replace(temp_path, path)
+
     def get_root_path(self) -> str:
         """Return the toplevel path of the sandbox.
 
@@ -1478,31 +1606,71 @@ class IsolateSandbox(SandboxBase):
             raise SandboxInterfaceException(
                 "Failed to initialize sandbox") from e
 
-    def cleanup(self, delete=False):
-        """See Sandbox.cleanup()."""
-        # The user isolate assigns within the sandbox might have created
-        # subdirectories and files therein, making the user outside the sandbox
-        # unable to delete the whole tree. If the caller asked us to delete the
-        # sandbox, we first issue a chmod within isolate to make sure that we
-        # will be able to delete everything. If not, we leave the files as they
-        # are to avoid masking possible problems the admin wanted to debug.
+    def _cleanup_box(self):
+        """Tell isolate to cleanup the box."""
+        subprocess.check_call(
+            [self.box_exec, "--box-id=%d" % self.box_id, "--cg",
+             "--cleanup"],
+            stdout=subprocess.DEVNULL, stderr=subprocess.STDOUT)
 
-        exe = [self.box_exec, "--box-id=%d" % self.box_id, "--cg"]
+    def _make_home_deletable(self):
+        """Allow us to delete everything in the home directory.
 
-        if delete:
-            # Ignore exit status as some files may be owned by our user
-            subprocess.call(
-                exe + [
-                    "--dir=%s=%s:rw" % (self._home_dest, self._home),
-                    "--run", "--",
-                    "/bin/chmod", "777", "-R", self._home_dest],
-                stdout=subprocess.DEVNULL, stderr=subprocess.STDOUT)
-
-        # Tell isolate to cleanup the sandbox.
-        subprocess.check_call(
-            exe + ["--cleanup"],
+        The user isolate assigns within the sandbox might have created
+        subdirectories and files therein, making the user outside the
+        sandbox unable to delete the whole tree. Hence we issue a chmod
+        within isolate.
+
+        """
+        # Ignore exit status as some files may be owned by our user
+        subprocess.call(
+            [self.box_exec, "--box-id=%d" % self.box_id, "--cg",
+             "--dir=%s=%s:rw" % (self._home_dest, self._home),
+             "--run", "--",
+             "/bin/chmod", "777", "-R", self._home_dest],
             stdout=subprocess.DEVNULL, stderr=subprocess.STDOUT)
 
+    def reset(self):
+        """See Sandbox.reset().
+
+        The box stays initialized (together with its control group),
+        which saves the isolate --cleanup and --init calls of creating
+        a new sandbox.
+
+        """
+        logger.debug("Resetting sandbox in %s.", self._outer_dir)
+        self._make_home_deletable()
+        for filename in os.listdir(self._outer_dir):
+            path = os.path.join(self._outer_dir, filename)
+            if path == self._home:
+                continue
+            os.remove(path)
+        for filename in os.listdir(self._home):
+            path = os.path.join(self._home, filename)
+            if os.path.isdir(path) and not os.path.islink(path):
+                rmtree(path)
+            else:
+                os.remove(path)
+        self.allow_writing_all()
+        self._set_default_parameters()
+
+    def cleanup(self, delete=False):
+        """See Sandbox.cleanup()."""
+        # If the caller asked us to delete the sandbox, we first make sure
+        # that we will be able to delete everything. If not, we leave the
+        # files as they are to avoid masking possible problems the admin
+        # wanted to debug.
+        if delete:
+            self._make_home_deletable()
+
+        # Tell isolate to cleanup the sandbox; then its box id is free.
+        # This is so even if the cleanup fails, as the next sandbox with
+        # this id starts with a cleanup anyway.
+        try:
+            self._cleanup_box()
+        finally:
+            IsolateSandbox.box_ids_in_use.discard(self.box_id)
+
         if delete:
             logger.debug("Deleting sandbox in %s.", self._outer_dir)
             # Delete the working directory.
@@ -26,11 +26,11 @@ up ranking page loading.
 from dataclasses import dataclass, field
 from datetime import datetime, timezone
 
-from sqlalchemy import text
-from sqlalchemy.orm import Session
+from sqlalchemy import text, tuple_
+from sqlalchemy.orm import Session, selectinload
 
 from cms.db import (
-    Participation, Task, Submission,
+    Contest, Dataset, Participation, Task, Submission, SubmissionResult,
     ParticipationTaskScore, ScoreHistory
 )
 from cmscommon.constants import (
@@ -40,11 +40,13 @@ from cmscommon.constants import (
 
 __all__ = [
     "ensure_valid_history",
+    "get_cached_score_entries",
     "get_cached_score_entry",
     "invalidate_score_cache",
     "rebuild_score_cache",
     "rebuild_score_history",
     "update_score_cache",
+    "update_score_cache_batch",
 ]
 
 
@@ -183,6 +185,27 @@ def _acquire_cache_lock(
     )
 
 
+def _acquire_cache_locks(
+    session: Session,
+    keys: list[tuple[int, int]],
+) -> None:
+    """Acquire the advisory locks for many (participation, task) pairs.
+
+    The locks are the same acquired by _acquire_cache_lock, but they are
+    all acquired with a single statement, in the order of keys.
+
+    session: the database session.
+    keys: the (participation_id, task_id) pairs, sorted.
+    """
+    session.execute(
+        text("SELECT pg_advisory_xact_lock(k.p_id, k.t_id) "
+             "FROM unnest(CAST(:p_ids AS integer[]), "
+             "CAST(:t_ids AS integer[])) AS k(p_id, t_id)"),
+        {"p_ids": [p_id for p_id, _ in keys],
+         "t_ids": [t_id for _, t_id in keys]}
+    )
+
+
 def _invalidate(
     session: Session,
     pt_filter,
@@ -224,6 +247,20 @@ def _update_score_cache_for_participation(
     _acquire_cache_lock(session, participation.id, task.id)
 
     cache_entry = _get_or_create_cache_entry(session, participation, task)
+    _apply_submission_to_cache_entry(
+        session, cache_entry, participation, submission, submission_result
+    )
+
+
+def _apply_submission_to_cache_entry(
+    session: Session,
+    cache_entry: ParticipationTaskScore,
+    participation: Participation,
+    submission: Submission,
+    submission_result,
+) -> None:
+    """Apply a scored submission to a locked cache entry."""
+    task = submission.task
     old_score = cache_entry.score
 
     # Incremental update based on score mode
@@ -246,6 +283,54 @@ def _update_score_cache_for_participation(
         _add_history_entry(session, participation, task, submission, cache_entry.score)
 
 
+def _get_cache_updates(
+    session: Session,
+    submission: Submission,
+) -> list[tuple[Participation, SubmissionResult]]:
+    """Return the participations whose cache a scored submission updates.
+
+    return: pairs of participation and submission result of the active
+        dataset; empty if the submission does not count for the cache.
+
+    """
+    if not submission.official:
+        return []
+
+    task = submission.task
+    dataset = task.active_dataset
+    if dataset is None:
+        return []
+
+    submission_result = submission.get_result(dataset)
+    if submission_result is None or not submission_result.scored():
+        return []
+
+    score = submission_result.score
+    if score is None:
+        return []
+
+    participation = submission.participation
+    updates = [(participation, submission_result)]
+
+    training_day = submission.training_day
+    if training_day is None or training_day.contest_id is None:
+        return updates
+
+    # If this is a training day submission, also update the training day
+    # participation cache (submissions are stored on the managing contest).
+    td_participation = (
+        session.query(Participation)
+        .filter(
+            Participation.contest_id == training_day.contest_id,
+            Participation.user_id == participation.user_id,
+        )
+        .one_or_none()
+    )
+    if td_participation is not None:
+        updates.append((td_participation, submission_result))
+    return updates
+
+
 def update_score_cache(
     session: Session,
     submission: Submission,
@@ -281,45 +366,54 @@ def update_score_cache(
     submission: the submission that was just scored.
 
     """
-    if not submission.official:
-        return
+    for participation, submission_result in \
+            _get_cache_updates(session, submission):
+        _update_score_cache_for_participation(
+            session, participation, submission, submission_result
+        )
 
-    task = submission.task
-    dataset = task.active_dataset
-    if dataset is None:
-        return
 
-    submission_result = submission.get_result(dataset)
-    if submission_result is None or not submission_result.scored():
-        return
+def update_score_cache_batch(
+    session: Session,
+    submissions: list[Submission],
+) -> None:
+    """Update the score cache after many submissions are scored.
 
-    score = submission_result.score
-    if score is None:
-        return
+    This is equivalent to calling update_score_cache for each
+    submission, but the submissions are grouped by (participation,
+    task) pair: each pair is locked and its cache entry loaded only
+    once, and its submissions are applied in timestamp order, so that
+    a batch arriving at once does not invalidate the history. The
+    pairs are locked in a fixed order, so that concurrent batches
+    cannot deadlock on each other.
 
-    participation = submission.participation
-    _update_score_cache_for_participation(
-        session, participation, submission, submission_result
-    )
+    The same locking and transaction behavior of update_score_cache
+    applies, for all the pairs of the batch.
 
-    training_day = submission.training_day
-    if training_day is None or training_day.contest_id is None:
-        return
+    session: the database session.
+    submissions: the submissions that were just scored.
 
-    # If this is a training day submission, also update the training day
-    # participation cache (submissions are stored on the managing contest).
-    td_participation = (
-        session.query(Participation)
-        .filter(
-            Participation.contest_id == training_day.contest_id,
-            Participation.user_id == participation.user_id,
-        )
-        .one_or_none()
-    )
-    if td_participation is not None:
-        _update_score_cache_for_participation(
-            session, td_participation, submission, submission_result
-        )
+    """
+    groups: dict[tuple[int, int],
+                 list[tuple[Participation, Submission, SubmissionResult]]] = {}
+    for submission in submissions:
+        for participation, submission_result in \
+                _get_cache_updates(session, submission):
+            groups.setdefault(
+                (participation.id, submission.task_id), []
+            ).append((participation, submission, submission_result))
+
+    for (participation_id, task_id), updates in sorted(groups.items()):
+        _acquire_cache_lock(session, participation_id, task_id)
+        participation, submission, _ = updates[0]
+        cache_entry = _get_or_create_cache_entry(
+            session, participation, submission.task)
+        updates.sort(key=lambda update: update[1].timestamp)
+        for participation, submission, submission_result in updates:
+            _apply_submission_to_cache_entry(
+                session, cache_entry, participation, submission,
+                submission_result
+            )
 
 
 def invalidate_score_cache(
@@ -583,6 +677,151 @@ def get_cached_score_entry(
     return cache_entry
 
 
+def get_cached_score_entries(
+    session: Session,
+    contest: Contest,
+    participations: list[Participation] | None = None,
+    tasks: list[Task] | None = None,
+    pairs: list[tuple[Participation, Task]] | None = None,
+) -> dict[tuple[int, int], ParticipationTaskScore]:
+    """Get the cached score entries for all the pairs of a contest.
+
+    This is equivalent to calling get_cached_score_entry for each
+    participation of the contest and each task returned by
+    contest.get_tasks() (or only for the given ones, or only for the
+    given pairs), but all the entries are fetched with a single
+    query. The missing or invalid ones are then rebuilt together: their
+    locks are acquired with a single statement, in (participation_id,
+    task_id) order, and their submissions are loaded with a few queries
+    for all of them instead of a few for each pair.
+
+    IMPORTANT - Locking and Transaction Behavior:
+    If rebuilds are triggered, this function acquires PostgreSQL advisory
+    locks (pg_advisory_xact_lock) for the rebuilt (participation_id,
+    task_id) pairs. The locks are transaction-scoped and are released when
+    the transaction ends (commit or rollback).
+
+    Caller Responsibility:
+    - The caller MUST commit or rollback the session to persist possible
+      changes and release the locks. Without commit, changes are lost.
+    - Do NOT call this function or any other function that carries this
+      warning with the same contest within the same transaction without
+      committing in between, as the second call will block waiting for the
+      locks (self-deadlock).
+    - Do NOT call ensure_valid_history with the same contest whithin the
+      same transaction without committing in between, as this might also
+      cause a self-deadlock.
+
+    session: the database session.
+    contest: the contest.
+    participations: if provided, the participations of the contest to
+        consider, instead of all of them.
+    tasks: if provided, the tasks of the contest to consider, instead
+        of all of them.
+    pairs: if provided, the (participation, task) pairs to consider,
+        instead of all those of the participations and the tasks.
+
+    return: the cached score entries, indexed by (participation_id,
+        task_id).
+
+    """
+    if pairs is None:
+        if participations is None:
+            participations = contest.participations
+        if tasks is None:
+            tasks = contest.get_tasks()
+        pairs = [(p, t) for p in participations for t in tasks]
+    pairs_by_id = {(p.id, t.id): (p, t) for p, t in pairs}
+    if len(pairs_by_id) == 0:
+        return {}
+
+    cache_entries = {
+        (e.participation_id, e.task_id): e
+        for e in session.query(ParticipationTaskScore)
+        .join(Participation)
+        .filter(Participation.contest_id == contest.id)
+        .filter(ParticipationTaskScore.participation_id.in_(
+            {p_id for p_id, _ in pairs_by_id}))
+        .filter(ParticipationTaskScore.task_id.in_(
+            {t_id for _, t_id in pairs_by_id}))
+        .all()
+        if (e.participation_id, e.task_id) in pairs_by_id
+    }
+
+    to_rebuild = [
+        pairs_by_id[key]
+        for key in sorted(pairs_by_id)
+        if key not in cache_entries
+        or not _is_cache_valid(cache_entries[key])
+    ]
+    if len(to_rebuild) > 0:
+        cache_entries.update(
+            _rebuild_score_caches(session, contest, to_rebuild))
+
+    return cache_entries
+
+
+def _rebuild_score_caches(
+    session: Session,
+    contest: Contest,
+    pairs: list[tuple[Participation, Task]],
+) -> dict[tuple[int, int], ParticipationTaskScore]:
+    """Rebuild the score cache for many pairs of a contest at once.
+
+    Each pair is rebuilt as in rebuild_score_cache, which carries the
+    same locking warnings.
+
+    session: the database session.
+    contest: the contest of the participations.
+    pairs: the (participation, task) pairs, sorted by their ids.
+
+    return: the rebuilt cache entries, indexed by (participation_id,
+        task_id).
+
+    """
+    keys = [(participation.id, task.id) for participation, task in pairs]
+    _acquire_cache_locks(session, keys)
+
+    # See rebuild_score_cache for why this is taken before anything else.
+    rebuild_start_time = _utc_now()
+
+    session.query(ScoreHistory).filter(
+        tuple_(ScoreHistory.participation_id, ScoreHistory.task_id)
+        .in_(keys)
+    ).delete(synchronize_session=False)
+
+    # Look the entries up again, now that no one else can create them.
+    cache_entries = {
+        (e.participation_id, e.task_id): e
+        for e in session.query(ParticipationTaskScore).filter(
+            tuple_(ParticipationTaskScore.participation_id,
+                   ParticipationTaskScore.task_id).in_(keys)
+        ).all()
+    }
+
+    submissions = _get_sorted_official_submissions_batch(
+        session, contest, pairs)
+
+    for participation, task in pairs:
+        key = (participation.id, task.id)
+        cache_entry = cache_entries.get(key)
+        if cache_entry is None:
+            cache_entry = _new_cache_entry(participation, task)
+            session.add(cache_entry)
+            cache_entries[key] = cache_entry
+        cache_entry.created_at = rebuild_start_time
+
+        dataset = task.active_dataset
+        if dataset is None:
+            continue
+        _update_cache_entry_from_sorted_submissions(
+            cache_entry, task, dataset, submissions[key])
+        _rebuild_history_from_sorted_submissions(
+            session, participation, task, dataset, submissions[key])
+
+    return cache_entries
+
+
 def ensure_valid_history(
     session: Session,
     contest_id: int,
@@ -678,26 +917,34 @@ def _get_or_create_cache_entry(
     ).first()
 
     if cache_entry is None:
-        now = _utc_now()
-        cache_entry = ParticipationTaskScore(
-            participation=participation,
-            task=task,
-            score=0.0,
-            subtask_max_scores=None,
-            max_tokened_score=0.0,
-            last_submission_score=None,
-            last_submission_timestamp=None,
-            history_valid=True,
-            has_submissions=False,
-            last_update=now,
-            created_at=now,  # Set created_at for new entries
-            invalidated_at=None,  # No invalidation yet
-        )
+        cache_entry = _new_cache_entry(participation, task)
         session.add(cache_entry)
 
     return cache_entry
 
 
+def _new_cache_entry(
+    participation: Participation,
+    task: Task,
+) -> ParticipationTaskScore:
+    """Create an empty cache entry for a participation/task pair."""
+    now = _utc_now()
+    return ParticipationTaskScore(
+        participation=participation,
+        task=task,
+        score=0.0,
+        subtask_max_scores=None,
+        max_tokened_score=0.0,
+        last_submission_score=None,
+        last_submission_timestamp=None,
+        history_valid=True,
+        has_submissions=False,
+        last_update=now,
+        created_at=now,  # Set created_at for new entries
+        invalidated_at=None,  # No invalidation yet
+    )
+
+
 def _update_cache_entry_incremental(
     cache_entry: ParticipationTaskScore,
     task: Task,
@@ -801,6 +1048,81 @@ def _get_sorted_official_submissions(
     ).order_by(Submission.timestamp.asc()).all()
 
 
+def _get_sorted_official_submissions_batch(
+    session: Session,
+    contest: Contest,
+    pairs: list[tuple[Participation, Task]],
+) -> dict[tuple[int, int], list[Submission]]:
+    """Get official submissions for many pairs, sorted by timestamp.
+
+    This is the same as calling _get_sorted_official_submissions for
+    each pair, with a few queries in total. The results on the active
+    datasets and the tokens of the submissions are loaded too.
+
+    contest: the contest of the participations.
+
+    return: the submissions, indexed by (participation_id, task_id).
+
+    Raises:
+        ValueError: When managing participation is None for training days
+    """
+    training_day = contest.training_day
+
+    # Map the pairs whose submissions we query to the requested pairs:
+    # for training days, submissions are stored with the managing
+    # contest's participation.
+    sources: dict[tuple[int, int], tuple[int, int]] = {}
+    if training_day is not None:
+        managing_contest_id = \
+            training_day.training_program.managing_contest_id
+        managing_participation_ids = dict(
+            session.query(Participation.user_id, Participation.id)
+            .filter(Participation.contest_id == managing_contest_id)
+            .filter(Participation.user_id.in_(
+                {participation.user_id for participation, _ in pairs}))
+            .all()
+        )
+        for participation, task in pairs:
+            managing_participation_id = \
+                managing_participation_ids.get(participation.user_id)
+            if managing_participation_id is None:
+                raise ValueError(
+                    f"User {participation.user_id} does not have participation in managing contest "
+                    f"{managing_contest_id} for training day {training_day.id}"
+                )
+            sources[(managing_participation_id, task.id)] = \
+                (participation.id, task.id)
+    else:
+        for participation, task in pairs:
+            key = (participation.id, task.id)
+            sources[key] = key
+
+    query = session.query(Submission).filter(
+        tuple_(Submission.participation_id, Submission.task_id)
+        .in_(list(sources)),
+        Submission.official.is_(True)
+    ).options(selectinload(Submission.token))
+    if training_day is not None:
+        query = query.filter(Submission.training_day_id == training_day.id)
+
+    submissions: dict[tuple[int, int], list[Submission]] = {
+        key: [] for key in sources.values()}
+    result_keys = []
+    for s in query.order_by(Submission.timestamp.asc()).all():
+        submissions[sources[(s.participation_id, s.task_id)]].append(s)
+        if s.task.active_dataset_id is not None:
+            result_keys.append((s.id, s.task.active_dataset_id))
+
+    # Load the results in the session, where get_result will find them.
+    if len(result_keys) > 0:
+        session.query(SubmissionResult).filter(
+            tuple_(SubmissionResult.submission_id,
+                   SubmissionResult.dataset_id).in_(result_keys)
+        ).all()
+
+    return submissions
+
+
 def _update_cache_entry_from_submissions(
     session: Session,
     cache_entry: ParticipationTaskScore,
@@ -813,7 +1135,17 @@ def _update_cache_entry_from_submissions(
         return
 
     submissions_sorted = _get_sorted_official_submissions(session, participation, task)
+    _update_cache_entry_from_sorted_submissions(
+        cache_entry, task, dataset, submissions_sorted)
+
 
+def _update_cache_entry_from_sorted_submissions(
+    cache_entry: ParticipationTaskScore,
+    task: Task,
+    dataset: Dataset,
+    submissions_sorted: list[Submission],
+) -> None:
+    """Update a cache entry from the official submissions of its pair."""
     if len(submissions_sorted) == 0:
         cache_entry.score = 0.0
         cache_entry.subtask_max_scores = None
@@ -883,7 +1215,18 @@ def _rebuild_history(
         return
 
     submissions_sorted = _get_sorted_official_submissions(session, participation, task)
+    _rebuild_history_from_sorted_submissions(
+        session, participation, task, dataset, submissions_sorted)
 
+
+def _rebuild_history_from_sorted_submissions(
+    session: Session,
+    participation: Participation,
+    task: Task,
+    dataset: Dataset,
+    submissions_sorted: list[Submission],
+) -> None:
+    """Add the history entries of the official submissions of a pair."""
     if len(submissions_sorted) == 0:
         return
 
@@ -45,6 +45,10 @@ class GroupMul(ScoreTypeGroup):
         else:
             return N_("Partially correct")
 
+    def is_decided(self, outcomes, parameter):
+        """See ScoreTypeGroup."""
+        return any(outcome == 0.0 for outcome in outcomes)
+
     def reduce(self, outcomes, parameter):
         """See ScoreTypeGroup."""
         return reduce(lambda x, y: x * y, outcomes)
@@ -181,6 +181,23 @@ class ScoreType(metaclass=ABCMeta):
         """
         pass
 
+    def testcases_to_skip(self, outcomes: dict[str, float]) -> list[str]:
+        """Return the testcases whose evaluation cannot change the
+        score anymore, given the outcomes known so far.
+
+        Giving outcome 0.0 to the returned testcases must result in
+        the same score as evaluating them. By default nothing is
+        skipped.
+
+        outcomes: the outcomes of the testcases already evaluated,
+            indexed by codename.
+
+        return: the codenames of the testcases, not in outcomes, that
+            can be skipped.
+
+        """
+        return []
+
 
 class ScoreTypeAlone(ScoreType):
     """Intermediate class to manage tasks where the score of a
@@ -205,7 +222,8 @@ class ScoreTypeGroup(ScoreTypeAlone):
     expression of the names of target testcases. All t must have the same type.
 
     A subclass must implement the method 'get_public_outcome' and
-    'reduce'.
+    'reduce', and can implement 'is_decided' to let the evaluation of
+    a subtask stop early.
 
     """
     # the format of parameters is impossible to type-hint correctly, it seems...
@@ -383,6 +401,24 @@ class ScoreTypeGroup(ScoreTypeAlone):
             "In the score type parameters, the second value of each element "
             "must have the same type (int or unicode)")
 
+    def testcases_to_skip(self, outcomes):
+        """See ScoreType.testcases_to_skip.
+
+        A testcase can be skipped when all the subtasks containing it
+        are decided; testcases not in any subtask are never skipped.
+
+        """
+        targets = self.retrieve_target_testcases()
+        decided = {}
+        for target, parameter in zip(targets, self.parameters):
+            known = [outcomes[tc_idx] for tc_idx in target
+                     if tc_idx in outcomes]
+            is_decided = self.is_decided(known, parameter)
+            for tc_idx in target:
+                decided[tc_idx] = decided.get(tc_idx, True) and is_decided
+        return [tc_idx for tc_idx in sorted(decided)
+                if decided[tc_idx] and tc_idx not in outcomes]
+
     def max_scores(self):
         """See ScoreType.max_score."""
         score = 0.0
@@ -514,6 +550,25 @@ class ScoreTypeGroup(ScoreTypeAlone):
         """
         pass
 
+    def is_decided(self, outcomes: list[float], parameter: list) -> bool:
+        """Return whether the score of a subtask is decided by a part
+        of its outcomes.
+
+        The subtask is decided if reduce gives the same value for any
+        outcomes of the missing testcases, and in particular for 0.0.
+        The default is conservative and never considers a subtask
+        decided.
+
+        outcomes: the outcomes of the submission in some of the
+            testcases of the group.
+        parameter: the parameters of the group.
+
+        return: whether the missing outcomes cannot change the score
+            of the group.
+
+        """
+        return False
+
     @abstractmethod
     def reduce(self, outcomes: list[float], parameter: list) -> float:
         """Return the score of a subtask given the outcomes.
@@ -23,20 +23,26 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-from collections import namedtuple
+from collections import defaultdict, namedtuple
 
 from sqlalchemy.orm import joinedload
 
-from cms.db import Submission, Dataset, Participation, Task, TrainingDay
+from cms.db import Submission, SubmissionResult, Dataset, Participation, \
+    Task, TrainingDay
 from cmscommon.constants import \
     SCORE_MODE_MAX, SCORE_MODE_MAX_SUBTASK, SCORE_MODE_MAX_TOKENED_LAST
 
 
 __all__ = [
-    "compute_changes_for_dataset", "task_score",
+    "compute_changes_for_dataset", "get_submissions_by_task", "task_score",
 ]
 
 
+# The official submissions of a participation on a task, sorted by
+# timestamp, each with its result on the active dataset of the task.
+SubmissionsAndResults = list[tuple[Submission, SubmissionResult | None]]
+
+
 SubmissionScoreDelta = namedtuple(
     'SubmissionScoreDelta',
     ['submission', 'old_score', 'new_score',
@@ -103,6 +109,43 @@ def compute_changes_for_dataset(
 # Computing global scores (for ranking).
 
 
+def _with_results(submissions: list[Submission]) -> SubmissionsAndResults:
+    """Sort submissions of a task and pair them with their active result.
+
+    """
+    return [(s, s.get_result(s.task.active_dataset))
+            for s in sorted(submissions, key=lambda s: s.timestamp)]
+
+
+def get_submissions_by_task(
+    participation: Participation,
+    tasks: list[Task] | None = None,
+) -> dict[int, SubmissionsAndResults]:
+    """Index the official submissions of a participation by task.
+
+    Computing the scores of a participation on many tasks (or many
+    scores on the same task) by passing this index to task_score goes
+    through the submissions of the participation only once, instead of
+    once per call.
+
+    participation: the participation whose submissions to index.
+    tasks: if provided, only index the submissions on these tasks,
+        whose results are the only ones to be loaded.
+
+    return: for each task id, the official submissions of the
+        participation on the task, sorted by timestamp, each with its
+        result on the active dataset of the task (None if missing).
+
+    """
+    task_ids = None if tasks is None else {task.id for task in tasks}
+    submissions_by_task: dict[int, list[Submission]] = defaultdict(list)
+    for s in participation.submissions:
+        if s.official and (task_ids is None or s.task_id in task_ids):
+            submissions_by_task[s.task_id].append(s)
+    return {task_id: _with_results(submissions)
+            for task_id, submissions in submissions_by_task.items()}
+
+
 def task_score(
     participation: Participation,
     task: Task,
@@ -110,6 +153,7 @@ def task_score(
     only_tokened: bool = False,
     rounded: bool = False,
     training_day: TrainingDay | None = None,
+    submissions_by_task: dict[int, SubmissionsAndResults] | None = None,
 ) -> tuple[float, bool]:
     """Return the score of a contest's user on a task.
 
@@ -126,6 +170,8 @@ def task_score(
     rounded: if True, round the score to the task's score_precision.
     training_day: if provided, only consider submissions made via this
         training day (filters by training_day_id).
+    submissions_by_task: the index of the submissions of participation,
+        as returned by get_submissions_by_task, if already computed.
 
     return: the score of user on task, and True if not
         all submissions of the participation in the task have been scored.
@@ -145,17 +191,19 @@ def task_score(
             "This is a programming error: users have access to all public "
             "scores regardless of token status.")
 
-    submissions = [s for s in participation.submissions
-                   if s.task is task and s.official]
+    if submissions_by_task is not None:
+        submissions_and_results = submissions_by_task.get(task.id, [])
+    else:
+        submissions_and_results = _with_results(
+            [s for s in participation.submissions
+             if s.task is task and s.official])
     if training_day is not None:
-        submissions = [s for s in submissions if s.training_day_id == training_day.id]
-    if len(submissions) == 0:
+        submissions_and_results = [
+            (s, sr) for s, sr in submissions_and_results
+            if s.training_day_id == training_day.id]
+    if len(submissions_and_results) == 0:
         return 0.0, False
 
-    submissions_and_results = [
-        (s, s.get_result(task.active_dataset))
-        for s in sorted(submissions, key=lambda s: s.timestamp)]
-
     score_details_tokened = []
     partial = False
     for s, sr in submissions_and_results:
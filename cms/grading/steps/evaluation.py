@@ -77,6 +77,11 @@ EVALUATION_MESSAGES = MessageCollection([
                  N_("Execution failed because the return code was nonzero"),
                  N_("Your submission failed because it exited with a return "
                     "code different from 0.")),
+    HumanMessage("skipped",
+                 N_("Evaluation skipped"),
+                 N_("Your submission was not evaluated on this testcase, "
+                    "because the score of its subtask was already decided "
+                    "by other testcases.")),
 ])
 
 
@@ -34,6 +34,7 @@ Policy:
 import logging
 import re
 import typing
+from itertools import repeat
 
 from cms.grading.Sandbox import Sandbox
 
@@ -45,10 +46,32 @@ logger = logging.getLogger(__name__)
 
 # Fixed-format decimals only (bytes regex, no exponents/inf/nan).
 _FIXED_DEC_PATTERN = rb'[+-]?(?:\d+(?:\.\d*)?|\.\d+)'
+_FIXED_DEC_RE = re.compile(_FIXED_DEC_PATTERN)
+_FIXED_DEC_SPLIT_RE = re.compile(rb'(' + _FIXED_DEC_PATTERN + rb')')
+
+# Continuation of a decimal read up to the end of the previous chunk.
+_DIGITS_RE = re.compile(rb'\d*')
+
+# Suffix of a text that could become the start of a decimal once the
+# next chunk is read ("+", "-", ".", "+.", "-.").
+_DEC_PREFIX_RE = re.compile(rb'(?:[+-]\.?|\.)\Z')
 
 # default precision is 10^-6
 _DEFAULT_EXP = 6
 
+# Size of the chunks in which files are read.
+_CHUNK_SIZE = 256 * 1024
+
+# Decimals never contain whitespaces and text never contains digits:
+# numbers can thus be represented in the text stream by this marker.
+_NUMBER_MARKER = b"0"
+
+# Number of significant digits of a decimal that we keep. Correctly
+# rounding a decimal to a double never needs more than 767 of them,
+# plus the knowledge of whether the remaining ones are all zeros.
+_MAX_DIGITS = 800
+
+
 def _compare_real_pair(a: float, b: float, eps: float) -> bool:
     """Return True if a and b match within absolute/relative tolerance.
     
@@ -62,17 +85,178 @@ def _compare_real_pair(a: float, b: float, eps: float) -> bool:
     return diff <= tol
 
 
-def _white_diff_canonicalize(string: bytes) -> bytes:
-    """Canonicalize text for white-diff comparison.
-    
-    Strips leading/trailing whitespace and collapses runs of whitespace
-    into single spaces, matching white_diff behavior.
-    
-    string: the bytes string to canonicalize.
-    return: the canonicalized string.
+class _LongDecimal:
+    """A fixed-format decimal that spans several chunks.
+
+    Only the significant digits that can affect its value as a float
+    are stored, so that memory usage is bounded whatever its length.
+
     """
-    string = re.sub(rb'\s+', b' ', string).strip()
-    return string
+
+    def __init__(self, token: bytes):
+        """Start the decimal with the part read so far.
+
+        token: a match of _FIXED_DEC_PATTERN.
+
+        """
+        self.sign = token[:1] if token[:1] in (b"+", b"-") else b""
+        integer, point, fraction = token[len(self.sign):].partition(b".")
+        self.digits = b""
+        # Position of the decimal point with respect to digits.
+        self.exponent = 0
+        # Whether some non-zero digits were dropped.
+        self.inexact = False
+        self.fractional = False
+        self.add_digits(integer)
+        if point:
+            self.add_point()
+            self.add_digits(fraction)
+
+    def add_point(self):
+        self.fractional = True
+
+    def add_digits(self, digits: bytes):
+        """Append some digits to the integer or fractional part."""
+        if len(self.digits) == 0:
+            significant = digits.lstrip(b"0")
+            if self.fractional:
+                self.exponent -= len(digits) - len(significant)
+            digits = significant
+        if not self.fractional:
+            self.exponent += len(digits)
+        room = _MAX_DIGITS - len(self.digits)
+        self.digits += digits[:room]
+        if len(digits[room:].strip(b"0")) > 0:
+            self.inexact = True
+
+    def __float__(self) -> float:
+        if len(self.digits) == 0:
+            return float(self.sign + b"0")
+        return float(b"%s0.%s%se%d" % (self.sign, self.digits,
+                                       b"1" if self.inexact else b"",
+                                       self.exponent))
+
+
+class _Tokenizer:
+    """Split a file in text and fixed-format decimal tokens, reading it
+    in chunks.
+
+    The text is produced by pieces(), already canonicalized with the
+    white-diff semantics and with each decimal replaced by
+    _NUMBER_MARKER; the values of the decimals are appended to numbers
+    as they are read.
+
+    """
+
+    def __init__(self, fobj: typing.BinaryIO):
+        self.fobj = fobj
+        self.numbers: list[float] = []
+        # Decimal still being read at the end of the previous chunk.
+        self._number: _LongDecimal | None = None
+        # Bytes held back from the previous chunk.
+        self._pending = b""
+        # Whether the current text token has non-whitespaces, and
+        # whether whitespaces followed them.
+        self._started = False
+        self._pending_space = False
+
+    def pieces(self) -> typing.Iterator[bytes]:
+        """Read the file.
+
+        yield: consecutive pieces of the canonical text.
+
+        """
+        while True:
+            chunk = self.fobj.read(_CHUNK_SIZE)
+            final = len(chunk) == 0
+            buffer, self._pending = self._pending + chunk, b""
+            piece = b"".join(self._feed(buffer, final))
+            if len(piece) > 0:
+                yield piece
+            if final:
+                return
+
+    def _text(self, text: bytes) -> typing.Iterator[bytes]:
+        """Process part of a text token, collapsing and stripping
+        whitespaces.
+
+        """
+        words = text.split()
+        if len(words) == 0:
+            self._pending_space = self._pending_space or len(text) > 0
+            return
+        if self._started and (self._pending_space or text[:1].isspace()):
+            yield b" "
+        yield b" ".join(words)
+        self._started = True
+        self._pending_space = text[-1:].isspace()
+
+    def _end_text(self):
+        self._started = False
+        self._pending_space = False
+
+    def _feed(self, buffer: bytes, final: bool) -> typing.Iterator[bytes]:
+        """Process a chunk of the file, prefixed by the bytes held back
+        from the previous one.
+
+        buffer: the bytes to process.
+        final: whether we reached the end of the file.
+        yield: the corresponding pieces of the canonical text.
+
+        """
+        pos = 0
+
+        # Finish the decimal that was cut by the end of the last chunk.
+        if self._number is not None:
+            match = _DIGITS_RE.match(buffer)
+            self._number.add_digits(match.group())
+            pos = match.end()
+            if not self._number.fractional and buffer[pos:pos + 1] == b".":
+                self._number.add_point()
+                match = _DIGITS_RE.match(buffer, pos + 1)
+                self._number.add_digits(match.group())
+                pos = match.end()
+            if pos == len(buffer) and not final:
+                return
+            self.numbers.append(float(self._number))
+            self._number = None
+            yield _NUMBER_MARKER
+
+        # Fast path: if the part up to the last whitespace is made only
+        # of decimals separated by whitespaces, convert them all at once.
+        end = len(buffer)
+        if not final:
+            end = max(buffer.rfind(ws, pos) for ws in b" \t\n\x0b\x0c\r") + 1
+        words = buffer[pos:end].split()
+        if len(words) > 0 and all(map(_FIXED_DEC_RE.fullmatch, words)):
+            self._end_text()
+            self.numbers.extend(map(float, words))
+            yield _NUMBER_MARKER * len(words)
+            pos = end
+
+        # Split what is left in [text, number, ..., number, text].
+        parts = _FIXED_DEC_SPLIT_RE.split(buffer[pos:])
+        texts, numbers = parts[0::2], parts[1::2]
+        if not final and len(numbers) > 0 and len(texts[-1]) == 0:
+            # The last decimal might continue in the next chunk.
+            self._number = _LongDecimal(numbers.pop())
+            texts.pop()
+        elif not final:
+            # The end of the text might be the start of a decimal.
+            prefix = _DEC_PREFIX_RE.search(texts[-1])
+            if prefix is not None:
+                self._pending = prefix.group()
+                texts[-1] = texts[-1][:prefix.start()]
+
+        yield from self._text(texts[0])
+        if len(numbers) > 0:
+            self._end_text()
+            self.numbers.extend(map(float, numbers))
+            yield _NUMBER_MARKER.join(
+                [b"", *map(b" ".join, map(bytes.split, texts[1:-1])), b""])
+            yield from self._text(texts[-1])
+        if self._number is not None:
+            self._end_text()
 
 
 def _real_numbers_compare(
@@ -84,28 +268,45 @@ def _real_numbers_compare(
     1. They have the same sequence of text/number segments under the same splitting.
     2. Text segments match up to whitespace differences (white-diff semantics).
     3. Numeric segments match within absolute/relative tolerance.
-    """
-    output_data = output.read()
-    correct_data = correct.read()
-
-    # Split into [text, number, text, number, ...] parts;
-    # even indices: text, odd indices: numbers.
-    out_parts = re.split(rb'(' + _FIXED_DEC_PATTERN + rb')', output_data)
-    cor_parts = re.split(rb'(' + _FIXED_DEC_PATTERN + rb')', correct_data)
-
-    if len(out_parts) != len(cor_parts):
-        return False
 
+    The files are read in chunks and never kept entirely in memory:
+    the canonical texts (with a marker in place of each number) are
+    compared as streams, and the numbers are compared as soon as both
+    files provided them.
+    """
     eps = 10 ** (-(int(exponent)))
 
-    return all(
-        (
-            _white_diff_canonicalize(out_part) == _white_diff_canonicalize(cor_part)
-            if i % 2 == 0
-            else _compare_real_pair(float(out_part), float(cor_part), eps)
-        )
-        for i, (out_part, cor_part) in enumerate(zip(out_parts, cor_parts))
-    )
+    out_tokens = _Tokenizer(output)
+    cor_tokens = _Tokenizer(correct)
+    out_pieces = out_tokens.pieces()
+    cor_pieces = cor_tokens.pieces()
+    out_buf, cor_buf = b"", b""
+    out_pos, cor_pos = 0, 0
+    while True:
+        if out_pos == len(out_buf):
+            out_buf, out_pos = next(out_pieces, b""), 0
+        if cor_pos == len(cor_buf):
+            cor_buf, cor_pos = next(cor_pieces, b""), 0
+
+        out_numbers, cor_numbers = out_tokens.numbers, cor_tokens.numbers
+        count = min(len(out_numbers), len(cor_numbers))
+        if count > 0:
+            if not all(map(_compare_real_pair, out_numbers[:count],
+                           cor_numbers[:count], repeat(eps, count))):
+                return False
+            del out_numbers[:count]
+            del cor_numbers[:count]
+
+        if len(out_buf) == 0 or len(cor_buf) == 0:
+            # Same text with a marker for each number means same number
+            # of numbers, all of which have been compared by now.
+            return len(out_buf) == 0 and len(cor_buf) == 0
+        length = min(len(out_buf) - out_pos, len(cor_buf) - cor_pos)
+        if memoryview(out_buf)[out_pos:out_pos + length] \
+                != memoryview(cor_buf)[cor_pos:cor_pos + length]:
+            return False
+        out_pos += length
+        cor_pos += length
 
 
 def realprecision_diff_fobj_step(
@@ -26,6 +26,7 @@
 """High level functions to perform standardized white-diff comparison."""
 
 import logging
+import re
 import typing
 
 from cms.grading.Sandbox import Sandbox
@@ -38,38 +39,139 @@ logger = logging.getLogger(__name__)
 
 # We take as definition of whitespaces the list of Unicode White_Space
 # characters (see http://www.unicode.org/Public/6.3.0/ucd/PropList.txt) that
-# are in the ASCII range.
+# are in the ASCII range. These are exactly the characters recognized by
+# bytes.split() and bytes.isspace(), which we rely on.
 _WHITES = [b' ', b'\t', b'\n', b'\x0b', b'\x0c', b'\r']
 
 
-def _white_diff_canonicalize(string: bytes) -> bytes:
-    """Convert the input string to a canonical form for the white diff
-    algorithm; that is, the strings a and b are mapped to the same
-    string by _white_diff_canonicalize() if and only if they have to be
-    considered equivalent for the purposes of the white-diff
-    algorithm.
+# Size of the chunks in which files are read and compared.
+_CHUNK_SIZE = 256 * 1024
 
-    More specifically, this function strips all the leading and
-    trailing whitespaces from s and collapse all the runs of
-    consecutive whitespaces into just one copy of one specific
-    whitespace.
 
-    string: the string to canonicalize.
-    return: the canonicalized string.
+def _read_chunks(fobj: typing.BinaryIO) -> typing.Iterator[bytes]:
+    """Read a file in chunks of at most _CHUNK_SIZE bytes.
+
+    fobj: the file to read.
+    yield: the non-empty chunks, in order.
+
+    """
+    while True:
+        chunk = fobj.read(_CHUNK_SIZE)
+        if len(chunk) == 0:
+            return
+        yield chunk
+
+
+def _newlines(count: int) -> typing.Iterator[bytes]:
+    """Yield count newlines, in pieces of bounded size."""
+    while count > 0:
+        yield b"\n" * min(count, _CHUNK_SIZE)
+        count -= _CHUNK_SIZE
+
+
+# Translation table mapping the whitespaces other than newline to spaces.
+_TO_SPACES = bytes.maketrans(b"".join(_WHITES[1:2] + _WHITES[3:]),
+                             b" " * (len(_WHITES) - 2))
+_SPACE_RUN_RE = re.compile(rb"  +")
+
+
+def _white_diff_canonicalize(fobj: typing.BinaryIO) -> typing.Iterator[bytes]:
+    """Convert the content of a file to a canonical form for the white
+    diff algorithm; that is, two files are mapped to the same sequence
+    of bytes if and only if they have to be considered equivalent for
+    the purposes of the white-diff algorithm.
+
+    More specifically, the canonical form has the tokens (maximal runs
+    of non-whitespaces) of each line separated by a single space, the
+    lines separated by a single newline, and no leading whitespaces on
+    a line nor trailing empty lines.
+
+    The file is read in chunks, and the canonical form is produced in
+    pieces of size comparable to the chunks, so that memory usage is
+    bounded even with huge lines or tokens.
+
+    fobj: the file to canonicalize.
+    yield: consecutive pieces of the canonical form.
+
+    """
+    # Whether we already produced a token.
+    started = False
+    # Newlines and other whitespaces seen since the last token.
+    pending_newlines = 0
+    pending_space = False
+
+    for chunk in _read_chunks(fobj):
+        # Canonicalize the whitespaces inside the chunk; only those at
+        # its ends might need to be merged with the adjacent chunks. We
+        # avoid the (slower) regular expression in the common case of
+        # tokens separated by single spaces.
+        chunk = chunk.translate(_TO_SPACES)
+        if b"  " in chunk:
+            chunk = _SPACE_RUN_RE.sub(b" ", chunk)
+        chunk = chunk.replace(b" \n", b"\n").replace(b"\n ", b"\n")
+        core = chunk.strip()
+        if len(core) == 0:
+            pending_newlines += chunk.count(b"\n")
+            pending_space = pending_space or len(chunk) > 0
+            continue
+
+        leading = chunk[:len(chunk) - len(chunk.lstrip())]
+        pending_newlines += leading.count(b"\n")
+        pending_space = pending_space or len(leading) > 0
+        if pending_newlines > 0:
+            yield from _newlines(pending_newlines)
+        elif started and pending_space:
+            yield b" "
+        yield core
+
+        trailing = chunk[len(leading) + len(core):]
+        started = True
+        pending_newlines = trailing.count(b"\n")
+        pending_space = len(trailing) > 0
+
+
+def _same_stream(a: typing.Iterable[bytes], b: typing.Iterable[bytes]) -> bool:
+    """Compare two streams of bytes, each given as a sequence of
+    pieces, which may be split at different points.
+
+    a: the pieces of the first stream.
+    b: the pieces of the second stream.
+    return: whether the concatenations of the pieces are equal.
 
     """
-    # Replace all the whitespaces with copies of " ", making the rest
-    # of the algorithm simpler
-    for char in _WHITES[1:]:
-        string = string.replace(char, _WHITES[0])
+    a = iter(a)
+    b = iter(b)
+    buf_a, buf_b = b"", b""
+    pos_a, pos_b = 0, 0
+    while True:
+        if pos_a == len(buf_a):
+            buf_a, pos_a = next(a, b""), 0
+        if pos_b == len(buf_b):
+            buf_b, pos_b = next(b, b""), 0
+        if len(buf_a) == 0 or len(buf_b) == 0:
+            # One of the streams finished: they are equal if the other
+            # finished too.
+            return len(buf_a) == 0 and len(buf_b) == 0
+        length = min(len(buf_a) - pos_a, len(buf_b) - pos_b)
+        if memoryview(buf_a)[pos_a:pos_a + length] \
+                != memoryview(buf_b)[pos_b:pos_b + length]:
+            return False
+        pos_a += length
+        pos_b += length
+
+
+def _tell(fobj: typing.BinaryIO) -> int | None:
+    """Return the current position in a file, if it is seekable.
+
+    return: the position, or None if we cannot seek back to it.
 
-    # Split the string according to " ", filter out empty tokens and
-    # join again the string using just one copy of the first
-    # whitespace; this way, runs of more than one whitespaces are
-    # collapsed into just one copy.
-    string = _WHITES[0].join([x for x in string.split(_WHITES[0])
-                              if len(x) > 0])
-    return string
+    """
+    try:
+        if fobj.seekable():
+            return fobj.tell()
+    except (AttributeError, OSError):
+        pass
+    return None
 
 
 def _white_diff(output: typing.BinaryIO, res: typing.BinaryIO) -> bool:
@@ -83,34 +185,24 @@ def _white_diff(output: typing.BinaryIO, res: typing.BinaryIO) -> bool:
     'sequence of characters ending with \n or EOF and beginning right
     after BOF or \n'. In particular, every line has *at most* one \n.
 
+    The files are first compared byte by byte, as identical files are
+    the common case; only if they differ they are compared again in
+    their canonical forms. Either way, the files are read in chunks
+    and never kept entirely in memory.
+
     output: the first file to compare.
     res: the second file to compare.
     return: True if the two file are equal as explained above.
 
     """
-
-    while True:
-        lout = output.readline()
-        lres = res.readline()
-
-        # Both files finished: comparison succeded
-        if len(lres) == 0 and len(lout) == 0:
+    output_start, res_start = _tell(output), _tell(res)
+    if output_start is not None and res_start is not None:
+        if _same_stream(_read_chunks(output), _read_chunks(res)):
             return True
-
-        # Only one file finished: ok if the other contains only blanks
-        elif len(lres) == 0 or len(lout) == 0:
-            lout = lout.strip(b''.join(_WHITES))
-            lres = lres.strip(b''.join(_WHITES))
-            if len(lout) > 0 or len(lres) > 0:
-                return False
-
-        # Both file still have lines to go: ok if they agree except
-        # for the number of whitespaces
-        else:
-            lout = _white_diff_canonicalize(lout)
-            lres = _white_diff_canonicalize(lres)
-            if lout != lres:
-                return False
+        output.seek(output_start)
+        res.seek(res_start)
+    return _same_stream(_white_diff_canonicalize(output),
+                        _white_diff_canonicalize(res))
 
 
 def white_diff_fobj_step(
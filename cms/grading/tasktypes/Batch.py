@@ -90,6 +90,7 @@ class Batch(TaskType):
 
     # Other constants to specify the task type behaviour and parameters.
     ALLOW_PARTIAL_SUBMISSION = False
+    DEDUPLICATE_EVALUATIONS = True
 
     _COMPILATION = ParameterTypeChoice(
         "Compilation",
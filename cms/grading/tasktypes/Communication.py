@@ -97,6 +97,7 @@ class Communication(TaskType):
     USER_IO_FIFOS = "fifo_io"
 
     ALLOW_PARTIAL_SUBMISSION = False
+    DEDUPLICATE_EVALUATIONS = True
 
     _NUM_PROCESSES = ParameterTypeInt(
         "Number of Processes",
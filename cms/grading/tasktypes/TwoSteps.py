@@ -77,6 +77,7 @@ class TwoSteps(TaskType):
     OUTPUT_EVAL_CHECKER = "comparator"
 
     ALLOW_PARTIAL_SUBMISSION = False
+    DEDUPLICATE_EVALUATIONS = True
 
     _EVALUATION = ParameterTypeChoice(
         "Output evaluation",
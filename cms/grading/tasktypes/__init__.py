@@ -24,7 +24,7 @@ import logging
 
 from cms import plugin_list
 from .abc import TaskType
-from .util import create_sandbox, delete_sandbox, \
+from .util import create_sandbox, delete_sandbox, sandbox_pool, \
     is_manager_for_compilation, set_configuration_error, \
     check_executables_number, check_files_number, check_manager_present, \
     eval_output
@@ -38,7 +38,7 @@ __all__ = [
     # abc
     "TaskType",
     # util
-    "create_sandbox", "delete_sandbox",
+    "create_sandbox", "delete_sandbox", "sandbox_pool",
     "is_manager_for_compilation", "set_configuration_error",
     "check_executables_number", "check_files_number", "check_manager_present",
     "eval_output",
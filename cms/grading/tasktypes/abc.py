@@ -66,6 +66,12 @@ class TaskType(metaclass=ABCMeta):
     ALLOW_PARTIAL_SUBMISSION = False
     REUSE_PREVIOUS_SUBMISSION = True
 
+    # If DEDUPLICATE_EVALUATIONS is True, the outcome of an evaluation
+    # depends only on the executables of the submission (besides the
+    # dataset and the testcase), so ES can copy it from a submission
+    # with identical executables instead of evaluating again.
+    DEDUPLICATE_EVALUATIONS = False
+
     # A list of all the accepted parameters for this task type.
     # Each item is an instance of TaskTypeParameter.
     ACCEPTED_PARAMETERS: list[ParameterType] = []
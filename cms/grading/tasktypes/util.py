@@ -32,6 +32,8 @@ compilation and the evaluation are contained in the task type class.
 import logging
 import os
 import shutil
+from collections.abc import Iterator
+from contextlib import contextmanager
 from typing import Callable, Optional
 
 from cms import config
@@ -50,9 +52,186 @@ logger = logging.getLogger(__name__)
 EVAL_USER_OUTPUT_FILENAME = "user_output.txt"
 
 
+class SandboxPool:
+    """A set of idle sandboxes, to be reused instead of creating new
+    ones.
+
+    Creating and deleting a sandbox is expensive (for isolate, it means
+    several process spawns), and a job group might contain many small
+    jobs, e.g., one per testcase. Sandboxes that would be deleted are
+    instead reset (which empties them) and kept for the following job
+    asking for a sandbox with the same name.
+
+    Sandboxes are only reused among the jobs of the same submission (or
+    user test): a reset sandbox keeps its isolate box, and we don't want
+    anything left there by a submission to be seen by another one.
+
+    The pool also cleans up the sandboxes that a job acquired and never
+    gave back (e.g., because it raised), so that their isolate boxes
+    don't stay in use.
+
+    """
+
+    # Maximum number of idle sandboxes kept. Isolate box ids are
+    # assigned in a small range per worker, so we cannot keep too many
+    # boxes alive at once.
+    MAX_IDLE_SANDBOXES = 4
+
+    def __init__(self, reuse: bool = True):
+        """Create an empty pool.
+
+        reuse: whether to keep the released sandboxes for later use; if
+            not, the pool only cleans up those never released.
+
+        """
+        self._reuse = reuse
+        self._idle: dict[tuple[int, str | None], list[Sandbox]] = {}
+        self._num_idle = 0
+        # Sandboxes given out by acquire() that are not yet released,
+        # by their id.
+        self._acquired: dict[int, Sandbox] = {}
+        # The submission or user test the idle sandboxes were used for.
+        self._owner: tuple[bool, int] | None = None
+        self.created = 0
+        self.reused = 0
+
+    def acquire(self, file_cacher: FileCacher, name: str | None) -> Sandbox:
+        """Return an idle sandbox if available, or a new one.
+
+        file_cacher: a file cacher instance.
+        name: name to include in the path of the sandbox.
+
+        return: a sandbox.
+
+        raise (OSError): if the sandbox needs to be created and that
+            fails.
+
+        """
+        idle = self._idle.get((id(file_cacher), name))
+        if idle:
+            sandbox = idle.pop()
+            self._num_idle -= 1
+            self.reused += 1
+        else:
+            sandbox = Sandbox(file_cacher, name=name)
+            self.created += 1
+        self._acquired[id(sandbox)] = sandbox
+        return sandbox
+
+    def start_job(self, job: Job):
+        """Tell the pool that the following sandboxes are for a job.
+
+        The sandboxes not released by the previous job are cleaned up.
+        If the job is for a different submission (or user test) than
+        the previous one, the idle sandboxes are deleted.
+
+        job: the job about to be executed.
+
+        """
+        self.reclaim()
+        owner = None
+        if job.operation is not None:
+            owner = (job.operation.for_submission(), job.operation.object_id)
+        if owner != self._owner or owner is None:
+            self.close()
+        self._owner = owner
+
+    def release(self, sandbox: Sandbox, reuse: bool = True) -> bool:
+        """Reset a sandbox and keep it for later use, if possible.
+
+        sandbox: a sandbox obtained from acquire().
+        reuse: whether the sandbox can be deleted, and thus reused.
+
+        return: whether the pool took the sandbox; if not, the caller
+            is responsible for cleaning it up.
+
+        """
+        if self._acquired.pop(id(sandbox), None) is None:
+            return False
+        if not self._reuse or not reuse \
+                or self._num_idle >= SandboxPool.MAX_IDLE_SANDBOXES:
+            return False
+        try:
+            sandbox.reset()
+        except Exception:
+            logger.warning("Couldn't reset sandbox %s, deleting it.",
+                           sandbox.get_root_path(), exc_info=True)
+            return False
+        self._idle.setdefault(
+            (id(sandbox.file_cacher), sandbox.name), []).append(sandbox)
+        self._num_idle += 1
+        return True
+
+    def reclaim(self):
+        """Clean up the sandboxes acquired and never released.
+
+        They are not deleted, as for failed jobs, to help debugging
+        whatever went wrong.
+
+        """
+        for sandbox in self._acquired.values():
+            logger.warning("Sandbox %s was not released, cleaning it up.",
+                           sandbox.get_root_path())
+            try:
+                sandbox.cleanup()
+            except Exception:
+                logger.warning("Couldn't clean up sandbox.", exc_info=True)
+        self._acquired = {}
+
+    def close(self):
+        """Clean up the sandboxes not released and delete the idle
+        ones.
+
+        """
+        self.reclaim()
+        for sandboxes in self._idle.values():
+            for sandbox in sandboxes:
+                try:
+                    sandbox.cleanup(delete=True)
+                except OSError:
+                    logger.warning("Couldn't delete sandbox.", exc_info=True)
+        self._idle = {}
+        self._num_idle = 0
+
+
+# The pool used by create_sandbox and delete_sandbox, if any.
+_sandbox_pool: SandboxPool | None = None
+
+
+@contextmanager
+def sandbox_pool() -> Iterator[SandboxPool | None]:
+    """Reuse sandboxes among the jobs executed in the context.
+
+    Meant to wrap the execution of a job group: sandboxes are created
+    lazily by create_sandbox as usual, but those that delete_sandbox
+    would delete are kept and handed out again; they are deleted for
+    real on exiting the context. If disabled in the configuration, the
+    sandboxes are not reused, but those that the jobs don't release are
+    still cleaned up. Does nothing if a pool is already active.
+
+    yield: the pool, or None if a pool is already active.
+
+    """
+    global _sandbox_pool
+    if _sandbox_pool is not None:
+        yield None
+        return
+    pool = SandboxPool(config.worker.reuse_sandboxes)
+    _sandbox_pool = pool
+    try:
+        yield pool
+    finally:
+        _sandbox_pool = None
+        pool.close()
+        logger.debug("Sandbox pool closed: %d sandboxes created, %d reused.",
+                     pool.created, pool.reused)
+
+
 def create_sandbox(file_cacher: FileCacher, name: Optional[str] = None) -> Sandbox:
     """Create a sandbox, and return it.
 
+    If inside sandbox_pool(), an idle sandbox might be returned instead.
+
     file_cacher: a file cacher instance.
     name: name to include in the path of the sandbox.
 
@@ -62,6 +241,8 @@ def create_sandbox(file_cacher: FileCacher, name: Optional[str] = None) -> Sandb
 
     """
     try:
+        if _sandbox_pool is not None:
+            return _sandbox_pool.acquire(file_cacher, name)
         sandbox = Sandbox(file_cacher, name=name)
     except OSError:
         err_msg = "Couldn't create sandbox."
@@ -94,6 +275,8 @@ def delete_sandbox(sandbox: Sandbox, job: Job, success: bool | None = None):
                        sandbox.get_root_path())
 
     delete = success and not config.worker.keep_sandbox and not job.keep_sandbox
+    if _sandbox_pool is not None and _sandbox_pool.release(sandbox, delete):
+        return
     try:
         sandbox.cleanup(delete=delete)
     except OSError:
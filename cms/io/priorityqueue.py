@@ -36,6 +36,9 @@ between entries with the same priority.
 The queue stores entries in the QueueEntry format, a class that stores
 together the three data point: item, priority, and timestamp.
 
+FairPriorityQueue partitions the items among tenants (e.g., contests)
+and shares the extractions among them according to their weights.
+
 """
 
 from datetime import datetime
@@ -398,6 +401,235 @@ class PriorityQueue(typing.Generic[QueueItemT]):
                 for entry in self._queue]
 
 
+class FairPriorityQueue(PriorityQueue[QueueItemT]):
+
+    """A priority queue sharing the extractions among tenants.
+
+    Each item belongs to a tenant (e.g., a contest), given by a
+    function of the item, and each tenant has its own priority queue.
+    Extraction follows the priorities first: an item is never extracted
+    while another tenant has an item with a higher priority. Among the
+    tenants whose top items have the same priority, the extractions are
+    shared by weighted fair queuing: each tenant has a virtual time that
+    grows by 1/weight at each of its extractions, and the tenant with
+    the lowest virtual time goes first. A tenant that had no items
+    restarts from the virtual time of the last extraction, so it
+    cannot accumulate credit while idle.
+
+    Extractions can also continue the previous one (e.g., to fill a
+    batch of items to execute together): they take the items of the
+    same tenant as long as priorities allow, and the tenant is charged
+    only once for all of them.
+
+    The order of the items of the same tenant is the same as in
+    PriorityQueue.
+
+    """
+
+    def __init__(
+        self,
+        tenant_of: typing.Callable[[QueueItemT], str],
+        weight_of: typing.Callable[[str], float] | None = None,
+    ):
+        """Create a fair priority queue.
+
+        tenant_of: function returning the tenant of an item.
+        weight_of: function returning the (positive) weight of a
+            tenant, or None to give the same weight to all of them.
+            It is called at each extraction, so weights can change
+            while the queue is in use.
+
+        """
+        super().__init__()
+
+        self._tenant_of = tenant_of
+        self._weight_of = weight_of
+
+        # The queues of the tenants with some items.
+        self._tenants: dict[str, PriorityQueue[QueueItemT]] = {}
+
+        # The tenant of each item in the queue.
+        self._item_tenant: dict[QueueItemT, str] = {}
+
+        # The virtual time of each tenant with some items, and the one
+        # of the last extraction.
+        self._virtual_times: dict[str, float] = {}
+        self._virtual_time = 0.0
+
+        # The tenant of the last extraction.
+        self._last_tenant: str | None = None
+
+    def __len__(self):
+        return len(self._item_tenant)
+
+    def _verify(self) -> bool:
+        """Make sure that the internal state of the queue is consistent.
+
+        This is used only for testing.
+
+        """
+        if len(self._item_tenant) != \
+                sum(len(queue) for queue in self._tenants.values()):
+            return False
+        if self._event.isSet() == self.empty():
+            return False
+        for tenant, queue in self._tenants.items():
+            if queue.empty() or not queue._verify():
+                return False
+        for item, tenant in self._item_tenant.items():
+            if item not in self._tenants[tenant]:
+                return False
+        return True
+
+    def __contains__(self, item: QueueItemT) -> bool:
+        return item in self._item_tenant
+
+    def _weight(self, tenant: str) -> float:
+        if self._weight_of is None:
+            return 1.0
+        return self._weight_of(tenant)
+
+    def _top_tenant(self) -> str:
+        """Return the tenant whose top item is the next to extract.
+
+        raise (LookupError): on empty queue.
+
+        """
+        if self.empty():
+            raise LookupError("Empty queue.")
+        return min(self._tenants, key=lambda tenant: (
+            self._tenants[tenant].top().priority,
+            self._virtual_times[tenant],
+            self._tenants[tenant].top().timestamp))
+
+    def push(
+        self,
+        item: QueueItemT,
+        priority: int | None = None,
+        timestamp: datetime | None = None,
+    ) -> bool:
+        """Push an item in the queue of its tenant.
+
+        See PriorityQueue.push.
+
+        """
+        if item in self._item_tenant:
+            return False
+
+        tenant = self._tenant_of(item)
+        if tenant not in self._tenants:
+            self._tenants[tenant] = PriorityQueue()
+            self._virtual_times[tenant] = self._virtual_time
+        self._tenants[tenant].push(item, priority, timestamp)
+        self._item_tenant[item] = tenant
+
+        # Signal to listener greenlets that there might be something.
+        self._event.set()
+
+        return True
+
+    def top(self, wait: bool = False) -> QueueEntry[QueueItemT]:
+        """Return the first element in the queue without extracting it.
+
+        See PriorityQueue.top.
+
+        """
+        if self.empty() and wait:
+            while self.empty():
+                self._event.wait()
+        return self._tenants[self._top_tenant()].top()
+
+    def pop(
+        self, wait: bool = False, continue_last: bool = False
+    ) -> QueueEntry[QueueItemT]:
+        """Extract (and return) the first element in the queue,
+        charging its tenant for it.
+
+        continue_last: if True, and the tenant of the last extraction
+            has an item with the highest priority in the queue, extract
+            that instead, without charging the tenant again.
+
+        See PriorityQueue.pop.
+
+        """
+        if self.empty() and wait:
+            while self.empty():
+                self._event.wait()
+        tenant = self._top_tenant()
+        last = self._last_tenant
+        if continue_last and last in self._tenants \
+                and self._tenants[last].top().priority \
+                == self._tenants[tenant].top().priority:
+            tenant = last
+        else:
+            self._virtual_time = self._virtual_times[tenant]
+            self._virtual_times[tenant] += 1.0 / self._weight(tenant)
+        self._last_tenant = tenant
+        entry = self._tenants[tenant].pop()
+        self._forget(entry.item, tenant)
+        return entry
+
+    def remove(self, item: QueueItemT) -> QueueEntry[QueueItemT]:
+        """Remove an item from the queue. Raise a KeyError if not present.
+
+        See PriorityQueue.remove.
+
+        """
+        tenant = self._item_tenant[item]
+        entry = self._tenants[tenant].remove(item)
+        self._forget(item, tenant)
+        return entry
+
+    def _forget(self, item: QueueItemT, tenant: str):
+        """Clean up after an item left the queue of its tenant."""
+        del self._item_tenant[item]
+        if self._tenants[tenant].empty():
+            # When it has items again, it restarts from _virtual_time.
+            del self._tenants[tenant]
+            del self._virtual_times[tenant]
+        if self.empty():
+            self._event.clear()
+
+    def set_priority(self, item: QueueItemT, priority: int):
+        """Change the priority of an item inside the queue.
+
+        See PriorityQueue.set_priority.
+
+        """
+        self._tenants[self._item_tenant[item]].set_priority(item, priority)
+
+    def length(self) -> int:
+        return len(self._item_tenant)
+
+    def get_status(self) -> list[QueueEntryDict]:
+        """Return the content of the queue. Note that the order may be not
+        correct, but the first element is the one at the top.
+
+        See PriorityQueue.get_status.
+
+        """
+        if self.empty():
+            return []
+        top_tenant = self._top_tenant()
+        status = self._tenants[top_tenant].get_status()
+        for tenant, queue in self._tenants.items():
+            if tenant != top_tenant:
+                status.extend(queue.get_status())
+        return status
+
+    def get_tenants_status(self) -> dict[str, dict]:
+        """Return the status of the tenants with some items.
+
+        return: for each tenant, the number of its items in the
+            queue, its weight and its virtual time.
+
+        """
+        return {tenant: {'length': len(queue),
+                         'weight': self._weight(tenant),
+                         'virtual_time': self._virtual_times[tenant]}
+                for tenant, queue in self._tenants.items()}
+
+
 # Fake objects for testing follow.
 
 
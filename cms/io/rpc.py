@@ -25,6 +25,7 @@ import functools
 import json
 import logging
 import socket
+import struct
 import traceback
 from typing import Any
 import typing
@@ -36,6 +37,11 @@ import gevent.event
 import gevent.lock
 import gevent.socket
 
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
 from cms.conf import Address, ServiceCoord
 from cms.util import get_service_address
 
@@ -51,6 +57,59 @@ class RPCError(Exception):
     pass
 
 
+# Encodings of the messages. JSON messages are terminated by "\r\n"
+# and are the only ones understood by old peers; messages in the other
+# encodings are preceded by a header with a tag for the encoding and the
+# length of the payload. Clients ask the server which encoding to use
+# for their requests when they connect, and servers respond to each
+# request in its own encoding.
+ENCODING_JSON = "json"
+ENCODING_MSGPACK = "msgpack"
+
+_FRAME_HEADER = struct.Struct("!cI")
+_FRAME_TAGS = {ENCODING_MSGPACK: b"M"}
+_TAG_ENCODINGS = {tag: encoding for encoding, tag in _FRAME_TAGS.items()}
+
+# Name of the RPC through which the encoding is negotiated. It is
+# served by the connection, not by the service.
+_NEGOTIATE_METHOD = "_negotiate_encoding"
+
+
+def _encode(message: dict, encoding: str) -> bytes:
+    """Serialize a message in the given encoding.
+
+    message: the message to serialize.
+    encoding: one of the ENCODING_* constants.
+
+    return: the serialized message.
+
+    raise (TypeError, ValueError): if the message cannot be encoded.
+
+    """
+    if encoding == ENCODING_MSGPACK:
+        try:
+            return msgpack.packb(message)
+        except OverflowError as error:
+            raise ValueError(error) from error
+    return json.dumps(message).encode("utf-8")
+
+
+def _decode(data: bytes, encoding: str) -> Any:
+    """Deserialize a message in the given encoding.
+
+    data: the serialized message.
+    encoding: one of the ENCODING_* constants.
+
+    return: the message.
+
+    raise (TypeError, ValueError): if the data cannot be decoded.
+
+    """
+    if encoding == ENCODING_MSGPACK:
+        return msgpack.unpackb(data, strict_map_key=False)
+    return json.loads(data.decode("utf-8"))
+
+
 _T = typing.TypeVar("_T", bound=Callable)
 
 
@@ -88,6 +147,10 @@ class RemoteServiceBase:
     # attacks. XXX Check that this size is sensible.
     MAX_MESSAGE_SIZE = 1024 * 1024
 
+    # The encodings we can use, in order of preference.
+    ENCODINGS = [ENCODING_JSON] if msgpack is None \
+        else [ENCODING_MSGPACK, ENCODING_JSON]
+
     def __init__(self, remote_address: Address):
         """Prepare to handle a connection with the given remote address.
 
@@ -170,6 +233,9 @@ class RemoteServiceBase:
             raise RuntimeError("Already connected.")
 
         self._socket = sock
+        # Each message is written and flushed at once: delaying it to
+        # coalesce it with the next ones would only add latency.
+        self._socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
         self._reader = self._socket.makefile('rb')
         self._writer = self._socket.makefile('wb')
         self._connection_event.set()
@@ -230,13 +296,16 @@ class RemoteServiceBase:
             self.finalize(reason=reason)
         return True
 
-    def _read(self) -> bytes:
+    def _read(self) -> tuple[bytes, str]:
         """Receive a message from the socket.
 
-        Read from the socket until a "\\r\\n" is found. That is what we
-        consider a "message" in the communication protocol.
+        A JSON message is read until a "\\r\\n" is found, a message in
+        another encoding is read after its header, up to the length the
+        header declares. That is what we consider a "message" in the
+        communication protocol.
 
-        return: the retrieved message.
+        return: the retrieved message, empty if the connection was
+            closed, and its encoding.
 
         raise (OSError): if reading fails.
 
@@ -248,11 +317,30 @@ class RemoteServiceBase:
             with self._read_lock:
                 if not self.connected:
                     raise OSError("Not connected.")
-                data = self._reader.readline(self.MAX_MESSAGE_SIZE)
-                # If there weren't a "\r\n" between the last message
-                # and the EOF we would have a false positive here.
-                # Luckily there is one.
-                if len(data) > 0 and not data.endswith(b"\r\n"):
+                tag = self._reader.read(1)
+                encoding = _TAG_ENCODINGS.get(tag, ENCODING_JSON)
+                if encoding == ENCODING_JSON:
+                    data = tag
+                    if len(tag) > 0:
+                        data += self._reader.readline(
+                            self.MAX_MESSAGE_SIZE - len(tag))
+                    # If there weren't a "\r\n" between the last message
+                    # and the EOF we would have a false positive here.
+                    # Luckily there is one.
+                    too_long = len(data) > 0 and not data.endswith(b"\r\n")
+                else:
+                    header = tag + self._reader.read(_FRAME_HEADER.size - 1)
+                    if len(header) < _FRAME_HEADER.size:
+                        raise OSError("Connection closed inside a message.")
+                    _, length = _FRAME_HEADER.unpack(header)
+                    too_long = \
+                        _FRAME_HEADER.size + length > self.MAX_MESSAGE_SIZE
+                    if not too_long:
+                        data = self._reader.read(length)
+                        if len(data) < length:
+                            raise OSError(
+                                "Connection closed inside a message.")
+                if too_long:
                     logger.error(
                         "The client sent a message larger than %d bytes (that "
                         "is MAX_MESSAGE_SIZE). Consider raising that value if "
@@ -267,16 +355,19 @@ class RemoteServiceBase:
             else:
                 # The client was terminated willingly; its correct termination
                 # is handled in disconnect(), so here we can just return.
-                return b""
+                return b"", ENCODING_JSON
 
-        return data
+        return data, encoding
 
-    def _write(self, data: bytes):
+    def _write(self, data: bytes, encoding: str = ENCODING_JSON):
         """Send a message to the socket.
 
-        Automatically append "\\r\\n" to make it a correct message.
+        Automatically append "\\r\\n" to a JSON message, or prepend
+        the header to a message in another encoding, to make it a
+        correct message.
 
         data: the message to transmit.
+        encoding: the encoding of the message.
 
         raise (OSError): if writing fails.
 
@@ -284,7 +375,13 @@ class RemoteServiceBase:
         if not self.connected:
             raise OSError("Not connected.")
 
-        if len(data + b'\r\n') > self.MAX_MESSAGE_SIZE:
+        if encoding == ENCODING_JSON:
+            prefix, suffix = b"", b"\r\n"
+        else:
+            prefix = _FRAME_HEADER.pack(_FRAME_TAGS[encoding], len(data))
+            suffix = b""
+
+        if len(prefix) + len(data) + len(suffix) > self.MAX_MESSAGE_SIZE:
             logger.error(
                 "A message wasn't sent to %r because it was larger than %d "
                 "bytes (that is MAX_MESSAGE_SIZE). Consider raising that "
@@ -298,7 +395,9 @@ class RemoteServiceBase:
                 if not self.connected:
                     raise OSError("Not connected.")
                 # Does the same as self._socket.sendall.
-                self._writer.write(data + b'\r\n')
+                self._writer.write(prefix)
+                self._writer.write(data)
+                self._writer.write(suffix)
                 self._writer.flush()
         except OSError as error:
             self.finalize("Write failed.")
@@ -354,7 +453,7 @@ class RemoteServiceServer(RemoteServiceBase):
         """
         while True:
             try:
-                data = self._read()
+                data, encoding = self._read()
             except OSError:
                 break
 
@@ -362,34 +461,54 @@ class RemoteServiceServer(RemoteServiceBase):
                 self.finalize("Connection closed.")
                 break
 
-            gevent.spawn(self.process_data, data)
+            gevent.spawn(self.process_data, data, encoding)
 
-    def process_data(self, data: bytes):
+    def process_data(self, data: bytes, encoding: str = ENCODING_JSON):
         """Handle the message.
 
-        JSON-decode it and forward it to process_incoming_request
+        Decode it and forward it to process_incoming_request
         (unconditionally!).
 
         data: the message read from the socket.
+        encoding: the encoding of the message.
 
         """
         # Decode the incoming data.
         try:
-            message = json.loads(data.decode('utf-8'))
-        except ValueError:
+            message = _decode(data, encoding)
+        except (TypeError, ValueError):
             self.disconnect("Bad request received")
             logger.warning("Cannot parse incoming message, discarding.")
             return
 
-        self.process_incoming_request(message)
+        self.process_incoming_request(message, encoding)
+
+    @rpc_method
+    def _negotiate_encoding(self, encodings: list[str]) -> str:
+        """Choose the encoding of the requests of the client.
+
+        encodings: the encodings the client can use, in its order
+            of preference.
+
+        return: the first of them that we can use too.
 
-    def process_incoming_request(self, request: dict):
+        """
+        for encoding in encodings:
+            if encoding in self.ENCODINGS:
+                return encoding
+        return ENCODING_JSON
+
+    def process_incoming_request(
+        self, request: dict, encoding: str = ENCODING_JSON
+    ):
         """Handle the request.
 
         Parse the request, execute the method it asks for, format the
         result and send the response.
 
-        request: the JSON-decoded request.
+        request: the decoded request.
+        encoding: the encoding of the request, which is also used
+            for the response.
 
         """
         # Validate the request.
@@ -410,11 +529,13 @@ class RemoteServiceServer(RemoteServiceBase):
                     "__error": None}
 
         method_name = request["__method"]
+        target = self if method_name == _NEGOTIATE_METHOD \
+            else self.local_service
 
-        if not hasattr(self.local_service, method_name):
+        if not hasattr(target, method_name):
             response["__error"] = "Method %s doesn't exist." % method_name
         else:
-            method = getattr(self.local_service, method_name)
+            method = getattr(target, method_name)
 
             if not getattr(method, "rpc_callable", False):
                 response["__error"] = "Method %s isn't callable." % method_name
@@ -428,14 +549,14 @@ class RemoteServiceServer(RemoteServiceBase):
 
         # Encode it.
         try:
-            data = json.dumps(response).encode('utf-8')
+            data = _encode(response, encoding)
         except (TypeError, ValueError):
-            logger.warning("JSON encoding failed.", exc_info=True)
+            logger.warning("Encoding of the response failed.", exc_info=True)
             return
 
         # Send it.
         try:
-            self._write(data)
+            self._write(data, encoding)
         except OSError:
             # Log messages have already been produced.
             return
@@ -481,6 +602,9 @@ class RemoteServiceClient(RemoteServiceBase):
 
         self._loop = None
 
+        # The encoding of our requests, agreed with the server.
+        self._encoding = ENCODING_JSON
+
     def _repr_remote(self):
         """See RemoteServiceBase._repr_remote."""
         return f"{self.remote_address} ({self.remote_service_coord})"
@@ -489,6 +613,7 @@ class RemoteServiceClient(RemoteServiceBase):
         """See RemoteServiceBase.finalize."""
         super().finalize(reason)
 
+        self._encoding = ENCODING_JSON
         for result in self.pending_outgoing_requests_results.values():
             result.set_exception(RPCError(reason))
 
@@ -521,8 +646,39 @@ class RemoteServiceClient(RemoteServiceBase):
                              self._repr_remote(), host, port, error)
             else:
                 self.initialize(sock, self.remote_service_coord)
+                self._negotiate()
                 break
 
+    def _negotiate(self):
+        """Ask the server which encoding to use for the requests.
+
+        Requests are sent as JSON until the server answers. Servers
+        that predate the negotiation answer with an error, as for any
+        unknown method, and keep receiving JSON.
+
+        """
+        if self.ENCODINGS[0] == ENCODING_JSON:
+            return
+        result = self.execute_rpc(_NEGOTIATE_METHOD,
+                                  {"encodings": self.ENCODINGS})
+        result.rawlink(functools.partial(self._on_negotiated, self._socket))
+
+    def _on_negotiated(
+        self, socket_: socket.socket, result: gevent.event.AsyncResult
+    ):
+        """Switch to the encoding chosen by the server.
+
+        socket_: the socket of the connection the negotiation was
+            performed on, to ignore answers arriving after it closed.
+        result: the result of the negotiation.
+
+        """
+        if result.successful() and self._socket is socket_ \
+                and result.value in self.ENCODINGS:
+            self._encoding = result.value
+            logger.debug("Using %s encoding with %s.",
+                         self._encoding, self._repr_remote())
+
     def _run(self):
         """Maintain the connection up, if required.
 
@@ -562,7 +718,7 @@ class RemoteServiceClient(RemoteServiceBase):
         """
         while True:
             try:
-                data = self._read()
+                data, encoding = self._read()
             except OSError:
                 break
 
@@ -570,21 +726,22 @@ class RemoteServiceClient(RemoteServiceBase):
                 self.finalize("Connection closed.")
                 break
 
-            gevent.spawn(self.process_data, data)
+            gevent.spawn(self.process_data, data, encoding)
 
-    def process_data(self, data: bytes):
+    def process_data(self, data: bytes, encoding: str = ENCODING_JSON):
         """Handle the message.
 
-        JSON-decode it and forward it to process_incoming_response
+        Decode it and forward it to process_incoming_response
         (unconditionally!).
 
         data: the message read from the socket.
+        encoding: the encoding of the message.
 
         """
         # Decode the incoming data.
         try:
-            message = json.loads(data.decode('utf-8'))
-        except ValueError:
+            message = _decode(data, encoding)
+        except (TypeError, ValueError):
             self.disconnect("Bad response received")
             logger.warning("Cannot parse incoming message, discarding.")
             return
@@ -597,7 +754,7 @@ class RemoteServiceClient(RemoteServiceBase):
         Parse the response, determine the request it's for and its
         associated result and fill it.
 
-        response: the JSON-decoded response.
+        response: the decoded response.
 
         """
         # Validate the response.
@@ -618,9 +775,12 @@ class RemoteServiceClient(RemoteServiceBase):
         error = response["__error"]
 
         if error is not None:
-            err_msg = "%s signaled RPC for method %s was unsuccessful: %s." % (
-                self.remote_service_coord, request["__method"], error)
-            logger.error(err_msg)
+            # Old servers fail the negotiation, which is not an error.
+            if request["__method"] != _NEGOTIATE_METHOD:
+                err_msg = "%s signaled RPC for method %s was unsuccessful: " \
+                    "%s." % (self.remote_service_coord, request["__method"],
+                             error)
+                logger.error(err_msg)
             result.set_exception(RPCError(error))
         else:
             result.set(response["__data"])
@@ -647,16 +807,17 @@ class RemoteServiceClient(RemoteServiceBase):
         result = gevent.event.AsyncResult()
 
         # Encode it.
+        encoding = self._encoding
         try:
-            data_encoded = json.dumps(request).encode("utf-8")
+            data_encoded = _encode(request, encoding)
         except (TypeError, ValueError):
-            logger.error("JSON encoding failed.", exc_info=True)
-            result.set_exception(RPCError("JSON encoding failed."))
+            logger.error("Encoding of the request failed.", exc_info=True)
+            result.set_exception(RPCError("Encoding of the request failed."))
             return result
 
         # Send it.
         try:
-            self._write(data_encoded)
+            self._write(data_encoded, encoding)
         except OSError:
             result.set_exception(RPCError("Write failed."))
             return result
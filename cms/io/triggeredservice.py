@@ -50,18 +50,26 @@ class Executor(typing.Generic[QueueItemT], metaclass=ABCMeta):
 
     """
 
-    def __init__(self, batch_executions: bool = False):
+    def __init__(
+        self,
+        batch_executions: bool = False,
+        operation_queue: PriorityQueue[QueueItemT] | None = None,
+    ):
         """Create an executor.
 
         batch_executions: if True, the executor will receive a
             list of operations in the queue instead of one operation
             at a time.
+        operation_queue: the queue to use, or None for an empty
+            PriorityQueue.
 
         """
         super().__init__()
 
         self._batch_executions = batch_executions
-        self._operation_queue: PriorityQueue[QueueItemT] = PriorityQueue()
+        if operation_queue is None:
+            operation_queue = PriorityQueue()
+        self._operation_queue: PriorityQueue[QueueItemT] = operation_queue
 
     def __contains__(self, item: QueueItemT) -> bool:
         """Return whether the item is in the queue.
@@ -112,10 +120,15 @@ class Executor(typing.Generic[QueueItemT], metaclass=ABCMeta):
         """
         return self._operation_queue.remove(item)
 
-    def _pop(self, wait: bool = False) -> QueueEntry[QueueItemT]:
+    def _pop(
+        self, wait: bool = False, continue_batch: bool = False
+    ) -> QueueEntry[QueueItemT]:
         """Extract (and return) the first element in the queue.
 
         wait: if True, block until an element is present.
+        continue_batch: whether the element is added to the batch of
+            the previous one; executors whose queue is shared among
+            tenants can use this to fill the batch from the same one.
 
         return: first element in the queue.
 
@@ -138,11 +151,12 @@ class Executor(typing.Generic[QueueItemT], metaclass=ABCMeta):
             # Wait for the queue to be non-empty.
             to_execute = [self._pop(wait=True)]
             if self._batch_executions:
-                max_operations = self.max_operations_per_batch()
+                max_operations = self.max_operations_per_batch(
+                    to_execute[0].item)
                 while not self._operation_queue.empty() and (
                         max_operations == 0 or
                         len(to_execute) < max_operations):
-                    to_execute.append(self._pop())
+                    to_execute.append(self._pop(continue_batch=True))
 
             assert len(to_execute) > 0, "Expected at least one element."
             if self._batch_executions:
@@ -171,13 +185,16 @@ class Executor(typing.Generic[QueueItemT], metaclass=ABCMeta):
                         "Unexpected error when executing operation `%s'.",
                         to_execute[0].item, exc_info=True)
 
-    def max_operations_per_batch(self) -> int:
+    def max_operations_per_batch(self, first_item: QueueItemT) -> int:
         """Return the maximum number of operations in a batch.
 
         If the service has batch executions, this method returns the
         maximum size of a batch (the batch might be smaller if not
         enough operations are present in the queue).
 
+        first_item: the first item of the batch, already extracted
+            from the queue.
+
         return: the maximum number of operations, or 0 to
             indicate no limits.
 
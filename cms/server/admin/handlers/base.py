@@ -69,7 +69,8 @@ import cms.db
 from cms.grading.scoretypes import get_score_type_class
 from cms.grading.tasktypes import get_task_type_class
 from cms.server import CommonRequestHandler, FileHandlerMixin
-from cms.server.util import exclude_internal_contests, calculate_task_archive_progress
+from cms.server.util import exclude_internal_contests, \
+    calculate_task_archive_progress, get_archive_cache_entries
 from cms.server.admin.handlers.utils import (
     count_unanswered_questions,
     get_all_student_tags,
@@ -713,11 +714,18 @@ class BaseHandler(CommonRequestHandler):
 
         # Calculate task archive progress for each student using shared utility
         student_progress = {}
+        cache_entries = get_archive_cache_entries(
+            self.sql_session,
+            managing_contest,
+            [(student, student.participation)
+             for student in training_program.students],
+        )
         for student in training_program.students:
             student_progress[student.id] = calculate_task_archive_progress(
-                student, student.participation, managing_contest, self.sql_session
+                student, student.participation, managing_contest, self.sql_session,
+                cache_entries=cache_entries,
             )
-        # Commit to release any advisory locks taken by get_cached_score_entry
+        # Commit to release any advisory locks taken by get_cached_score_entries
         self.sql_session.commit()
 
         self.r_params["student_progress"] = student_progress
@@ -27,19 +27,20 @@
 """
 
 import csv
+import hashlib
 import io
 import json
 import logging
-from collections import namedtuple
 
 import tornado.web
-from sqlalchemy import and_, or_, func
 from sqlalchemy.orm import joinedload
 
 from cms.db import Contest, Participation, ScoreHistory, Student, \
-    Submission, SubmissionResult, Task
+    Submission
 
-from cms.grading.scorecache import get_cached_score_entry, ensure_valid_history
+from cms.grading.scorecache import ensure_valid_history
+from cms.server.admin.rankingsnapshot import TaskStatus, \
+    competition_ranks, get_ranking_snapshot
 from cms.server.util import can_access_task, get_student_for_user_in_program
 from cms.server.admin.handlers.utils import (
     get_all_student_tags,
@@ -50,11 +51,6 @@ from .base import BaseHandler, require_permission
 logger = logging.getLogger(__name__)
 
 
-TaskStatus = namedtuple(
-    "TaskStatus", ["score", "partial", "has_submissions", "has_opened", "can_access"]
-)
-
-
 class RankingCommonMixin:
     """Mixin for handlers that need ranking logic (calculation and export)."""
 
@@ -73,9 +69,8 @@ class RankingCommonMixin:
         # This validates the contest id.
         self.safe_get_item(Contest, contest_id)
 
-        # Load contest with tasks, participations, and statement views.
-        # We use the score cache to get score and has_submissions.
-        # partial is computed at render time via SQL aggregation for correctness.
+        # Load contest with tasks and participations. Scores, partial
+        # flags and statement views are read by the ranking snapshot.
         contest: Contest = (
             self.sql_session.query(Contest)
             .filter(Contest.id == contest_id)
@@ -84,7 +79,6 @@ class RankingCommonMixin:
             .options(joinedload("participations"))
             .options(joinedload("participations.user"))
             .options(joinedload("participations.team"))
-            .options(joinedload("participations.statement_views"))
             .first()
         )
         return contest
@@ -92,10 +86,9 @@ class RankingCommonMixin:
     def _calculate_scores(self, contest, can_access_by_pt):
         """Calculate scores for all participations in the contest.
 
-        This method uses the efficient approach from RankingHandler:
-        1. SQL aggregation for partial flags.
-        2. Score cache for scores and submission existence.
-        3. Two-phase commit to handle cache rebuilds safely.
+        The scores come from the ranking snapshot of the contest, which
+        is computed again only for the participations and tasks whose
+        data changed since the last request (see rankingsnapshot.py).
 
         contest: The contest object (with participations and tasks loaded).
         can_access_by_pt: A dict (participation_id, task_id) -> bool indicating
@@ -104,101 +97,13 @@ class RankingCommonMixin:
         Returns:
             show_teams (bool): Whether any participation has a team.
         """
-        # SQL aggregation to compute t_partial for all participation/task pairs.
-        # t_partial is True when there's an official submission that is not yet scored.
-        # has_submissions is retrieved from the cache instead.
-        # We join with Participation and filter by contest_id instead of using
-        # an IN clause with participation IDs for better query plan efficiency.
-        # For training days, participations are in the managing contest, not the
-        # training day's contest, so we filter by managing_contest_id.
-        training_day = contest.training_day
-        if training_day is not None:
-            participation_contest_id = training_day.training_program.managing_contest_id
-        else:
-            participation_contest_id = contest.id
-
-        partial_flags_query = (
-            self.sql_session.query(
-                Participation.user_id,
-                Submission.task_id,
-                func.bool_or(
-                    and_(
-                        Task.active_dataset_id.isnot(None),
-                        or_(
-                            SubmissionResult.submission_id.is_(None),
-                            SubmissionResult.score.is_(None),
-                            SubmissionResult.score_details.is_(None),
-                            SubmissionResult.public_score.is_(None),
-                            SubmissionResult.public_score_details.is_(None),
-                            SubmissionResult.ranking_score_details.is_(None),
-                        ),
-                    )
-                ).label("t_partial"),
-            )
-            .join(Participation, Submission.participation_id == Participation.id)
-            .join(Task, Submission.task_id == Task.id)
-            .outerjoin(
-                SubmissionResult,
-                and_(
-                    SubmissionResult.submission_id == Submission.id,
-                    SubmissionResult.dataset_id == Task.active_dataset_id,
-                ),
-            )
-            .filter(Participation.contest_id == participation_contest_id)
-            .filter(Submission.official.is_(True))
-            .group_by(Participation.user_id, Submission.task_id)
-        )
-
-        # Build lookup dict: (user_id, task_id) -> t_partial
-        partial_by_user_task = {}
-        for row in partial_flags_query.all():
-            partial_by_user_task[(row.user_id, row.task_id)] = row.t_partial or False
-
-        statement_views_set = set()
-        for p in contest.participations:
-            for sv in p.statement_views:
-                statement_views_set.add((sv.participation_id, sv.task_id))
-
-        # Preprocess participations: get data about teams, scores
-        # Use the score cache to get score and has_submissions.
-        # partial is computed via SQL aggregation above for correctness.
-        #
-        # Note: get_cached_score_entry may trigger cache rebuilds which acquire
-        # advisory locks. We collect data first, then commit to persist any
-        # rebuilds and release the locks, then attach transient attributes.
-        # This two-phase approach is needed because commit() expires ORM objects,
-        # which would clear any dynamically added attributes like task_statuses.
-        show_teams = False
-        participation_data = {}  # p.id -> (task_statuses, total_score)
-        for p in contest.participations:
-            show_teams = show_teams or p.team_id
-
-            task_statuses = []
-            total_score = 0.0
-            partial = False
-            for task in contest.get_tasks():
-                # Get the cache entry with score and has_submissions
-                cache_entry = get_cached_score_entry(self.sql_session, p, task)
-                t_score = round(cache_entry.score, task.score_precision)
-                has_submissions = cache_entry.has_submissions
-                # Get t_partial from SQL aggregation (not from cache)
-                t_partial = partial_by_user_task.get((p.user_id, task.id), False)
-
-                has_opened = (p.id, task.id) in statement_views_set
-                can_access = can_access_by_pt.get((p.id, task.id), True)
-                task_statuses.append(
-                    TaskStatus(
-                        score=t_score,
-                        partial=t_partial,
-                        has_submissions=has_submissions,
-                        has_opened=has_opened,
-                        can_access=can_access,
-                    )
-                )
-                total_score += t_score
-                partial = partial or t_partial
-            total_score = round(total_score, contest.score_precision)
-            participation_data[p.id] = (task_statuses, (total_score, partial))
+        # Note: get_ranking_snapshot may trigger cache rebuilds which
+        # acquire advisory locks. We commit to persist any rebuilds and
+        # release the locks, then attach transient attributes, because
+        # commit() expires ORM objects, which would clear any dynamically
+        # added attributes like task_statuses.
+        snapshot = get_ranking_snapshot(
+            self.sql_session, contest, can_access_by_pt)
 
         # Commit to persist any cache rebuilds and release advisory locks.
         # This is a no-op if no rebuilds occurred.
@@ -207,9 +112,11 @@ class RankingCommonMixin:
         # Now attach transient attributes after commit (so they aren't cleared
         # by SQLAlchemy's expire-on-commit behavior).
         for p in contest.participations:
-            p.task_statuses, p.total_score = participation_data[p.id]
+            p.task_statuses = snapshot.task_statuses[p.id]
+            p.total_score = snapshot.total_scores[p.id]
+        self.ranking_snapshot = snapshot
 
-        return show_teams
+        return snapshot.show_teams
 
     @staticmethod
     def _status_indicator(status: TaskStatus) -> str:
@@ -304,6 +211,49 @@ class RankingCommonMixin:
 
         return output.getvalue()
 
+    def _write_json(self, contest, participations, tasks, ranks=None):
+        """Return the ranking of some participations on some tasks as JSON.
+
+        ranks: the rank of each participation, by id; if missing, it is
+            computed from the total scores on the exported tasks.
+
+        """
+        all_tasks = list(contest.get_tasks())
+        task_index = {task.id: i for i, task in enumerate(all_tasks)}
+
+        entries = []
+        for p in participations:
+            statuses = [p.task_statuses[task_index[task.id]] for task in tasks]
+            entries.append({
+                "id": p.id,
+                "username": p.user.username,
+                "name": "%s %s" % (p.user.first_name, p.user.last_name),
+                "team": p.team.name if p.team else None,
+                "score": round(sum(status.score for status in statuses),
+                               contest.score_precision),
+                "partial": any(status.partial for status in statuses),
+                "tasks": {
+                    task.name: {
+                        "score": status.score,
+                        "partial": status.partial,
+                        "has_submissions": status.has_submissions,
+                        "can_access": status.can_access,
+                    }
+                    for task, status in zip(tasks, statuses)
+                },
+            })
+        if ranks is None:
+            ranks = competition_ranks(
+                {entry["id"]: entry["score"] for entry in entries})
+        for entry in entries:
+            entry["rank"] = ranks[entry.pop("id")]
+
+        return json.dumps({
+            "contest": contest.name,
+            "tasks": [task.name for task in tasks],
+            "ranking": entries,
+        })
+
 
 class RankingHandler(RankingCommonMixin, BaseHandler):
     """Shows the ranking for a contest."""
@@ -432,6 +382,17 @@ class RankingHandler(RankingCommonMixin, BaseHandler):
                     export_group_data = gd
                     break
 
+        # The exports only depend on the ranking and on what is listed
+        # below, so we can tell unchanged ones without rendering them.
+        # The page also shows the notifications, so it is not cached.
+        if format in ("txt", "csv", "json"):
+            self.export_etag = self._export_etag(
+                format, main_group_filter, student_tags_by_participation)
+            self.set_etag_header()
+            if self.check_etag_header():
+                self.set_status(304)
+                return
+
         if format == "txt":
             if export_group_data:
                 group_slug = main_group_filter.replace(" ", "_").lower()
@@ -476,9 +437,65 @@ class RankingHandler(RankingCommonMixin, BaseHandler):
                 ),
             )
             self.finish(csv_content)
+        elif format == "json":
+            self.set_header("Content-Type", "application/json")
+            if export_group_data:
+                json_content = self._write_json(
+                    self.contest,
+                    export_group_data["participations"],
+                    export_group_data["tasks"],
+                )
+            else:
+                snapshot = self.ranking_snapshot
+                json_content = self._write_json(
+                    self.contest,
+                    sorted(
+                        [p for p in self.contest.participations
+                         if not p.hidden],
+                        key=lambda p: snapshot.ranks[p.id],
+                    ),
+                    list(self.contest.get_tasks()),
+                    ranks=snapshot.ranks,
+                )
+            self.finish(json_content)
         else:
             self.render("ranking.html", **self.r_params)
 
+    def compute_etag(self):
+        """See RequestHandler.compute_etag().
+
+        The tag of an export is known before rendering it.
+
+        """
+        export_etag = getattr(self, "export_etag", None)
+        if export_etag is not None:
+            return export_etag
+        return super().compute_etag()
+
+    def _export_etag(self, format, main_group, student_tags_by_participation):
+        """Return the ETag of an export of the ranking.
+
+        The tag of the ranking snapshot changes with the scores; the
+        names and tags shown in the exports are added here.
+
+        """
+        content = (
+            self.ranking_snapshot.etag,
+            format,
+            main_group,
+            self.contest.name,
+            self.contest.start.isoformat(),
+            [task.name for task in self.contest.get_tasks()],
+            sorted(
+                (p.id, p.user.username, p.user.first_name, p.user.last_name,
+                 p.team.name if p.team else None,
+                 student_tags_by_participation.get(p.id))
+                for p in self.contest.participations
+            ),
+        )
+        return '"%s"' % hashlib.sha1(
+            repr(content).encode("utf-8")).hexdigest()
+
 
 class ScoreHistoryHandler(BaseHandler):
     """Returns the score history for a contest as JSON.
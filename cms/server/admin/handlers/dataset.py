@@ -173,6 +173,10 @@ class CloneDatasetHandler(BaseHandler):
 
             # Create the dataset.
             attrs["autojudge"] = False
+            attrs["short_circuit_evaluation"] = \
+                original_dataset.short_circuit_evaluation
+            attrs["deduplicate_evaluations"] = \
+                original_dataset.deduplicate_evaluations
             attrs["task"] = task
             dataset = Dataset(**attrs)
             self.sql_session.add(dataset)
@@ -315,6 +315,10 @@ class TaskHandler(BaseHandler):
                                    "TaskTypeOptions_%d_" % dataset.id)
                 self.get_score_type(attrs, "score_type_%d" % dataset.id,
                                     "score_type_parameters_%d" % dataset.id)
+                attrs["short_circuit_evaluation"] = bool(self.get_argument(
+                    "short_circuit_evaluation_%d" % dataset.id, False))
+                attrs["deduplicate_evaluations"] = bool(self.get_argument(
+                    "deduplicate_evaluations_%d" % dataset.id, False))
 
                 # Update the dataset.
                 dataset.set_attrs(attrs)
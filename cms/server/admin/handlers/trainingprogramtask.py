@@ -39,7 +39,8 @@ from cms.db import (
     Student,
     StudentTask,
 )
-from cms.server.util import calculate_task_archive_progress
+from cms.server.util import calculate_task_archive_progress, \
+    get_archive_cache_entries
 from cms.server.admin.handlers.utils import (
     get_student_tags_by_participation,
     build_user_to_student_map,
@@ -406,13 +407,20 @@ class TrainingProgramRankingHandler(RankingCommonMixin, BaseHandler):
         task_archive_progress_by_participation = {}
         user_to_student = build_user_to_student_map(training_program)
 
+        archives = []
         for p in self.contest.participations:
             student = user_to_student.get(p.user_id)
             if student:
-                progress = calculate_task_archive_progress(
-                    student, p, self.contest, self.sql_session
-                )
-                task_archive_progress_by_participation[p.id] = progress
+                archives.append((student, p))
+        cache_entries = get_archive_cache_entries(
+            self.sql_session, self.contest, archives
+        )
+        for student, p in archives:
+            progress = calculate_task_archive_progress(
+                student, p, self.contest, self.sql_session,
+                cache_entries=cache_entries,
+            )
+            task_archive_progress_by_participation[p.id] = progress
 
         # Commit to release any advisory locks taken during score calculation
         self.sql_session.commit()
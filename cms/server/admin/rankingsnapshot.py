@@ -0,0 +1,467 @@
+#!/usr/bin/env python3
+
+# Contest Management System - http://cms-dev.github.io/
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Snapshots of the contest rankings shown by AWS.
+
+Computing the ranking of a contest means reading the score cache of
+every participation and task, aggregating the submissions to find the
+scores still being computed, and collecting the statements viewed. AWS
+keeps in memory the last ranking computed for each contest, together
+with the version of the data it was computed from. While the version
+does not change the snapshot is served as it is; when it changes, only
+the (participation, task) pairs whose data changed are computed again.
+
+The version is derived from the score cache, which is updated by
+update_score_cache and invalidated by invalidate_score_cache, from the
+official submissions and from the statement views, with a few
+aggregate queries.
+
+"""
+
+import hashlib
+import logging
+from collections import OrderedDict, namedtuple
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from sqlalchemy import Numeric, and_, cast, func, or_
+from sqlalchemy.orm import Session
+
+from cms.db import Contest, Participation, ParticipationTaskScore, \
+    StatementView, Submission, SubmissionResult, Task
+from cms.grading.scorecache import get_cached_score_entries
+
+
+__all__ = [
+    "RankingSnapshot", "TaskStatus", "competition_ranks",
+    "get_ranking_snapshot",
+]
+
+
+logger = logging.getLogger(__name__)
+
+
+TaskStatus = namedtuple(
+    "TaskStatus", ["score", "partial", "has_submissions", "has_opened", "can_access"]
+)
+
+
+# The stamps of a cache entry that change when it is updated,
+# rebuilt or invalidated.
+EntryStamps = tuple[datetime | None, datetime | None, datetime | None]
+
+
+@dataclass
+class RankingSnapshot:
+    """The ranking of a contest, as computed at a given version.
+
+    contest_id: the id of the contest.
+    structure: what the ranking was computed for: participations,
+        tasks and task accesses; a change means a new snapshot.
+    version: the version of the data the ranking was computed from.
+    task_statuses: for each participation id, the status of each task,
+        in the order of contest.get_tasks().
+    total_scores: for each participation id, its total score and
+        whether it is partial.
+    ranks: for each non-hidden participation id, its rank (1 for the
+        best total score, with ties sharing the best rank).
+    show_teams: whether any participation has a team.
+
+    """
+
+    contest_id: int
+    structure: tuple
+    version: tuple
+    task_statuses: dict[int, list[TaskStatus | None]] = field(
+        default_factory=dict)
+    total_scores: dict[int, tuple[float, bool]] = field(default_factory=dict)
+    ranks: dict[int, int] = field(default_factory=dict)
+    show_teams: bool = False
+    # What is needed to find the pairs whose data changed.
+    entry_stamps: dict[tuple[int, int], EntryStamps] = field(
+        default_factory=dict)
+    statement_views: set[tuple[int, int]] = field(default_factory=set)
+
+    @property
+    def etag(self) -> str:
+        """Return a tag that changes whenever the ranking may change."""
+        return hashlib.sha1(
+            repr((self.contest_id, self.structure, self.version))
+            .encode("utf-8")).hexdigest()
+
+
+# The most recent snapshots, by contest id.
+MAX_SNAPSHOTS = 32
+# How many times to bring a snapshot up to date in a single request.
+MAX_PASSES = 3
+_snapshots: OrderedDict[int, RankingSnapshot] = OrderedDict()
+
+
+def clear_ranking_snapshots():
+    """Forget all the snapshots."""
+    _snapshots.clear()
+
+
+def competition_ranks(scores: dict[int, float]) -> dict[int, int]:
+    """Rank participations by score, ties sharing the best rank.
+
+    scores: the score of each participation, by id.
+
+    return: the rank of each participation, by id (for example, scores
+        10, 7, 7 and 5 get ranks 1, 2, 2 and 4).
+
+    """
+    ranks: dict[int, int] = {}
+    previous_score = None
+    ordered = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+    for position, (p_id, score) in enumerate(ordered):
+        if score != previous_score:
+            rank = position + 1
+            previous_score = score
+        ranks[p_id] = rank
+    return ranks
+
+
+def _participation_contest_id(contest: Contest) -> int:
+    """Return the id of the contest where submissions are stored.
+
+    For training days, participations are in the managing contest, not
+    the training day's contest.
+
+    """
+    training_day = contest.training_day
+    if training_day is not None:
+        return training_day.training_program.managing_contest_id
+    return contest.id
+
+
+def _structure(
+    contest: Contest,
+    can_access_by_pt: dict[tuple[int, int], bool],
+) -> tuple:
+    """Return what a ranking is computed for, from loaded objects."""
+    return (
+        _participation_contest_id(contest),
+        contest.score_precision,
+        tuple(sorted((p.id, p.user_id, p.team_id, p.hidden)
+                     for p in contest.participations)),
+        tuple((t.id, t.score_precision, t.active_dataset_id)
+              for t in contest.get_tasks()),
+        tuple(sorted(pt for pt, can_access in can_access_by_pt.items()
+                     if not can_access)),
+    )
+
+
+def _epoch(column):
+    """Return a column as an exact number of seconds, for sums."""
+    return cast(func.extract("epoch", column), Numeric)
+
+
+def _data_version(session: Session, contest: Contest) -> tuple:
+    """Return the version of the data a ranking is computed from.
+
+    The version changes whenever a cache entry of the contest is
+    updated, rebuilt or invalidated, an official submission is added
+    or removed, or a statement is viewed.
+
+    """
+    cache_version = session.query(
+        func.count(ParticipationTaskScore.participation_id),
+        func.sum(_epoch(ParticipationTaskScore.last_update)),
+        func.sum(_epoch(ParticipationTaskScore.created_at)),
+        func.sum(_epoch(ParticipationTaskScore.invalidated_at)),
+    ).join(Participation).filter(
+        Participation.contest_id == contest.id
+    ).one()
+
+    submission_version = session.query(
+        func.count(Submission.id),
+        func.sum(Submission.id),
+        func.max(Submission.id),
+    ).join(Participation).filter(
+        Participation.contest_id == _participation_contest_id(contest),
+        Submission.official.is_(True),
+    ).one()
+
+    view_version = session.query(
+        func.count(StatementView.id),
+        func.sum(StatementView.id),
+    ).join(Participation).filter(
+        Participation.contest_id == contest.id
+    ).one()
+
+    return tuple(cache_version), tuple(submission_version), \
+        tuple(view_version)
+
+
+def _partial_flags(
+    session: Session,
+    contest: Contest,
+    user_ids: set[int] | None = None,
+    task_ids: set[int] | None = None,
+) -> dict[tuple[int, int], bool]:
+    """Return which (user, task) pairs have scores still being computed.
+
+    A pair is partial when there's an official submission that is not
+    yet scored on the active dataset.
+
+    user_ids: if given, only consider these users.
+    task_ids: if given, only consider these tasks.
+
+    return: for each (user_id, task_id) pair with official submissions,
+        whether it is partial.
+
+    """
+    # We join with Participation and filter by contest_id instead of using
+    # an IN clause with participation IDs for better query plan efficiency.
+    query = (
+        session.query(
+            Participation.user_id,
+            Submission.task_id,
+            func.bool_or(
+                and_(
+                    Task.active_dataset_id.isnot(None),
+                    or_(
+                        SubmissionResult.submission_id.is_(None),
+                        SubmissionResult.score.is_(None),
+                        SubmissionResult.score_details.is_(None),
+                        SubmissionResult.public_score.is_(None),
+                        SubmissionResult.public_score_details.is_(None),
+                        SubmissionResult.ranking_score_details.is_(None),
+                    ),
+                )
+            ).label("t_partial"),
+        )
+        .join(Participation, Submission.participation_id == Participation.id)
+        .join(Task, Submission.task_id == Task.id)
+        .outerjoin(
+            SubmissionResult,
+            and_(
+                SubmissionResult.submission_id == Submission.id,
+                SubmissionResult.dataset_id == Task.active_dataset_id,
+            ),
+        )
+        .filter(Participation.contest_id == _participation_contest_id(contest))
+        .filter(Submission.official.is_(True))
+        .group_by(Participation.user_id, Submission.task_id)
+    )
+    if user_ids is not None:
+        query = query.filter(Participation.user_id.in_(user_ids))
+    if task_ids is not None:
+        query = query.filter(Submission.task_id.in_(task_ids))
+
+    return {(row.user_id, row.task_id): row.t_partial or False
+            for row in query.all()}
+
+
+def _statement_views(
+    session: Session,
+    contest: Contest,
+) -> set[tuple[int, int]]:
+    """Return the (participation, task) pairs whose statement was viewed."""
+    return set(
+        session.query(StatementView.participation_id, StatementView.task_id)
+        .join(Participation)
+        .filter(Participation.contest_id == contest.id)
+        .distinct()
+        .all()
+    )
+
+
+def _dirty_pairs(
+    session: Session,
+    contest: Contest,
+    snapshot: RankingSnapshot,
+    version: tuple,
+) -> set[tuple[int, int]] | None:
+    """Return the pairs whose data changed since a snapshot.
+
+    return: the (participation_id, task_id) pairs, or None if the
+        changes cannot be tracked down to pairs (for example, when
+        submissions were deleted).
+
+    """
+    pairs = {(p.id, t.id)
+             for p in contest.participations for t in contest.get_tasks()}
+    dirty: set[tuple[int, int]] = set()
+
+    # Cache entries that were updated, rebuilt or invalidated.
+    if version[0] != snapshot.version[0]:
+        for p_id, t_id, last_update, created_at, invalidated_at in (
+            session.query(
+                ParticipationTaskScore.participation_id,
+                ParticipationTaskScore.task_id,
+                ParticipationTaskScore.last_update,
+                ParticipationTaskScore.created_at,
+                ParticipationTaskScore.invalidated_at,
+            ).join(Participation).filter(
+                Participation.contest_id == contest.id
+            ).all()
+        ):
+            key = (p_id, t_id)
+            if snapshot.entry_stamps.get(key) != \
+                    (last_update, created_at, invalidated_at):
+                dirty.add(key)
+
+    # Official submissions that were added since the snapshot.
+    if version[1] != snapshot.version[1]:
+        old_count, _, old_max_id = snapshot.version[1]
+        new_submissions = session.query(
+            Participation.user_id, Submission.task_id
+        ).join(Participation).filter(
+            Participation.contest_id == _participation_contest_id(contest),
+            Submission.official.is_(True),
+            Submission.id > (old_max_id or 0),
+        ).all()
+        if version[1][0] != old_count + len(new_submissions):
+            return None
+        participation_ids = {p.user_id: p.id for p in contest.participations}
+        for user_id, task_id in new_submissions:
+            if user_id in participation_ids:
+                dirty.add((participation_ids[user_id], task_id))
+
+    # Statements that were viewed since the snapshot.
+    if version[2] != snapshot.version[2]:
+        statement_views = _statement_views(session, contest)
+        dirty |= statement_views ^ snapshot.statement_views
+        snapshot.statement_views = statement_views
+
+    return dirty & pairs
+
+
+def _update(
+    session: Session,
+    contest: Contest,
+    snapshot: RankingSnapshot,
+    dirty: set[tuple[int, int]],
+    can_access_by_pt: dict[tuple[int, int], bool],
+):
+    """Compute again the task statuses of some pairs of a snapshot."""
+    participations = [p for p in contest.participations
+                      if any((p.id, t.id) in dirty
+                             for t in contest.get_tasks())]
+    tasks = [t for t in contest.get_tasks()
+             if any((p.id, t.id) in dirty for p in participations)]
+    if len(participations) > 0:
+        cache_entries = get_cached_score_entries(
+            session, contest, participations=participations, tasks=tasks)
+        partial_by_user_task = _partial_flags(
+            session, contest,
+            user_ids={p.user_id for p in participations},
+            task_ids={t.id for t in tasks})
+    else:
+        cache_entries, partial_by_user_task = {}, {}
+    for key, entry in cache_entries.items():
+        snapshot.entry_stamps[key] = \
+            (entry.last_update, entry.created_at, entry.invalidated_at)
+
+    for p in participations:
+        statuses = snapshot.task_statuses[p.id]
+        for idx, task in enumerate(contest.get_tasks()):
+            if (p.id, task.id) not in dirty:
+                continue
+            cache_entry = cache_entries[(p.id, task.id)]
+            statuses[idx] = TaskStatus(
+                score=round(cache_entry.score, task.score_precision),
+                partial=partial_by_user_task.get((p.user_id, task.id), False),
+                has_submissions=cache_entry.has_submissions,
+                has_opened=(p.id, task.id) in snapshot.statement_views,
+                can_access=can_access_by_pt.get((p.id, task.id), True),
+            )
+        snapshot.total_scores[p.id] = (
+            round(sum(status.score for status in statuses),
+                  contest.score_precision),
+            any(status.partial for status in statuses),
+        )
+
+    snapshot.ranks = competition_ranks(
+        {p.id: snapshot.total_scores[p.id][0]
+         for p in contest.participations if not p.hidden})
+
+
+def get_ranking_snapshot(
+    session: Session,
+    contest: Contest,
+    can_access_by_pt: dict[tuple[int, int], bool],
+) -> RankingSnapshot:
+    """Return the up-to-date ranking of a contest.
+
+    IMPORTANT: like get_cached_score_entries, this function may trigger
+    cache rebuilds, and the caller MUST commit the session afterwards.
+
+    session: the database session.
+    contest: the contest, with its tasks and participations loaded.
+    can_access_by_pt: whether each participation can access each task,
+        indexed by (participation_id, task_id); True if missing.
+
+    return: the snapshot of the ranking, which the caller must not
+        modify.
+
+    """
+    structure = _structure(contest, can_access_by_pt)
+
+    snapshot = _snapshots.get(contest.id)
+    if snapshot is None or snapshot.structure != structure:
+        snapshot = _build(session, contest, structure, can_access_by_pt)
+        _snapshots[contest.id] = snapshot
+    _snapshots.move_to_end(contest.id)
+    while len(_snapshots) > MAX_SNAPSHOTS:
+        _snapshots.popitem(last=False)
+
+    # Reading the data may rebuild cache entries, changing the version
+    # again; the stamps tell these changes apart from those of others,
+    # so a further pass updates nothing and just records the version.
+    for _ in range(MAX_PASSES):
+        version = _data_version(session, contest)
+        if version == snapshot.version:
+            break
+        dirty = _dirty_pairs(session, contest, snapshot, version)
+        if dirty is None:
+            snapshot = _build(session, contest, structure, can_access_by_pt)
+            _snapshots[contest.id] = snapshot
+            continue
+        logger.debug("Updating %d pairs of the ranking of contest %d.",
+                     len(dirty), contest.id)
+        _update(session, contest, snapshot, dirty, can_access_by_pt)
+        snapshot.version = version
+    return snapshot
+
+
+def _build(
+    session: Session,
+    contest: Contest,
+    structure: tuple,
+    can_access_by_pt: dict[tuple[int, int], bool],
+) -> RankingSnapshot:
+    """Compute the ranking of a contest from scratch."""
+    logger.debug("Computing the ranking of contest %d.", contest.id)
+    version = _data_version(session, contest)
+    snapshot = RankingSnapshot(
+        contest_id=contest.id,
+        structure=structure,
+        version=version,
+        show_teams=any(p.team_id for p in contest.participations),
+        statement_views=_statement_views(session, contest),
+        task_statuses={p.id: [None] * len(contest.get_tasks())
+                       for p in contest.participations},
+        total_scores={p.id: (0.0, False) for p in contest.participations},
+    )
+    _update(session, contest, snapshot,
+            {(p.id, t.id)
+             for p in contest.participations for t in contest.get_tasks()},
+            can_access_by_pt)
+    return snapshot
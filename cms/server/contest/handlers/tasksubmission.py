@@ -50,7 +50,7 @@ from sqlalchemy.orm import joinedload
 from cms import config, FEEDBACK_LEVEL_FULL
 from cms.db import Submission, SubmissionResult
 from cms.grading.languagemanager import get_language
-from cms.grading.scoring import task_score
+from cms.grading.scoring import get_submissions_by_task, task_score
 from cms.server import multi_contest
 from cms.server.contest.submission import get_submission_count, \
     UnacceptableSubmission, accept_submission
@@ -242,12 +242,15 @@ class TaskSubmissionsHandler(ContestHandler):
             else participation
         )
 
+        submissions_by_task = get_submissions_by_task(
+            score_participation, tasks=[task])
         public_score, is_public_score_partial = task_score(
             score_participation,
             task,
             public=True,
             rounded=True,
             training_day=training_day,
+            submissions_by_task=submissions_by_task,
         )
         tokened_score, is_tokened_score_partial = task_score(
             score_participation,
@@ -255,6 +258,7 @@ class TaskSubmissionsHandler(ContestHandler):
             only_tokened=True,
             rounded=True,
             training_day=training_day,
+            submissions_by_task=submissions_by_task,
         )
         # These two should be the same, anyway.
         is_score_partial = is_public_score_partial or is_tokened_score_partial
@@ -336,10 +340,14 @@ class SubmissionStatusHandler(ContestHandler):
             .options(joinedload(Submission.token))\
             .options(joinedload(Submission.results))\
             .all()
+        submissions_by_task = get_submissions_by_task(
+            participation, tasks=[task])
         data["task_public_score"], public_score_is_partial = \
-            task_score(participation, task, public=True, rounded=True)
+            task_score(participation, task, public=True, rounded=True,
+                       submissions_by_task=submissions_by_task)
         data["task_tokened_score"], tokened_score_is_partial = \
-            task_score(participation, task, only_tokened=True, rounded=True)
+            task_score(participation, task, only_tokened=True, rounded=True,
+                       submissions_by_task=submissions_by_task)
         # These two should be the same, anyway.
         data["task_score_is_partial"] = \
             public_score_is_partial or tokened_score_is_partial
@@ -17,6 +17,7 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import io
 from collections.abc import Callable
 from werkzeug.exceptions import HTTPException, NotFound, ServiceUnavailable
 from werkzeug.wrappers import Response, Request
@@ -90,11 +91,14 @@ class FileServerMiddleware:
 
         try:
             fobj = self.file_cacher.get_file(digest)
-            size = self.file_cacher.get_size(digest)
         except KeyError:
             return NotFound()
         except TombstoneError:
             return ServiceUnavailable()
+        # The file comes from the local cache, hence its size can be
+        # found without asking the backend.
+        size = fobj.seek(0, io.SEEK_END)
+        fobj.seek(0, io.SEEK_SET)
 
         request = Request(environ)
         request.encoding_errors = "strict"
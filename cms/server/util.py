@@ -45,12 +45,13 @@ from tornado.web import RequestHandler
 from cms.db import Session, Contest, Student, Task, Participation, StudentTask, Submission
 from sqlalchemy import func
 from sqlalchemy.orm import joinedload
-from cms.grading.scorecache import get_cached_score_entry
+from cms.grading.scorecache import get_cached_score_entries
 from cms.server.file_middleware import FileServerMiddleware
 from cmscommon.datetime import make_datetime
 
 if typing.TYPE_CHECKING:
-    from cms.db import TrainingDay, TrainingDayGroup, TrainingProgram, User
+    from cms.db import ParticipationTaskScore, TrainingDay, TrainingDayGroup, \
+        TrainingProgram, User
 
 logger = logging.getLogger(__name__)
 
@@ -217,9 +218,10 @@ def get_student_archive_scores(
     student: "Student",
     participation: "Participation",
     contest: "Contest",
+    cache_entries: dict[tuple[int, int], "ParticipationTaskScore"] | None = None,
 ) -> dict[int, float]:
     """Get fresh task scores for all tasks in a student's archive.
-    This utility uses get_cached_score_entry to ensure scores are fresh
+    This utility uses get_cached_score_entries to ensure scores are fresh
     and not stale. It returns a mapping of task_id -> score for all tasks
     that are both in the student's archive AND currently exist in the contest.
     IMPORTANT: This function may trigger cache rebuilds which acquire advisory
@@ -229,19 +231,50 @@ def get_student_archive_scores(
     student: the Student object (with student_tasks relationship).
     participation: the Participation object for the managing contest.
     contest: the Contest object (managing contest for the training program).
+    cache_entries: the cache entries of the student's archive, as returned
+        by get_archive_cache_entries, if already read.
     return: dict mapping task_id -> score for tasks in the student's archive.
     """
 
     student_task_ids = {st.task_id for st in student.student_tasks}
-    scores = {}
+    tasks = [task for task in contest.get_tasks()
+             if task.id in student_task_ids]
+
+    # Read the entries of all the tasks at once, rather than one by one.
+    if cache_entries is None:
+        cache_entries = get_cached_score_entries(
+            sql_session, contest, participations=[participation], tasks=tasks)
+
+    return {task.id: cache_entries[(participation.id, task.id)].score
+            for task in tasks}
 
-    for task in contest.get_tasks():
-        if task.id not in student_task_ids:
-            continue
-        cache_entry = get_cached_score_entry(sql_session, participation, task)
-        scores[task.id] = cache_entry.score
 
-    return scores
+def get_archive_cache_entries(
+    sql_session: Session,
+    contest: "Contest",
+    archives: list[tuple["Student", "Participation"]],
+) -> dict[tuple[int, int], "ParticipationTaskScore"]:
+    """Read the score cache entries of the archives of many students.
+
+    The result can be passed to get_student_archive_scores and
+    calculate_task_archive_progress for each of the students, which then
+    do not read the cache on their own.
+    IMPORTANT: like get_student_archive_scores, this function may trigger
+    cache rebuilds, and the caller MUST commit the session afterwards.
+    sql_session: the database session.
+    contest: the Contest object (managing contest for the training program).
+    archives: the students, each with its participation in the contest.
+    return: the cache entries, indexed by (participation_id, task_id).
+    """
+    tasks_by_id = {task.id: task for task in contest.get_tasks()}
+    return get_cached_score_entries(
+        sql_session,
+        contest,
+        pairs=[(participation, tasks_by_id[st.task_id])
+               for student, participation in archives
+               for st in student.student_tasks
+               if st.task_id in tasks_by_id],
+    )
 
 
 def calculate_task_archive_progress(
@@ -251,6 +284,7 @@ def calculate_task_archive_progress(
     sql_session: Session,
     include_task_details: bool = False,
     submission_counts: dict[int, int] | None = None,
+    cache_entries: dict[tuple[int, int], "ParticipationTaskScore"] | None = None,
 ) -> dict:
     """Calculate task archive progress for a student.
 
@@ -260,11 +294,13 @@ def calculate_task_archive_progress(
     student: the Student object (with student_tasks relationship).
     participation: the Participation object.
     contest: the Contest object (managing contest for the training program).
-    sql_session: SQLAlchemy session for using get_cached_score_entry.
+    sql_session: SQLAlchemy session for using get_cached_score_entries.
     include_task_details: if True, include per-task breakdown in task_scores list.
     submission_counts: optional dict mapping task_id to submission count.
         If provided and include_task_details is True, each task will include
         a submission_count field.
+    cache_entries: the cache entries of the student's archive, as returned
+        by get_archive_cache_entries, if already read.
 
     return: dict with total_score, max_score, percentage, task_count.
             If include_task_details is True, also includes task_scores list.
@@ -278,7 +314,7 @@ def calculate_task_archive_progress(
         .all()
     )
     cached_scores = get_student_archive_scores(
-        sql_session, student, participation, contest
+        sql_session, student, participation, contest, cache_entries
     )
 
     total_score = 0.0
@@ -31,28 +31,33 @@ the current ranking.
 """
 
 import logging
+import time
 from collections import defaultdict
 from datetime import datetime, timedelta
 from functools import wraps
 
 import gevent.lock
-from sqlalchemy import func
+from sqlalchemy import func, tuple_
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.exc import IntegrityError
 
-from cms import ServiceCoord, get_service_shards
+from cms import ServiceCoord, config, get_service_shards
 from cms.db.session import Session
 from cms.io.priorityqueue import QueueEntry, QueueEntryDict, QueueItem
 from cmscommon.datetime import make_timestamp
-from cms.db import SessionGen, Digest, Dataset, Evaluation, Submission, \
-    SubmissionResult, Testcase, UserTest, UserTestResult, get_submissions, \
+from cms.db import SessionGen, Contest, Digest, Dataset, Evaluation, \
+    Submission, SubmissionResult, Task, Testcase, UserTest, UserTestResult, get_submissions, \
     get_submission_results, get_datasets_to_judge
-from cms.grading.Job import Job, JobGroup
+from cms.grading.Job import EvaluationJob, Job, JobGroup
+from cms.grading.steps import EVALUATION_MESSAGES
 from cms.grading.scorecache import invalidate_score_cache
-from cms.io import Executor, TriggeredService, rpc_method
+from cms.io import Executor, FairPriorityQueue, TriggeredService, \
+    rpc_method
 from .esoperations import ESOperation, get_relevant_operations, \
     get_submissions_operations, get_user_tests_operations, \
     submission_get_operations, submission_to_evaluate, \
     user_test_get_operations
+from .evaluationmemo import EvaluationMemo
 from .flushingdict import FlushingDict
 from .workerpool import WorkerPool
 
@@ -64,21 +69,34 @@ class EvaluationExecutor(Executor[ESOperation]):
 
     # Real maximum number of operations to be sent to a worker.
     MAX_OPERATIONS_PER_BATCH = 25
+    # How long, in seconds, we want a batch to take on a worker.
+    TARGET_BATCH_DURATION = 10.0
+    # Weight of a new duration in the moving averages of the durations.
+    DURATION_SMOOTHING = 0.2
 
     def __init__(self, evaluation_service: "EvaluationService"):
         """Create the single executor for ES.
 
-        The executor just delegates work to the worker pool.
+        The executor just delegates work to the worker pool. Its queue
+        shares the workers among the contests, according to their
+        weights in the configuration.
 
         """
-        super().__init__(True)
+        # Name of the contest of each dataset we have seen, which is
+        # the tenant of its operations in the queue.
+        self._dataset_contest: dict[int, str] = dict()
+
+        self._fair_queue: FairPriorityQueue[ESOperation] = FairPriorityQueue(
+            self.get_contest_name, EvaluationExecutor.get_contest_weight)
+        super().__init__(True, self._fair_queue)
 
         self.evaluation_service = evaluation_service
         self.pool = WorkerPool(self.evaluation_service)
 
-        # List of QueueItem (ESOperation) we have extracted from the
-        # queue, but not yet finished to execute.
-        self._currently_executing: list[ESOperation] = []
+        # QueueItems (ESOperations) we have extracted from the queue,
+        # but not yet finished to execute (as the keys, to keep them in
+        # order).
+        self._currently_executing: dict[ESOperation, None] = {}
 
         # Lock used to guard the currently executing operations
         self._current_execution_lock = gevent.lock.RLock()
@@ -90,6 +108,10 @@ class EvaluationExecutor(Executor[ESOperation]):
         # the testcase codename) and keeps track of multiplicity.
         self.queue_status_cumulative: dict[tuple, QueueEntryDict] = dict()
 
+        # Moving averages of the durations in seconds of the
+        # operations, indexed by operation type and dataset id.
+        self._durations: dict[tuple[str, int], float] = dict()
+
         for i in range(get_service_shards("Worker")):
             worker = ServiceCoord("Worker", i)
             self.pool.add_worker(worker)
@@ -108,19 +130,125 @@ class EvaluationExecutor(Executor[ESOperation]):
                 or item in self._currently_executing
                 or item in self.pool)
 
-    def max_operations_per_batch(self) -> int:
+    def get_contest_name(self, operation: ESOperation) -> str:
+        """Return the name of the contest an operation is for.
+
+        Training programs have a contest holding all their tasks, so
+        this is also how training programs are told apart. Names are
+        usually already known from load_contest_names or
+        add_contest_name, otherwise they are looked up in the DB.
+
+        operation: an operation.
+
+        return: the name of the contest of the task of the dataset
+            of the operation, or an empty string if the task is not
+            in a contest.
+
+        """
+        name = self._dataset_contest.get(operation.dataset_id)
+        if name is None:
+            with SessionGen() as session:
+                self.load_contest_names(session, operation.dataset_id)
+            name = self._dataset_contest.setdefault(operation.dataset_id, "")
+        return name
+
+    def load_contest_names(
+        self, session: Session, dataset_id: int | None = None
+    ):
+        """Load the names of the contests of the datasets.
+
+        When loading all of them, the names known before are dropped,
+        so that renamed contests, moved tasks and deleted datasets are
+        taken into account.
+
+        session: the session to use.
+        dataset_id: the only dataset to load, or None for all.
+
+        """
+        query = session.query(Dataset.id, func.coalesce(Contest.name, "")) \
+            .join(Task, Dataset.task_id == Task.id) \
+            .outerjoin(Contest, Task.contest_id == Contest.id)
+        if dataset_id is not None:
+            query = query.filter(Dataset.id == dataset_id)
+            self._dataset_contest.update(query.all())
+        else:
+            self._dataset_contest = dict(query.all())
+
+    def add_contest_name(self, dataset: Dataset):
+        """Record the name of the contest of a dataset.
+
+        dataset: a dataset, attached to a session.
+
+        """
+        contest = dataset.task.contest
+        self._dataset_contest[dataset.id] = \
+            contest.name if contest is not None else ""
+
+    @staticmethod
+    def get_contest_weight(name: str) -> float:
+        """Return the share of the workers due to a contest.
+
+        name: the name of a contest.
+
+        return: the weight of the contest in the configuration.
+
+        """
+        return config.evaluation_service.contest_weights.get(name, 1.0)
+
+    def get_contests_status(self) -> dict[str, dict]:
+        """Return the status of the contests with queued operations.
+
+        return: see FairPriorityQueue.get_tenants_status.
+
+        """
+        return self._fair_queue.get_tenants_status()
+
+    def add_duration(self, operation: ESOperation, duration: float):
+        """Update the moving average of the durations of the operations
+        like the given one.
+
+        operation: an operation that has been executed.
+        duration: how long it took, in seconds.
+
+        """
+        key = (operation.type_, operation.dataset_id)
+        average = self._durations.get(key)
+        if average is None:
+            self._durations[key] = duration
+        else:
+            self._durations[key] = average + \
+                EvaluationExecutor.DURATION_SMOOTHING * (duration - average)
+
+    def estimate_duration(self, operation: ESOperation) -> float | None:
+        """Return the expected duration of an operation.
+
+        operation: an operation.
+
+        return: the moving average of the durations of the operations
+            like the given one, in seconds, or None if we have none.
+
+        """
+        return self._durations.get((operation.type_, operation.dataset_id))
+
+    def max_operations_per_batch(self, first_item: ESOperation) -> int:
         """Return the maximum number of operations per batch.
 
         We derive the number from the length of the queue divided by
-        the number of workers, with a cap at MAX_OPERATIONS_PER_BATCH.
+        the number of enabled workers, so that all of them get some
+        work, and from the expected duration of the first operation,
+        so that the batch takes around TARGET_BATCH_DURATION, with a
+        cap at MAX_OPERATIONS_PER_BATCH.
 
         """
-        # TODO: len(self.pool) is the total number of workers,
-        # included those that are disabled.
-        ratio = len(self._operation_queue) // len(self.pool) + 1
+        ratio = len(self._operation_queue) \
+            // max(self.pool.enabled_count(), 1) + 1
         ret = min(max(ratio, 1), EvaluationExecutor.MAX_OPERATIONS_PER_BATCH)
-        logger.info("Ratio is %d, executing %d operations together.",
-                    ratio, ret)
+        duration = self.estimate_duration(first_item)
+        if duration is not None and duration > 0:
+            ret = min(ret, max(
+                int(EvaluationExecutor.TARGET_BATCH_DURATION / duration), 1))
+        logger.info("Ratio is %d, expected duration is %s s, executing %d "
+                    "operations together.", ratio, duration, ret)
         return ret
 
     def execute(self, entries: list[QueueEntry[ESOperation]]):
@@ -134,7 +262,7 @@ class EvaluationExecutor(Executor[ESOperation]):
 
         """
         with self._current_execution_lock:
-            self._currently_executing = []
+            self._currently_executing = {}
             for entry in entries:
                 operation = entry.item
                 # Side data is attached to the operation sent to the
@@ -142,15 +270,16 @@ class EvaluationExecutor(Executor[ESOperation]):
                 # will return it to us, and we will use it to
                 # re-enqueue it.
                 operation.side_data = (entry.priority, entry.timestamp)
-                self._currently_executing.append(operation)
+                self._currently_executing[operation] = None
         while len(self._currently_executing) > 0:
             self.pool.wait_for_workers()
             with self._current_execution_lock:
                 if len(self._currently_executing) == 0:
                     break
-                res = self.pool.acquire_worker(self._currently_executing)
+                res = self.pool.acquire_worker(
+                    list(self._currently_executing))
                 if res is not None:
-                    self._currently_executing = []
+                    self._currently_executing = {}
                     break
 
     def enqueue(self, item, priority, timestamp):
@@ -184,14 +313,16 @@ class EvaluationExecutor(Executor[ESOperation]):
             self._remove_from_cumulative_status(queue_entry)
         except KeyError:
             with self._current_execution_lock:
-                for i in range(len(self._currently_executing)):
-                    if self._currently_executing[i] == operation:
-                        del self._currently_executing[i]
-                        return
+                if operation in self._currently_executing:
+                    del self._currently_executing[operation]
+                    return
             raise
 
-    def _pop(self, wait=False):
-        queue_entry = super()._pop(wait=wait)
+    def _pop(self, wait=False, continue_batch=False):
+        # A batch takes the operations of a single contest as long as
+        # possible, which is charged once for the batch.
+        queue_entry = self._fair_queue.pop(
+            wait=wait, continue_last=continue_batch)
         self._remove_from_cumulative_status(queue_entry)
         return queue_entry
 
@@ -252,6 +383,15 @@ class EvaluationService(TriggeredService[ESOperation, EvaluationExecutor]):
     RESULT_CACHE_SIZE = 100
     # The maximum time since the last result before processing.
     MAX_FLUSHING_TIME_SECONDS = 2
+    # How many evaluations we insert with a single statement.
+    EVALUATION_INSERT_SIZE = 1000
+
+    # How often the sweeper looks at all submissions and user tests,
+    # instead of only at the new and the not yet completed ones.
+    FULL_SWEEP_INTERVAL = timedelta(minutes=30)
+    # How many not yet completed submissions or user tests the sweeper
+    # keeps track of before looking at all of them again.
+    MAX_PENDING_IDS = 10000
 
     def __init__(self, shard: int, contest_id: int | None = None):
         super().__init__(shard)
@@ -265,6 +405,10 @@ class EvaluationService(TriggeredService[ESOperation, EvaluationExecutor]):
             EvaluationService.MAX_FLUSHING_TIME_SECONDS,
             self.write_results)
 
+        # Results of the latest evaluations, to copy to the submissions
+        # with identical executables.
+        self.evaluation_memo = EvaluationMemo()
+
         # This lock is used to avoid inserting in the queue (which
         # itself is already thread-safe) an operation which is already
         # being processed. Such operation might be in one of the
@@ -288,6 +432,18 @@ class EvaluationService(TriggeredService[ESOperation, EvaluationExecutor]):
         # operations in state 4.
         self.post_finish_lock = gevent.lock.RLock()
 
+        # State of the incremental sweeps: whether the next one has to
+        # look at everything, when the last full one started, the
+        # largest submission and user test ids seen by the last one,
+        # and the ids of those for which there may still be something
+        # to do.
+        self._full_sweep_requested = True
+        self._last_full_sweep = 0.0
+        self._sweep_submission_id = 0
+        self._sweep_user_test_id = 0
+        self._pending_submission_ids: set[int] = set()
+        self._pending_user_test_ids: set[int] = set()
+
         self.scoring_service = self.connect_to(
             ServiceCoord("ScoringService", 0))
 
@@ -312,12 +468,19 @@ class EvaluationService(TriggeredService[ESOperation, EvaluationExecutor]):
         return: the number of actually enqueued operations.
 
         """
+        self._pending_submission_ids.add(submission.id)
         new_operations = 0
         for dataset in get_datasets_to_judge(submission.task):
+            self.get_executor().add_contest_name(dataset)
             submission_result = submission.get_result(dataset)
+            operations = list(submission_get_operations(
+                submission_result, submission, dataset, archive_sandbox))
+            if submission_to_evaluate(submission_result) \
+                    and EvaluationMemo.enabled_for(dataset):
+                operations = self.copy_memoized_evaluations(
+                    submission_result, operations)
             number_of_operations = 0
-            for operation, priority, timestamp in submission_get_operations(
-                    submission_result, submission, dataset, archive_sandbox):
+            for operation, priority, timestamp in operations:
                 number_of_operations += 1
                 if self.enqueue(operation, priority, timestamp):
                     new_operations += 1
@@ -335,6 +498,46 @@ class EvaluationService(TriggeredService[ESOperation, EvaluationExecutor]):
 
         return new_operations
 
+    def copy_memoized_evaluations(
+        self,
+        submission_result: SubmissionResult,
+        operations: list[tuple[ESOperation, int, datetime]],
+    ) -> list[tuple[ESOperation, int, datetime]]:
+        """Write the evaluations whose result is in the memo.
+
+        submission_result: the submission result to evaluate.
+        operations: the evaluation operations for the submission
+            result, with their priority and timestamp.
+
+        return: the operations whose result is not in the memo.
+
+        """
+        submission = submission_result.submission
+        dataset = submission_result.dataset
+        remaining = []
+        evaluations = []
+        for operation, priority, timestamp in operations:
+            if operation in self.get_executor() \
+                    or operation in self.result_cache:
+                remaining.append((operation, priority, timestamp))
+                continue
+            values = self.evaluation_memo.get(
+                EvaluationJob.from_submission(operation, submission, dataset))
+            if values is None:
+                remaining.append((operation, priority, timestamp))
+                continue
+            evaluations.append(Evaluation(
+                testcase=dataset.testcases[operation.testcase_codename],
+                **values))
+
+        if len(evaluations) > 0:
+            logger.info("Copied %d evaluations of submission %d(%d) from "
+                        "identical executables.", len(evaluations),
+                        submission.id, dataset.id)
+            submission_result.evaluations += evaluations
+            submission_result.sa_session.commit()
+        return remaining
+
     def user_test_enqueue_operations(self, user_test: UserTest) -> int:
         """Push in queue the operations required by a user test.
 
@@ -343,8 +546,10 @@ class EvaluationService(TriggeredService[ESOperation, EvaluationExecutor]):
         return: the number of actually enqueued operations.
 
         """
+        self._pending_user_test_ids.add(user_test.id)
         new_operations = 0
         for dataset in get_datasets_to_judge(user_test.task):
+            self.get_executor().add_contest_name(dataset)
             for operation, priority, timestamp in user_test_get_operations(
                     user_test, dataset):
                 if self.enqueue(operation, priority, timestamp):
@@ -358,21 +563,71 @@ class EvaluationService(TriggeredService[ESOperation, EvaluationExecutor]):
         evaluated for no good reasons. Put the missing operation in
         the queue.
 
+        Usually only the submissions and user tests created since the
+        previous sweep, or for which it (or ES) found something to do,
+        are looked at. Once every FULL_SWEEP_INTERVAL, and when asked
+        with search_operations_not_done, all of them are.
+
         """
+        pending_submission_ids = self._pending_submission_ids
+        pending_user_test_ids = self._pending_user_test_ids
+        self._pending_submission_ids = set()
+        self._pending_user_test_ids = set()
+
+        full = self._full_sweep_requested \
+            or time.monotonic() - self._last_full_sweep \
+            >= EvaluationService.FULL_SWEEP_INTERVAL.total_seconds() \
+            or len(pending_submission_ids) + len(pending_user_test_ids) \
+            > EvaluationService.MAX_PENDING_IDS
+        self._full_sweep_requested = False
+        if full:
+            self._last_full_sweep = time.monotonic()
+
         counter = 0
-        with SessionGen() as session:
+        try:
+            with SessionGen() as session:
+                # Read first, so that what is created during the sweep
+                # is looked at by the next one.
+                max_submission_id = \
+                    session.query(func.max(Submission.id)).scalar() or 0
+                max_user_test_id = \
+                    session.query(func.max(UserTest.id)).scalar() or 0
+                self.get_executor().load_contest_names(session)
+
+                operations = get_submissions_operations(
+                    session, self.contest_id,
+                    None if full else self._sweep_submission_id,
+                    pending_submission_ids)
+                for operation, priority, timestamp in operations:
+                    self._pending_submission_ids.add(operation.object_id)
+                    if self.enqueue(operation, priority, timestamp):
+                        counter += 1
+
+                operations = get_user_tests_operations(
+                    session, self.contest_id,
+                    None if full else self._sweep_user_test_id,
+                    pending_user_test_ids)
+                for operation, priority, timestamp in operations:
+                    self._pending_user_test_ids.add(operation.object_id)
+                    if self.enqueue(operation, priority, timestamp):
+                        counter += 1
+        except Exception:
+            # We lost track of what to look at.
+            self._full_sweep_requested = True
+            raise
 
-            for operation, priority, timestamp in \
-                    get_submissions_operations(session, self.contest_id):
-                if self.enqueue(operation, priority, timestamp):
-                    counter += 1
+        self._sweep_submission_id = max_submission_id
+        self._sweep_user_test_id = max_user_test_id
+        return counter
 
-            for operation, priority, timestamp in \
-                    get_user_tests_operations(session, self.contest_id):
-                if self.enqueue(operation, priority, timestamp):
-                    counter += 1
+    @rpc_method
+    def search_operations_not_done(self):
+        """Make the sweeper look at all submissions and user tests as
+        soon as possible.
 
-        return counter
+        """
+        self._full_sweep_requested = True
+        super().search_operations_not_done()
 
     @rpc_method
     def workers_status(self) -> dict:
@@ -380,10 +635,24 @@ class EvaluationService(TriggeredService[ESOperation, EvaluationExecutor]):
         are the information about the corresponding worker. See
         WorkerPool.get_status for more details.
 
+        In addition, we give the expected duration of the operations
+        of each worker, in seconds, or None if unknown.
+
         returns: the dict with the workers information.
 
         """
-        return self.get_executor().pool.get_status()
+        executor = self.get_executor()
+        status = executor.pool.get_status()
+        for worker_status in status.values():
+            duration = None
+            if isinstance(worker_status["operations"], list):
+                durations = [
+                    executor.estimate_duration(ESOperation.from_dict(o))
+                    for o in worker_status["operations"]]
+                if None not in durations:
+                    duration = sum(durations)
+            worker_status["estimated_duration"] = duration
+        return status
 
     def check_workers_timeout(self):
         """We ask WorkerPool for the unresponsive workers, and we put
@@ -473,6 +742,12 @@ class EvaluationService(TriggeredService[ESOperation, EvaluationExecutor]):
         if job_group_success:
             for job in job_group.jobs:
                 operation = job.operation
+                if job.success and job.plus is not None:
+                    duration = job.plus.get("execution_wall_clock_time")
+                    if duration is None:
+                        duration = job.plus.get("execution_time")
+                    if duration is not None:
+                        self.get_executor().add_duration(operation, duration)
                 if job.success:
                     logger.info("`%s' succeeded.", operation)
                 else:
@@ -511,6 +786,12 @@ class EvaluationService(TriggeredService[ESOperation, EvaluationExecutor]):
             by_object_and_type[t].append((operation, result))
 
         with SessionGen() as session:
+            # Successful evaluations are inserted all together at the
+            # end, instead of one at a time.
+            new_evaluations: list[
+                tuple[SubmissionResult, list[tuple[ESOperation, Result]]]
+            ] = []
+
             for key, operation_results in by_object_and_type.items():
                 type_, object_id, dataset_id, archive_sandbox = key
 
@@ -536,27 +817,61 @@ class EvaluationService(TriggeredService[ESOperation, EvaluationExecutor]):
                         continue
                     object_result = object_.get_result_or_create(dataset)
 
+                if type_ == ESOperation.EVALUATION \
+                        and EvaluationMemo.enabled_for(dataset):
+                    for _, result in operation_results:
+                        if result.job_success:
+                            self.evaluation_memo.add(result.job)
+
+                # Failures may change the submission result (e.g., by
+                # invalidating its compilation), so when there are
+                # any we keep processing the results in order.
+                if type_ == ESOperation.EVALUATION and all(
+                        result.job_success
+                        for _, result in operation_results):
+                    new_evaluations.append((object_result, operation_results))
+                    continue
+
                 self.write_results_one_object_and_type(
                     session, object_result, operation_results)
 
+            self.write_evaluations(session, new_evaluations)
+
             logger.info("Committing evaluations...")
             session.commit()
 
-            num_testcases_per_dataset = dict()
-            for type_, object_id, dataset_id, archive_sandbox in by_object_and_type.keys():
-                if type_ == ESOperation.EVALUATION:
-                    if dataset_id not in num_testcases_per_dataset:
-                        num_testcases_per_dataset[dataset_id] = session\
-                            .query(func.count(Testcase.id))\
-                            .filter(Testcase.dataset_id == dataset_id).scalar()
-                    num_evaluations = session\
-                        .query(func.count(Evaluation.id)) \
-                        .filter(Evaluation.dataset_id == dataset_id) \
-                        .filter(Evaluation.submission_id == object_id).scalar()
-                    if num_evaluations == num_testcases_per_dataset[dataset_id]:
-                        submission_result = SubmissionResult.get_from_id(
-                            (object_id, dataset_id), session)
-                        submission_result.set_evaluation_outcome()
+            evaluated = list(dict.fromkeys(
+                (object_id, dataset_id)
+                for type_, object_id, dataset_id, _ in by_object_and_type
+                if type_ == ESOperation.EVALUATION))
+            if len(evaluated) > 0 and \
+                    self.skip_decided_testcases(session, evaluated) > 0:
+                logger.info("Committing skipped evaluations...")
+                session.commit()
+
+            # Count testcases and evaluations with one query each,
+            # instead of two for each submission result.
+            if len(evaluated) > 0:
+                num_testcases_per_dataset = dict(
+                    session.query(Testcase.dataset_id, func.count(Testcase.id))
+                    .filter(Testcase.dataset_id.in_(
+                        {dataset_id for _, dataset_id in evaluated}))
+                    .group_by(Testcase.dataset_id).all())
+                num_evaluations = {
+                    (submission_id, dataset_id): count
+                    for submission_id, dataset_id, count in session
+                    .query(Evaluation.submission_id, Evaluation.dataset_id,
+                           func.count(Evaluation.id))
+                    .filter(tuple_(Evaluation.submission_id,
+                                   Evaluation.dataset_id).in_(evaluated))
+                    .group_by(Evaluation.submission_id,
+                              Evaluation.dataset_id).all()}
+            for object_id, dataset_id in evaluated:
+                if num_evaluations.get((object_id, dataset_id), 0) == \
+                        num_testcases_per_dataset.get(dataset_id, 0):
+                    submission_result = SubmissionResult.get_from_id(
+                        (object_id, dataset_id), session)
+                    submission_result.set_evaluation_outcome()
 
             logger.info("Committing evaluation outcomes...")
             session.commit()
@@ -584,6 +899,160 @@ class EvaluationService(TriggeredService[ESOperation, EvaluationExecutor]):
 
         logger.info("Done")
 
+    def skip_decided_testcases(
+        self, session: Session, evaluated: list[tuple[int, int]]
+    ) -> int:
+        """Skip the evaluations that cannot change the score anymore.
+
+        For the datasets with short-circuit evaluation, the score type
+        is asked which testcases are decided by the outcomes written so
+        far. Their operations are removed from the queue or ignored if
+        already on a worker, and they are written to the DB as skipped,
+        with outcome 0.0. Operations whose result is already in the
+        cache are left alone.
+
+        session: the DB session to use.
+        evaluated: the (submission id, dataset id) pairs that just
+            received evaluations.
+
+        return: the number of skipped evaluations written.
+
+        """
+        datasets = {
+            dataset.id: dataset for dataset in session.query(Dataset)
+            .filter(Dataset.id.in_({dataset_id for _, dataset_id in evaluated}))
+            .filter(Dataset.short_circuit_evaluation.is_(True)).all()}
+        evaluated = [(submission_id, dataset_id)
+                     for submission_id, dataset_id in evaluated
+                     if dataset_id in datasets]
+        if len(evaluated) == 0:
+            return 0
+
+        outcomes: defaultdict[tuple[int, int], dict[str, float]]
+        outcomes = defaultdict(dict)
+        for submission_id, dataset_id, codename, outcome in session\
+                .query(Evaluation.submission_id, Evaluation.dataset_id,
+                       Testcase.codename, Evaluation.outcome)\
+                .join(Evaluation.testcase)\
+                .join(Evaluation.submission_result)\
+                .filter(tuple_(Evaluation.submission_id,
+                               Evaluation.dataset_id).in_(evaluated))\
+                .filter(SubmissionResult.evaluation_outcome.is_(None))\
+                .filter(Evaluation.outcome.isnot(None)).all():
+            outcomes[submission_id, dataset_id][codename] = float(outcome)
+
+        rows = []
+        for (submission_id, dataset_id), known in outcomes.items():
+            dataset = datasets[dataset_id]
+            try:
+                codenames = \
+                    dataset.score_type_object.testcases_to_skip(known)
+            except Exception:
+                logger.warning("Cannot tell the testcases to skip for "
+                               "submission %d(%d).", submission_id,
+                               dataset_id, exc_info=True)
+                continue
+            for codename in codenames:
+                operations = [
+                    ESOperation(ESOperation.EVALUATION, submission_id,
+                                dataset_id, codename, archive_sandbox)
+                    for archive_sandbox in [False, True]]
+                if any(operation in self.result_cache
+                       for operation in operations):
+                    continue
+                for operation in operations:
+                    try:
+                        self.dequeue(operation)
+                    except KeyError:
+                        pass  # Ok, the operation wasn't in the queue.
+                    try:
+                        self.get_executor().pool.ignore_operation(operation)
+                    except LookupError:
+                        pass  # Ok, the operation wasn't in the pool.
+                rows.append({
+                    "submission_id": submission_id,
+                    "dataset_id": dataset_id,
+                    "testcase_id": dataset.testcases[codename].id,
+                    "outcome": "0.0",
+                    "text": [EVALUATION_MESSAGES.get("skipped").message],
+                })
+
+        if len(rows) == 0:
+            return 0
+        inserted = len(session.execute(
+            insert(Evaluation.__table__).values(rows)
+            .on_conflict_do_nothing(index_elements=[
+                Evaluation.submission_id, Evaluation.dataset_id,
+                Evaluation.testcase_id])
+            .returning(Evaluation.id)).fetchall())
+        logger.info("Skipped %d evaluations of decided subtasks.", inserted)
+        return inserted
+
+    def write_evaluations(
+        self,
+        session: Session,
+        new_evaluations: list[
+            tuple[SubmissionResult, list[tuple[ESOperation, Result]]]
+        ],
+    ):
+        """Write to the DB the successful evaluations of submissions.
+
+        The evaluations are inserted with a few multi-row statements,
+        skipping those already in the DB. If anything goes wrong, they
+        are written again one at a time, to isolate the culprit.
+
+        session: the DB session to use.
+        new_evaluations: the submission results with the evaluation
+            operations and corresponding successful worker results we
+            have received for each of them.
+
+        """
+        if len(new_evaluations) == 0:
+            return
+
+        # The submission results may have just been created. They are
+        # flushed before the savepoint (as begin_nested() would do
+        # anyway), so that if this fails we don't go on writing the
+        # evaluations one at a time in a broken transaction.
+        session.flush()
+        try:
+            rows = []
+            for submission_result, operation_results in new_evaluations:
+                testcases = submission_result.dataset.testcases
+                for operation, result in operation_results:
+                    rows.append(dict(
+                        result.job.get_evaluation_values(),
+                        submission_id=submission_result.submission_id,
+                        dataset_id=submission_result.dataset_id,
+                        testcase_id=testcases[
+                            operation.testcase_codename].id))
+
+            inserted = 0
+            with session.begin_nested():
+                for i in range(0, len(rows),
+                               EvaluationService.EVALUATION_INSERT_SIZE):
+                    inserted += len(session.execute(
+                        insert(Evaluation.__table__)
+                        .values(rows[
+                            i:i + EvaluationService.EVALUATION_INSERT_SIZE])
+                        .on_conflict_do_nothing(index_elements=[
+                            Evaluation.submission_id, Evaluation.dataset_id,
+                            Evaluation.testcase_id])
+                        .returning(Evaluation.id)).fetchall())
+        except Exception:
+            logger.warning(
+                "Unexpected exception while inserting evaluations, "
+                "writing them one at a time.", exc_info=True)
+            for submission_result, operation_results in new_evaluations:
+                self.write_results_one_object_and_type(
+                    session, submission_result, operation_results)
+            return
+
+        logger.info("Wrote %d evaluations to db.", inserted)
+        if inserted < len(rows):
+            logger.warning("Skipped %d evaluations already in the db.",
+                           len(rows) - inserted)
+
     def write_results_one_object_and_type(
         self,
         session: Session,
@@ -1208,11 +1677,45 @@ class EvaluationService(TriggeredService[ESOperation, EvaluationExecutor]):
         in the queue status.
 
         The entries are then ordered by priority and timestamp (the
-        same criteria used to look at what to complete next).
+        same criteria used to look at what to complete next, before
+        sharing the workers among the contests), and each has the
+        expected duration of one of its operations, in seconds, or
+        None if unknown, and the name of its contest.
 
         return: the list with the queued elements.
 
         """
-        return sorted(
-            self.get_executor().queue_status_cumulative.values(),
-            key=lambda x: (x["priority"], x["timestamp"]))
+        executor = self.get_executor()
+        status = []
+        for entry in executor.queue_status_cumulative.values():
+            operation = ESOperation(entry["item"]["type"],
+                                    entry["item"]["object_id"],
+                                    entry["item"]["dataset_id"])
+            status.append(dict(
+                entry,
+                estimated_duration=executor.estimate_duration(operation),
+                contest=executor.get_contest_name(operation)))
+        return sorted(status, key=lambda x: (x["priority"], x["timestamp"]))
+
+    @rpc_method
+    def evaluation_memo_status(self) -> dict:
+        """Return the size of the memo of the evaluation results and
+        how many evaluations were copied from it.
+
+        return: the number of results in the memo, and the number of
+            lookups that found or did not find a result.
+
+        """
+        return self.evaluation_memo.get_status()
+
+    @rpc_method
+    def contests_queue_status(self) -> dict[str, dict]:
+        """Return how the queue is shared among the contests.
+
+        return: for each contest name with operations in the queue
+            (the empty string for tasks not in a contest), the number
+            of its operations, its weight and its virtual time (how
+            much of the workers it got, divided by its weight).
+
+        """
+        return self.get_executor().get_contests_status()
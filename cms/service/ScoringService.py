@@ -26,11 +26,16 @@
 """
 
 import logging
+import time
+
+from sqlalchemy import tuple_
+from sqlalchemy.orm import selectinload
 
 from cms import ServiceCoord, config
-from cms.db import SessionGen, Submission, Dataset, Participation, \
-    get_submission_results
-from cms.grading.scorecache import update_score_cache, invalidate_score_cache
+from cms.db import SessionGen, Submission, SubmissionResult, Dataset, \
+    Participation, get_submission_results
+from cms.grading.scorecache import update_score_cache_batch, \
+    invalidate_score_cache
 from cms.io import Executor, TriggeredService, rpc_method
 from cms.io.priorityqueue import QueueEntry
 from cmscommon.datetime import make_datetime
@@ -41,86 +46,170 @@ logger = logging.getLogger(__name__)
 
 
 class ScoringExecutor(Executor[ScoringOperation]):
+
+    # Maximum number of submission results scored in a transaction.
+    MAX_OPERATIONS_PER_BATCH = 100
+
     def __init__(self, proxy_service):
-        super().__init__()
+        super().__init__(batch_executions=True)
         self.proxy_service = proxy_service
 
-    def execute(self, entry: QueueEntry[ScoringOperation]):
-        """Assign a score to a submission result.
+    def max_operations_per_batch(self, first_item: ScoringOperation) -> int:
+        """See Executor.max_operations_per_batch."""
+        return ScoringExecutor.MAX_OPERATIONS_PER_BATCH
+
+    def execute(self, entries: list[QueueEntry[ScoringOperation]]):
+        """Assign a score to a batch of submission results.
+
+        This is the core of ScoringService: here we retrieve the
+        results from the database, check if they are in the correct
+        status, instantiate their ScoreType, compute their score, store
+        them back in the database and tell ProxyService to update RWS
+        if needed.
 
-        This is the core of ScoringService: here we retrieve the result
-        from the database, check if it is in the correct status,
-        instantiate its ScoreType, compute its score, store it back in
-        the database and tell ProxyService to update RWS if needed.
+        All the results of the batch are scored in a single
+        transaction. If it cannot be committed, they are scored again
+        one per transaction, so that a single failure does not prevent
+        the others from being stored.
 
-        entry: entry containing the operation to perform.
+        entries: entries containing the operations to perform.
+
+        """
+        operations = [entry.item for entry in entries]
+        start_time = time.monotonic()
+        try:
+            count = self._score(operations)
+        except Exception:
+            logger.error("Couldn't score a batch of %d submission results, "
+                         "scoring them one by one.", len(operations),
+                         exc_info=True)
+            count = 0
+            for operation in operations:
+                try:
+                    count += self._score([operation])
+                except Exception:
+                    logger.error(
+                        "Unexpected error when executing operation `%s'.",
+                        operation, exc_info=True)
+        elapsed = time.monotonic() - start_time
+        logger.info("Scored %d submission results in %.3f seconds "
+                    "(%.1f per second).", count, elapsed,
+                    count / elapsed if elapsed > 0 else 0.0)
+
+    def _score(self, operations: list[ScoringOperation]) -> int:
+        """Score some submission results and commit them together.
+
+        Operations that cannot be performed are logged and skipped.
+
+        operations: the operations to perform.
+
+        return: the number of submission results scored.
 
         """
-        operation = entry.item
         with SessionGen() as session:
-            # Obtain submission.
-            submission = Submission.get_from_id(operation.submission_id,
-                                                session)
-            if submission is None:
-                raise ValueError("Submission %d not found in the database." %
+            # Load everything needed with one query per table, instead
+            # of a few for each operation.
+            submissions = {
+                submission.id: submission for submission in session
+                .query(Submission)
+                .filter(Submission.id.in_(
+                    {operation.submission_id for operation in operations}))
+                .all()}
+            datasets = {
+                dataset.id: dataset for dataset in session.query(Dataset)
+                .filter(Dataset.id.in_(
+                    {operation.dataset_id for operation in operations}))
+                .all()}
+            submission_results = {
+                (sr.submission_id, sr.dataset_id): sr for sr in session
+                .query(SubmissionResult)
+                .filter(tuple_(SubmissionResult.submission_id,
+                               SubmissionResult.dataset_id).in_(
+                    {(operation.submission_id, operation.dataset_id)
+                     for operation in operations}))
+                .options(selectinload(SubmissionResult.evaluations))
+                .all()}
+
+            scored: list[Submission] = []
+            active: list[Submission] = []
+            for operation in operations:
+                submission = submissions.get(operation.submission_id)
+                if submission is None:
+                    logger.error("Submission %d not found in the database.",
                                  operation.submission_id)
+                    continue
 
-            # Obtain dataset.
-            dataset = Dataset.get_from_id(operation.dataset_id, session)
-            if dataset is None:
-                raise ValueError("Dataset %d not found in the database." %
+                dataset = datasets.get(operation.dataset_id)
+                if dataset is None:
+                    logger.error("Dataset %d not found in the database.",
                                  operation.dataset_id)
+                    continue
+
+                submission_result = submission_results.get(
+                    (operation.submission_id, operation.dataset_id))
 
-            # Obtain submission result.
-            submission_result = submission.get_result(dataset)
-
-            # It means it was not even compiled (for some reason).
-            if submission_result is None:
-                raise ValueError("Submission result %d(%d) was not found." %
-                                 (operation.submission_id,
-                                  operation.dataset_id))
-
-            # Check if it's ready to be scored.
-            if not submission_result.needs_scoring():
-                if submission_result.scored():
-                    logger.info("Submission result %d(%d) is already scored.",
-                                operation.submission_id, operation.dataset_id)
-                    return
-                else:
-                    raise ValueError("The state of the submission result "
-                                     "%d(%d) doesn't allow scoring." %
-                                     (operation.submission_id,
-                                      operation.dataset_id))
-
-            # Instantiate the score type.
-            score_type = dataset.score_type_object
-
-            # Compute score and fill it in the database.
-            submission_result.score, \
-                submission_result.score_details, \
-                submission_result.public_score, \
-                submission_result.public_score_details, \
-                submission_result.ranking_score_details = \
-                score_type.compute_score(submission_result)
-
-            if submission_result.scored_at is None:
-                submission_result.scored_at = make_datetime()
-
-            # Update score cache for AWS ranking.
-            if dataset is submission.task.active_dataset:
-                update_score_cache(session, submission)
-
-            # Store it.
+                # It means it was not even compiled (for some reason).
+                if submission_result is None:
+                    logger.error("Submission result %d(%d) was not found.",
+                                 operation.submission_id,
+                                 operation.dataset_id)
+                    continue
+
+                # Check if it's ready to be scored.
+                if not submission_result.needs_scoring():
+                    if submission_result.scored():
+                        logger.info("Submission result %d(%d) is already "
+                                    "scored.", operation.submission_id,
+                                    operation.dataset_id)
+                    else:
+                        logger.error("The state of the submission result "
+                                     "%d(%d) doesn't allow scoring.",
+                                     operation.submission_id,
+                                     operation.dataset_id)
+                    continue
+
+                # Instantiate the score type and compute the score.
+                try:
+                    score_info = \
+                        dataset.score_type_object.compute_score(
+                            submission_result)
+                except Exception:
+                    logger.error("Couldn't compute the score of submission "
+                                 "result %d(%d).", operation.submission_id,
+                                 operation.dataset_id, exc_info=True)
+                    continue
+
+                # Fill it in the database.
+                submission_result.score, \
+                    submission_result.score_details, \
+                    submission_result.public_score, \
+                    submission_result.public_score_details, \
+                    submission_result.ranking_score_details = score_info
+
+                if submission_result.scored_at is None:
+                    submission_result.scored_at = make_datetime()
+
+                scored.append(submission)
+                if dataset is submission.task.active_dataset:
+                    active.append(submission)
+
+            # Update score cache for AWS ranking, once per participation
+            # and task.
+            update_score_cache_batch(session, active)
+
+            # Store them.
             session.commit()
 
             # If dataset is the active one, update RWS.
-            if dataset is submission.task.active_dataset:
+            for submission in active:
                 logger.info(
                     "Submission scored %.1f seconds after submission",
                     (make_datetime() - submission.timestamp).total_seconds())
                 self.proxy_service.submission_scored(
                     submission_id=submission.id)
 
+            return len(scored)
+
 
 class ScoringService(TriggeredService[ScoringOperation, ScoringExecutor]):
     """A service that assigns a score to submission results.
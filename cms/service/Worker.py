@@ -30,12 +30,14 @@ import time
 
 import gevent.lock
 
+from cms import config
 from cms.db import SessionGen, Contest, enumerate_files
 from cms.db.filecacher import FileCacher, TombstoneError
 from cms.grading import JobException
-from cms.grading.Job import CompilationJob, EvaluationJob, JobGroup
-from cms.grading.tasktypes import get_task_type
+from cms.grading.Job import CompilationJob, EvaluationJob, Job, JobGroup
+from cms.grading.tasktypes import get_task_type, sandbox_pool
 from cms.io import Service, rpc_method
+from .compilationcache import CompilationCache
 
 
 logger = logging.getLogger(__name__)
@@ -52,6 +54,10 @@ class Worker(Service):
     JOB_TYPE_COMPILATION = "compile"
     JOB_TYPE_EVALUATION = "evaluate"
 
+    # Number of concurrent connections used to download the files of a
+    # contest when precaching.
+    PRECACHE_PARALLELISM = 4
+
     def __init__(self, shard: int, fake_worker_time: float | None = None):
         Service.__init__(self, shard)
         self.file_cacher = FileCacher(self)
@@ -64,6 +70,12 @@ class Worker(Service):
 
         self._fake_worker_time = fake_worker_time
 
+        # Whether a job group is waiting for the current one to end.
+        self._look_ahead_pending = False
+
+        self.compilation_cache = CompilationCache(
+            config.worker.compilation_cache_size)
+
     @rpc_method
     def precache_files(self, contest_id: int):
         """RPC to ask the worker to precache of files in the contest.
@@ -91,15 +103,52 @@ class Worker(Service):
                                         skip_submissions=True,
                                         skip_user_tests=True,
                                         skip_print_jobs=True)
-            for digest in files:
-                try:
-                    self.file_cacher.cache_file(digest)
-                except KeyError:
-                    # No problem (at this stage) if we cannot find the
-                    # file
-                    pass
+            # No problem (at this stage) if we cannot find some files.
+            missing = self.file_cacher.cache_files(
+                files, parallelism=Worker.PRECACHE_PARALLELISM)
+
+            logger.info("Precaching finished (%d files not found).",
+                        len(missing))
+
+    @rpc_method
+    def cache_stats(self) -> dict:
+        """RPC to retrieve the usage counters of the local file cache.
+
+        return: see FileCacher.get_cache_stats().
+
+        """
+        return self.file_cacher.get_cache_stats()
 
-            logger.info("Precaching finished.")
+    @rpc_method
+    def compilation_cache_stats(self) -> dict:
+        """RPC to retrieve the usage counters of the compilation cache.
+
+        return: see CompilationCache.get_status(), and whether the
+            cache is enabled.
+
+        """
+        return dict(self.compilation_cache.get_status(),
+                    enabled=config.worker.compilation_cache)
+
+    @rpc_method
+    def work_stats(self) -> dict:
+        """RPC to retrieve how much time the worker spent executing job
+        groups and waiting for them.
+
+        return: the total busy and free (idle) time in seconds, the
+            percentage of busy time, the number of job groups executed,
+            and whether a job group is waiting for the current one.
+
+        """
+        total_time = self._total_busy_time + self._total_free_time
+        return {
+            "busy_time": self._total_busy_time,
+            "free_time": self._total_free_time,
+            "busyness": self._total_busy_time * 100.0 / total_time
+            if total_time > 0 else 0.0,
+            "job_groups": self._number_execution,
+            "look_ahead_pending": self._look_ahead_pending,
+        }
 
     @rpc_method
     def execute_job_group(self, job_group_dict: dict) -> dict:
@@ -115,28 +164,39 @@ class Worker(Service):
         start_time = time.time()
         job_group = JobGroup.import_from_dict(job_group_dict)
 
-        if self.work_lock.acquire(False):
+        acquired = self.work_lock.acquire(False)
+        prefetched = False
+        if not acquired and not self._look_ahead_pending:
+            # We accept one job group to execute after the current one,
+            # and meanwhile we download its files.
+            self._look_ahead_pending = True
+            try:
+                if self._fake_worker_time is None:
+                    logger.info("Prefetching the files of the next job "
+                                "group.")
+                    try:
+                        self._cache_job_group_files(job_group)
+                        prefetched = True
+                    except Exception:
+                        logger.warning("Failed to prefetch the files of "
+                                       "the next job group.", exc_info=True)
+                self.work_lock.acquire()
+                acquired = True
+                # The wait is accounted in the current job group.
+                start_time = time.time()
+            finally:
+                self._look_ahead_pending = False
+
+        if acquired:
             try:
                 logger.info("Starting job group.")
-                for job in job_group.jobs:
-                    logger.info("Starting job.",
-                                extra={"operation": job.info})
-
-                    job.shard = self.shard
-
-                    if self._fake_worker_time is None:
-                        task_type = get_task_type(job.task_type,
-                                                  job.task_type_parameters)
-                        try:
-                            task_type.execute_job(job, self.file_cacher)
-                        except TombstoneError:
-                            job.success = False
-                            job.plus = {"tombstone": True}
-                    else:
-                        self._fake_work(job)
-
-                    logger.info("Finished job.",
-                                extra={"operation": job.info})
+                if self._fake_worker_time is None and not prefetched:
+                    self._cache_job_group_files(job_group)
+                with sandbox_pool() as pool:
+                    for job in job_group.jobs:
+                        if pool is not None:
+                            pool.start_job(job)
+                        self._execute_job(job)
 
                 logger.info("Finished job group.")
                 return job_group.export_to_dict()
@@ -152,13 +212,70 @@ class Worker(Service):
 
         else:
             err_msg = "Request received, but declined because of acquired " \
-                "lock (Worker is busy executing another job, this should " \
-                "not happen: check if there are more than one ES running, " \
-                "or for bugs in ES."
+                "lock (Worker is busy executing another job and already " \
+                "has the next one, this should not happen: check if " \
+                "there are more than one ES running, or for bugs in ES."
             logger.warning(err_msg)
             self._finalize(start_time)
             raise JobException(err_msg)
 
+    def _execute_job(self, job: Job):
+        """Execute a single job of a job group, storing the results in it.
+
+        job: the job to execute.
+
+        """
+        logger.info("Starting job.", extra={"operation": job.info})
+
+        job.shard = self.shard
+
+        use_cache = self._use_compilation_cache(job)
+        if self._fake_worker_time is None:
+            if use_cache and self.compilation_cache.fill(job):
+                logger.info("Reused the executables of a previous "
+                            "compilation.", extra={"operation": job.info})
+            else:
+                task_type = get_task_type(job.task_type,
+                                          job.task_type_parameters)
+                try:
+                    task_type.execute_job(job, self.file_cacher)
+                except TombstoneError:
+                    job.success = False
+                    job.plus = {"tombstone": True}
+                if use_cache:
+                    self.compilation_cache.add(job)
+        else:
+            self._fake_work(job)
+
+        logger.info("Finished job.", extra={"operation": job.info})
+
+    @staticmethod
+    def _use_compilation_cache(job: Job) -> bool:
+        """Return whether the compilation cache applies to a job.
+
+        Jobs whose sandbox is to be kept or archived are always
+        executed, as the sandbox is what they are asked for.
+
+        """
+        return isinstance(job, CompilationJob) \
+            and config.worker.compilation_cache \
+            and not job.keep_sandbox and not job.archive_sandbox
+
+    def _cache_job_group_files(self, job_group: JobGroup):
+        """Download all the files needed by a job group at once.
+
+        This way, the task types find them in the cache instead of
+        requesting them one by one. Missing files are ignored here, the
+        task types will report them when they need them.
+
+        job_group: the job group about to be executed.
+
+        """
+        digests = []
+        for job in job_group.jobs:
+            digests += job.get_input_digests()
+        self.file_cacher.cache_files(digests)
+
     def _fake_work(self, job):
         """Fill the job with fake success data after waiting for some time."""
         time.sleep(self._fake_worker_time)
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+
+# Contest Management System - http://cms-dev.github.io/
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""A cache of the successful compilations of a worker, to avoid
+compiling again the same sources with the same managers.
+
+"""
+
+import copy
+import json
+import logging
+from collections import OrderedDict
+
+from cms.db import Executable
+from cms.grading.Job import CompilationJob
+from cms.grading.languagemanager import get_language
+from cms.grading.tasktypes import is_manager_for_compilation
+
+
+logger = logging.getLogger(__name__)
+
+
+class CompilationCache:
+    """The results of the latest successful compilations, indexed by
+    everything the compilation depends on.
+
+    The key of a compilation is made of the language, the names and
+    digests of the source files and of the managers, the task type and
+    its parameters, and the compilation commands of the language, which
+    change with its configuration (e.g., the compiler flags). Only the
+    least recently used results are remembered.
+
+    """
+
+    def __init__(self, size: int):
+        """Create a cache.
+
+        size: how many compilations to remember.
+
+        """
+        self.size = size
+        self._results: OrderedDict[tuple, dict] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._results)
+
+    @staticmethod
+    def commands(job: CompilationJob) -> tuple | None:
+        """Return the commands compiling the sources of a job.
+
+        The commands are those of the language for the submitted files
+        and the managers to compile, with a fixed executable name; the
+        task type might use other names, but it does so in the same way
+        for all the jobs with the same key.
+
+        return: the commands, or None if the language is unknown.
+
+        """
+        try:
+            language = get_language(job.language)
+        except KeyError:
+            return None
+        source_ext = language.source_extension
+        source_filenames = sorted(
+            filename.replace(".%l", source_ext) for filename in job.files)
+        source_filenames += sorted(
+            filename for filename in job.managers
+            if is_manager_for_compilation(filename, language))
+        return tuple(
+            tuple(command) for command in language.get_compilation_commands(
+                source_filenames, "executable"))
+
+    @staticmethod
+    def key(job: CompilationJob) -> tuple:
+        """Return the key of a compilation job."""
+        return (
+            job.task_type,
+            json.dumps(job.task_type_parameters, sort_keys=True),
+            job.language,
+            tuple(sorted((filename, file_.digest)
+                         for filename, file_ in job.files.items())),
+            tuple(sorted((filename, manager.digest)
+                         for filename, manager in job.managers.items())),
+            CompilationCache.commands(job),
+        )
+
+    def add(self, job: CompilationJob):
+        """Remember the result of a compilation job, if successful.
+
+        job: the executed job.
+
+        """
+        if not job.success or not job.compilation_success:
+            return
+        key = CompilationCache.key(job)
+        self._results[key] = {
+            "text": copy.deepcopy(job.text),
+            "plus": copy.deepcopy(job.plus),
+            "executables": {filename: executable.digest
+                            for filename, executable
+                            in job.executables.items()},
+        }
+        self._results.move_to_end(key)
+        while len(self._results) > self.size:
+            self._results.popitem(last=False)
+
+    def fill(self, job: CompilationJob) -> bool:
+        """Fill a compilation job with the cached result, if any.
+
+        job: the job, not executed yet.
+
+        return: whether the job was filled.
+
+        """
+        key = CompilationCache.key(job)
+        result = self._results.get(key)
+        if result is None:
+            self.misses += 1
+            return False
+        self._results.move_to_end(key)
+        self.hits += 1
+        job.success = True
+        job.compilation_success = True
+        job.text = copy.deepcopy(result["text"])
+        job.plus = copy.deepcopy(result["plus"])
+        job.executables = {filename: Executable(filename, digest)
+                           for filename, digest
+                           in result["executables"].items()}
+        return True
+
+    def get_status(self) -> dict:
+        """Return the size and the hit counts of the cache."""
+        return {"size": len(self._results),
+                "max_size": self.size,
+                "hits": self.hits,
+                "misses": self.misses}
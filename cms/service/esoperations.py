@@ -26,7 +26,7 @@ compute sets of operations to do.
 
 """
 
-from collections.abc import Generator
+from collections.abc import Collection, Generator
 from datetime import datetime
 import logging
 
@@ -300,14 +300,31 @@ def get_relevant_operations(
     return operations
 
 
+def _since_filter(id_column, since_id: int, pending_ids: Collection[int]):
+    """Return a filter selecting the ids larger than since_id or in
+    pending_ids.
+
+    """
+    if len(pending_ids) == 0:
+        return id_column > since_id
+    return (id_column > since_id) | id_column.in_(pending_ids)
+
+
 def get_submissions_operations(
-    session: Session, contest_id: int | None = None
+    session: Session,
+    contest_id: int | None = None,
+    since_id: int | None = None,
+    pending_ids: Collection[int] = (),
 ) -> list[tuple["ESOperation", int, datetime]]:
     """Return all the operations to do for submissions in the contest.
 
     session: the database session to use.
     contest_id: the contest for which we want the operations.
         If none, get operations for any contest.
+    since_id: if given, look only at the submissions with a larger
+        id or in pending_ids, instead of at all of them.
+    pending_ids: the ids of the other submissions to look at, when
+        since_id is given.
 
     return: a list of tuples of operation, priority and timestamp.
 
@@ -318,6 +335,8 @@ def get_submissions_operations(
         contest_filter = literal(True)
     else:
         contest_filter = Task.contest_id == contest_id
+    if since_id is not None:
+        contest_filter &= _since_filter(Submission.id, since_id, pending_ids)
 
     # Retrieve the compilation operations for all submissions without
     # the corresponding result for a dataset to judge. Since we have
@@ -409,13 +428,20 @@ def get_submissions_operations(
 
 
 def get_user_tests_operations(
-    session: Session, contest_id: int | None = None
+    session: Session,
+    contest_id: int | None = None,
+    since_id: int | None = None,
+    pending_ids: Collection[int] = (),
 ) -> list[tuple["ESOperation", int, datetime]]:
     """Return all the operations to do for user tests in the contest.
 
     session: the database session to use.
     contest_id: the contest for which we want the operations.
         If none, get operations for any contest.
+    since_id: if given, look only at the user tests with a larger id
+        or in pending_ids, instead of at all of them.
+    pending_ids: the ids of the other user tests to look at, when
+        since_id is given.
 
     return: a list of tuples of operation, priority and timestamp.
 
@@ -426,6 +452,8 @@ def get_user_tests_operations(
         contest_filter = literal(True)
     else:
         contest_filter = Task.contest_id == contest_id
+    if since_id is not None:
+        contest_filter &= _since_filter(UserTest.id, since_id, pending_ids)
 
     # Retrieve the compilation operations for all user tests without
     # the corresponding result for a dataset to judge. Since we have
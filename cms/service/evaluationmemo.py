@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+
+# Contest Management System - http://cms-dev.github.io/
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""A memo of the evaluation results, to avoid evaluating again
+submissions whose executables are identical to those of a submission
+already evaluated.
+
+"""
+
+import json
+import logging
+from collections import OrderedDict
+
+from cms.db import Dataset
+from cms.grading.Job import EvaluationJob
+from cms.grading.tasktypes import get_task_type_class
+
+
+logger = logging.getLogger(__name__)
+
+
+class EvaluationMemo:
+    """The results of the latest evaluations, indexed by everything
+    their outcome depends on.
+
+    The key of an evaluation is made of the digests of the executables
+    and the managers, the language, the testcase, the limits and the
+    task type and its parameters, all taken from the evaluation job.
+    Only the least recently used MAX_SIZE results are remembered.
+
+    """
+
+    MAX_SIZE = 100000
+
+    # The columns of the Evaluation copied from a memoized result; the
+    # others describe the worker run, that did not happen.
+    VALUES = ["text", "outcome", "execution_time",
+              "execution_wall_clock_time", "execution_memory"]
+
+    def __init__(self):
+        self._results: OrderedDict[tuple, dict[str, object]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._results)
+
+    @staticmethod
+    def enabled_for(dataset: Dataset) -> bool:
+        """Return whether the evaluations for a dataset can be
+        memoized, that is if both its task type and the dataset allow
+        it.
+
+        """
+        try:
+            task_type_class = get_task_type_class(dataset.task_type)
+        except KeyError:
+            return False
+        return dataset.deduplicate_evaluations \
+            and task_type_class.DEDUPLICATE_EVALUATIONS
+
+    @staticmethod
+    def key(job: EvaluationJob) -> tuple | None:
+        """Return the key of the result of an evaluation job.
+
+        return: the key, or None if the job has no executables, as its
+            outcome would then depend on the submitted files instead.
+
+        """
+        if len(job.executables) == 0:
+            return None
+        return (
+            job.operation.dataset_id,
+            job.operation.testcase_codename,
+            job.task_type,
+            json.dumps(job.task_type_parameters, sort_keys=True),
+            job.language,
+            tuple(sorted((filename, executable.digest)
+                         for filename, executable
+                         in job.executables.items())),
+            tuple(sorted((filename, manager.digest)
+                         for filename, manager in job.managers.items())),
+            job.input,
+            job.output,
+            job.time_limit,
+            job.memory_limit,
+        )
+
+    def add(self, job: EvaluationJob):
+        """Remember the result of a successful evaluation job.
+
+        job: the job, as returned by the worker.
+
+        """
+        key = EvaluationMemo.key(job)
+        if key is None:
+            return
+        values = job.get_evaluation_values()
+        self._results[key] = {name: values[name]
+                              for name in EvaluationMemo.VALUES}
+        self._results.move_to_end(key)
+        while len(self._results) > EvaluationMemo.MAX_SIZE:
+            self._results.popitem(last=False)
+
+    def get(self, job: EvaluationJob) -> dict[str, object] | None:
+        """Return the result of an evaluation job, if known.
+
+        job: the job, not executed yet.
+
+        return: the values of the columns of the Evaluation, except
+            those identifying the submission, the dataset and the
+            testcase, or None if the result is not known.
+
+        """
+        key = EvaluationMemo.key(job)
+        if key is None:
+            return None
+        values = self._results.get(key)
+        if values is None:
+            self.misses += 1
+            return None
+        self._results.move_to_end(key)
+        self.hits += 1
+        return dict(values)
+
+    def get_status(self) -> dict:
+        """Return the size and the hit counts of the memo."""
+        return {"size": len(self._results),
+                "hits": self.hits,
+                "misses": self.misses}
@@ -27,12 +27,14 @@
 
 import logging
 import random
+from collections import OrderedDict
 from datetime import datetime, timedelta
 import typing
 
 import gevent.lock
 from gevent.event import Event
 
+from cms import config
 from cms.conf import ServiceCoord
 from cms.db import SessionGen
 from cms.grading.Job import JobGroup
@@ -58,6 +60,14 @@ class WorkerPool:
     # Seconds after which we declare a worker stale.
     WORKER_TIMEOUT = timedelta(seconds=600)
 
+    # How many submissions, user tests and datasets we remember for
+    # each worker, as likely to have their files in its cache.
+    AFFINITY_MEMORY = 100
+    # How much having worked on the same submission or user test, and
+    # on the same dataset, counts when choosing a worker.
+    AFFINITY_OBJECT_WEIGHT = 2
+    AFFINITY_DATASET_WEIGHT = 1
+
     def __init__(self, service: "EvaluationService"):
         """
         service: the EvaluationService using this WorkerPool.
@@ -74,11 +84,20 @@ class WorkerPool:
         # worker should be discarded. Operations is the list of
         # operations currently executing. Operations to ignore is the
         # list of operations to ignore in the next batch of results.
+        # Look-ahead is the list of operations sent to the worker to
+        # execute after the current ones, if any.
         self._operations: dict[int, list[ESOperation]] = {}
+        self._look_ahead: dict[int, list[ESOperation] | None] = {}
         self._operations_to_ignore: dict[int, list[ESOperation]] = {}
         self._start_time: dict[int, datetime | None] = {}
         self._schedule_disabling: dict[int, bool] = {}
         self._ignore: dict[int, bool] = {}
+        # Affinity is, for each worker, the submissions, user tests and
+        # datasets it recently worked on (as the keys, from the least
+        # recent); affinity stats count the operations given to it,
+        # and how many of them were for something in its affinity.
+        self._affinity: dict[int, OrderedDict[tuple, None]] = {}
+        self._affinity_stats: dict[int, dict[str, int]] = {}
 
         # TODO: given the number of pieces data associated to each
         # worker, this class could be simplified by creating a new
@@ -91,6 +110,13 @@ class WorkerPool:
         # A reverse lookup dictionary mapping operations to shards.
         self._operations_reverse: dict[ESOperation, int] = {}
 
+        # The shards of the workers that are inactive, doing some
+        # operations, or disabled, kept in sync with _operations so
+        # that finding a worker does not need to look at all of them.
+        self._inactive: set[int] = set()
+        self._busy: set[int] = set()
+        self._disabled: set[int] = set()
+
         # A lock to ensure that the reverse lookup stays in sync with
         # the operations lists.
         self._operation_lock = gevent.lock.RLock()
@@ -104,9 +130,34 @@ class WorkerPool:
     def __len__(self):
         return len(self._worker)
 
+    def enabled_count(self) -> int:
+        """Return the number of workers that are not disabled."""
+        return len(self._worker) - len(self._disabled)
+
     def __contains__(self, operation):
         return operation in self._operations_reverse
 
+    def _set_operations(
+        self, shard: int, operations: list[ESOperation] | str | None
+    ):
+        """Set the operations of a worker, updating its status.
+
+        shard: the worker whose operations to set.
+        operations: the operations, or WORKER_INACTIVE, or
+            WORKER_DISABLED.
+
+        """
+        self._operations[shard] = operations
+        self._inactive.discard(shard)
+        self._busy.discard(shard)
+        self._disabled.discard(shard)
+        if operations == WorkerPool.WORKER_INACTIVE:
+            self._inactive.add(shard)
+        elif operations == WorkerPool.WORKER_DISABLED:
+            self._disabled.add(shard)
+        else:
+            self._busy.add(shard)
+
     def _remove_operations(self, shard: int, new_operation: str | None):
         """Safely remove operations from a worker, assigning a new status.
 
@@ -117,7 +168,7 @@ class WorkerPool:
         """
         with self._operation_lock:
             operations = self._operations[shard]
-            self._operations[shard] = new_operation
+            self._set_operations(shard, new_operation)
             if isinstance(operations, list):
                 for operation in operations:
                     del self._operations_reverse[operation]
@@ -132,10 +183,45 @@ class WorkerPool:
         if self._operations[shard] != WorkerPool.WORKER_INACTIVE:
             raise ValueError("Shard %s is already doing an operation.", shard)
         with self._operation_lock:
-            self._operations[shard] = operations
+            self._set_operations(shard, operations)
+            for operation in operations:
+                self._operations_reverse[operation] = shard
+
+    def _add_look_ahead(self, shard: int, operations: list[ESOperation]):
+        """Assigns operations to a busy worker, to execute after the
+        current ones.
+
+        shard: shard of the worker.
+        operations: operations to assign to the worker.
+
+        """
+        if self._look_ahead[shard] is not None:
+            raise ValueError("Shard %s already has operations to do next."
+                             % shard)
+        with self._operation_lock:
+            self._look_ahead[shard] = operations
             for operation in operations:
                 self._operations_reverse[operation] = shard
 
+    def _remove_look_ahead(self, shard: int) -> list[ESOperation]:
+        """Remove the operations a worker was to execute next.
+
+        shard: the worker from which to remove the operations.
+
+        return: the non-ignored operations removed.
+
+        """
+        with self._operation_lock:
+            operations = self._look_ahead[shard]
+            self._look_ahead[shard] = None
+            if operations is None:
+                return []
+            for operation in operations:
+                del self._operations_reverse[operation]
+            to_ignore = self._operations_to_ignore[shard]
+            return [operation for operation in operations
+                    if operation not in to_ignore]
+
     def wait_for_workers(self):
         """Wait until a worker might be available."""
         self._workers_available_event.wait()
@@ -153,11 +239,15 @@ class WorkerPool:
             on_connect=self.on_worker_connected)
 
         # And we fill all data.
-        self._operations[shard] = WorkerPool.WORKER_INACTIVE
+        self._set_operations(shard, WorkerPool.WORKER_INACTIVE)
         self._operations_to_ignore[shard] = []
+        self._look_ahead[shard] = None
         self._start_time[shard] = None
         self._schedule_disabling[shard] = False
         self._ignore[shard] = False
+        self._affinity[shard] = OrderedDict()
+        self._affinity_stats[shard] = {
+            "operations": 0, "object_hits": 0, "dataset_hits": 0}
         self._workers_available_event.set()
         logger.debug("Worker %s added.", shard)
 
@@ -194,20 +284,26 @@ class WorkerPool:
             assigned to the operation otherwise.
 
         """
-        # We look for an available worker.
+        # We look for an available worker, preferring those that
+        # likely have the files of the operations; otherwise, for a
+        # busy worker that can receive them in advance, to prefetch
+        # their files while executing its current operations.
         try:
-            shard = self.find_worker(WorkerPool.WORKER_INACTIVE,
-                                     require_connection=True,
-                                     random_worker=True)
+            shard = self._find_affine_worker(operations)
         except LookupError:
-            self._workers_available_event.clear()
-            return None
-
-        # Then we fill the info for future memory.
-        self._add_operations(shard, operations)
-
-        logger.debug("Worker %s acquired.", shard)
-        self._start_time[shard] = make_datetime()
+            try:
+                shard = self._find_look_ahead_worker()
+            except LookupError:
+                self._workers_available_event.clear()
+                return None
+            self._add_look_ahead(shard, operations)
+            logger.debug("Worker %s acquired to look ahead.", shard)
+        else:
+            # Then we fill the info for future memory.
+            self._add_operations(shard, operations)
+            logger.debug("Worker %s acquired.", shard)
+            self._start_time[shard] = make_datetime()
+        self._update_affinity(shard, operations)
 
         with SessionGen() as session:
             job_group_dict = \
@@ -248,14 +344,34 @@ class WorkerPool:
 
         ret = self._ignore[shard]
         with self._operation_lock:
-            to_ignore = self._operations_to_ignore[shard]
-            self._operations_to_ignore[shard] = []
+            # Operations to ignore in the look-ahead are kept for when
+            # their results arrive.
+            operations = self._operations[shard]
+            to_ignore = [operation
+                         for operation in self._operations_to_ignore[shard]
+                         if operation in operations]
+            self._operations_to_ignore[shard] = [
+                operation
+                for operation in self._operations_to_ignore[shard]
+                if operation not in operations]
         self._start_time[shard] = None
         self._ignore[shard] = False
         if self._schedule_disabling[shard]:
+            self._remove_look_ahead(shard)
             self._remove_operations(shard, WorkerPool.WORKER_DISABLED)
+            self._operations_to_ignore[shard] = []
             self._schedule_disabling[shard] = False
             logger.info("Worker %s released and disabled.", shard)
+        elif self._look_ahead[shard] is not None:
+            # The worker is already executing the look-ahead.
+            with self._operation_lock:
+                for operation in operations:
+                    del self._operations_reverse[operation]
+                self._set_operations(shard, self._look_ahead[shard])
+                self._look_ahead[shard] = None
+            self._start_time[shard] = make_datetime()
+            self._workers_available_event.set()
+            logger.debug("Worker %s released, now on its look-ahead.", shard)
         else:
             self._remove_operations(shard, WorkerPool.WORKER_INACTIVE)
             self._workers_available_event.set()
@@ -289,18 +405,133 @@ class WorkerPool:
         raise (LookupError): if nothing has been found.
 
         """
+        if operation == WorkerPool.WORKER_INACTIVE:
+            candidates = self._inactive
+        elif operation == WorkerPool.WORKER_DISABLED:
+            candidates = self._disabled
+        else:
+            candidates = (shard for shard in self._busy
+                          if self._operations[shard] == operation)
+
         pool = []
-        for shard, worker_operation in self._operations.items():
-            if worker_operation == operation:
-                if not require_connection or self._worker[shard].connected:
-                    pool.append(shard)
-                    if not random_worker:
-                        return shard
+        for shard in candidates:
+            if not require_connection or self._worker[shard].connected:
+                pool.append(shard)
+                if not random_worker:
+                    return shard
         if pool == []:
             raise LookupError("No such operation.")
         else:
             return random.choice(pool)
 
+    @staticmethod
+    def _affinity_keys(operation: ESOperation) -> tuple[tuple, tuple]:
+        """Return what a worker keeps in its cache for an operation.
+
+        operation: an operation.
+
+        return: the keys of the submission or user test, and of the
+            dataset, of the operation.
+
+        """
+        if operation.type_ in (ESOperation.COMPILATION,
+                               ESOperation.EVALUATION):
+            object_key = ("submission", operation.object_id)
+        else:
+            object_key = ("user_test", operation.object_id)
+        return object_key, ("dataset", operation.dataset_id)
+
+    def _find_affine_worker(self, operations: list[ESOperation]) -> int:
+        """Return an inactive and connected worker for the operations.
+
+        Among those, we choose the workers that recently worked on the
+        most submissions, user tests and datasets of the operations,
+        and one of them at random.
+
+        operations: the operations to assign to a worker.
+
+        return: the shard of the worker.
+
+        raise (LookupError): if no worker is available.
+
+        """
+        object_keys = set()
+        dataset_keys = set()
+        for operation in operations:
+            object_key, dataset_key = self._affinity_keys(operation)
+            object_keys.add(object_key)
+            dataset_keys.add(dataset_key)
+
+        best_score = -1
+        best_shards = []
+        for shard in self._inactive:
+            if not self._worker[shard].connected:
+                continue
+            affinity = self._affinity[shard]
+            score = \
+                WorkerPool.AFFINITY_OBJECT_WEIGHT * sum(
+                    key in affinity for key in object_keys) + \
+                WorkerPool.AFFINITY_DATASET_WEIGHT * sum(
+                    key in affinity for key in dataset_keys)
+            if score > best_score:
+                best_score = score
+                best_shards = [shard]
+            elif score == best_score:
+                best_shards.append(shard)
+
+        if best_shards == []:
+            raise LookupError("No worker available.")
+        return random.choice(best_shards)
+
+    def _find_look_ahead_worker(self) -> int:
+        """Return a busy and connected worker that can receive the
+        operations to execute after the current ones.
+
+        We choose the worker that started its current operations
+        first, as likely the first to finish them.
+
+        return: the shard of the worker.
+
+        raise (LookupError): if no worker is available, or look-ahead
+            is disabled.
+
+        """
+        if not config.evaluation_service.worker_look_ahead:
+            raise LookupError("Look-ahead disabled.")
+        candidates = [
+            shard for shard in self._busy
+            if self._look_ahead[shard] is None
+            and self._start_time[shard] is not None
+            and not self._schedule_disabling[shard]
+            and not self._ignore[shard]
+            and self._worker[shard].connected]
+        if candidates == []:
+            raise LookupError("No worker available.")
+        return min(candidates, key=lambda shard: self._start_time[shard])
+
+    def _update_affinity(self, shard: int, operations: list[ESOperation]):
+        """Record that a worker is going to work on the operations.
+
+        shard: the worker.
+        operations: the operations assigned to the worker.
+
+        """
+        affinity = self._affinity[shard]
+        stats = self._affinity_stats[shard]
+        keys = []
+        for operation in operations:
+            object_key, dataset_key = self._affinity_keys(operation)
+            stats["operations"] += 1
+            stats["object_hits"] += object_key in affinity
+            stats["dataset_hits"] += dataset_key in affinity
+            keys += [object_key, dataset_key]
+
+        for key in keys:
+            affinity[key] = None
+            affinity.move_to_end(key)
+        while len(affinity) > WorkerPool.AFFINITY_MEMORY:
+            affinity.popitem(last=False)
+
     def ignore_operation(self, operation: ESOperation):
         """Mark the operation to be ignored.
 
@@ -323,8 +554,10 @@ class WorkerPool:
         workers.
 
         return: dict of info: current operation, starting time,
-            number of errors, and additional data specified in the
-            operation.
+            number of errors, additional data specified in the
+            operation, and how many of the operations given to the
+            worker were for submissions or user tests (object hits)
+            and datasets it had recently worked on.
 
         """
         result = dict()
@@ -332,13 +565,18 @@ class WorkerPool:
             s_time = self._start_time[shard]
             s_time = make_timestamp(s_time) if s_time is not None else None
 
+            look_ahead = self._look_ahead[shard]
             result["%d" % shard] = {
                 'connected': self._worker[shard].connected,
                 'operations': [operation.to_dict()
                                for operation in self._operations[shard]]
                 if isinstance(self._operations[shard], list)
                 else self._operations[shard],
-                'start_time': s_time}
+                'look_ahead': [operation.to_dict()
+                               for operation in look_ahead]
+                if look_ahead is not None else None,
+                'start_time': s_time,
+                'affinity': dict(self._affinity_stats[shard])}
         return result
 
     def check_timeouts(self) -> list[ESOperation]:
@@ -352,7 +590,7 @@ class WorkerPool:
         """
         now = make_datetime()
         lost_operations = []
-        for shard in self._worker:
+        for shard in sorted(self._busy):
             if self._start_time[shard] is not None:
                 active_for = now - self._start_time[shard]
 
@@ -375,6 +613,7 @@ class WorkerPool:
                             if operation not in \
                                     self._operations_to_ignore[shard]:
                                 lost_operations.append(operation)
+                    lost_operations += self._remove_look_ahead(shard)
 
                     # Also, we are not trusting it, so we are not
                     # assigning it new operations even if it comes back to
@@ -406,7 +645,7 @@ class WorkerPool:
 
         lost_operations = []
         if self._operations[shard] == WorkerPool.WORKER_INACTIVE:
-            self._operations[shard] = WorkerPool.WORKER_DISABLED
+            self._set_operations(shard, WorkerPool.WORKER_DISABLED)
 
         else:
             # We return all non-ignored operations so ES can do what
@@ -417,6 +656,7 @@ class WorkerPool:
                     for operation in self._operations[shard]:
                         if operation not in to_ignore:
                             lost_operations.append(operation)
+            lost_operations += self._remove_look_ahead(shard)
 
             # And we mark the worker as disabled (until another action
             # is taken).
@@ -442,7 +682,7 @@ class WorkerPool:
             logger.error(err_msg)
             raise ValueError(err_msg)
 
-        self._operations[shard] = WorkerPool.WORKER_INACTIVE
+        self._set_operations(shard, WorkerPool.WORKER_INACTIVE)
         self._operations_to_ignore[shard] = []
         self._workers_available_event.set()
         logger.info("Worker %s enabled.", shard)
@@ -456,13 +696,12 @@ class WorkerPool:
 
         """
         lost_operations = []
-        for shard in self._worker:
-            if not self._worker[shard].connected and \
-                    self._operations[shard] not in [
-                        WorkerPool.WORKER_DISABLED,
-                        WorkerPool.WORKER_INACTIVE]:
+        for shard in sorted(self._busy):
+            if not self._worker[shard].connected:
                 if not self._ignore[shard]:
                     lost_operations += self._operations[shard]
+                # Results will not arrive for the look-ahead either.
+                lost_operations += self._remove_look_ahead(shard)
                 self.release_worker(shard)
 
         return lost_operations
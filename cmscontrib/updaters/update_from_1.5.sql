@@ -775,4 +775,31 @@ CREATE INDEX ix_training_days_training_day_types_gin ON public.training_days USI
 -- Eligibility to view is based on student_tags during the training (from ArchivedStudentRanking)
 ALTER TABLE public.training_days ADD COLUMN scoreboard_sharing jsonb;
 
+-- Add size column to fsobjects, so that the size of a file can be known
+-- without opening its large object, and backfill it for existing files.
+ALTER TABLE public.fsobjects ADD COLUMN size bigint;
+DO $$
+DECLARE
+    fso record;
+    fd integer;
+BEGIN
+    FOR fso IN SELECT digest, loid FROM public.fsobjects LOOP
+        -- 262144 is INV_READ, 2 is SEEK_END.
+        fd := lo_open(fso.loid, 262144);
+        UPDATE public.fsobjects SET size = lo_lseek64(fd, 0, 2)
+            WHERE digest = fso.digest;
+        PERFORM lo_close(fd);
+    END LOOP;
+END $$;
+
+-- Add short_circuit_evaluation column to datasets, to let ES skip the
+-- testcases of subtasks whose score is already decided.
+ALTER TABLE public.datasets ADD COLUMN short_circuit_evaluation boolean NOT NULL DEFAULT false;
+ALTER TABLE public.datasets ALTER COLUMN short_circuit_evaluation DROP DEFAULT;
+
+-- Add deduplicate_evaluations column to datasets, to let ES copy the
+-- evaluations of submissions with identical executables.
+ALTER TABLE public.datasets ADD COLUMN deduplicate_evaluations boolean NOT NULL DEFAULT false;
+ALTER TABLE public.datasets ALTER COLUMN deduplicate_evaluations DROP DEFAULT;
+
 COMMIT;
@@ -40,30 +40,54 @@ class NumberSet:
     """A fast data structure on numbers.
 
     It supports:
-    - inserting a value
-    - removing a value
-    - querying the maximum value
+    - inserting a value, in O(log n)
+    - removing a value, in amortized O(log n)
+    - querying the maximum value, in O(1)
 
     It can hold the same value multiple times.
 
-    This data structure could be implemented with a binary tree, but
-    at the moment we're actually using a standard python list.
+    The values are counted in a dictionary and kept in a max-heap (of
+    their opposites) with lazy deletion: a value whose count drops to
+    zero stays in the heap until it reaches the top, and the heap is
+    rebuilt when stale entries make up most of it.
 
     """
     def __init__(self):
-        self._impl: list[float] = list()
+        self._counts: dict[float, int] = dict()
+        self._heap: list[float] = list()
 
     def insert(self, val: float):
-        self._impl.append(val)
+        count = self._counts.get(val, 0)
+        if count == 0:
+            heapq.heappush(self._heap, -val)
+        self._counts[val] = count + 1
 
     def remove(self, val: float):
-        self._impl.remove(val)
+        count = self._counts.get(val, 0)
+        if count == 0:
+            raise ValueError("NumberSet.remove(x): x not in NumberSet")
+        if count > 1:
+            self._counts[val] = count - 1
+            return
+        del self._counts[val]
+        # Drop the stale values on the top, so that the top is always
+        # a value in the set, and compact the heap when it is mostly
+        # made of stale values.
+        heap = self._heap
+        while len(heap) > 0 and -heap[0] not in self._counts:
+            heapq.heappop(heap)
+        if len(heap) > 2 * len(self._counts) + 16:
+            self._heap = [-v for v in self._counts]
+            heapq.heapify(self._heap)
 
     def query(self) -> float:
-        return max(self._impl + [0.0])
+        if len(self._heap) == 0 or self._heap[0] >= 0.0:
+            return 0.0
+        return -self._heap[0]
 
     def clear(self):
-        del self._impl[:]
+        self._counts.clear()
+        del self._heap[:]
 
 
 class Score:
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+
+# Contest Management System - http://cms-dev.github.io/
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Benchmark the scoring of RWS on the subchanges of a large contest.
+
+The submissions and subchanges of a synthetic contest are replayed, in
+time order, through a ScoringStore, as the stores of RWS do when they
+receive them (but without writing them to disk). Each submission gets
+a score when it is submitted, and some of them get a token later. The
+list-based NumberSet used before the heap-based one is measured too, as
+a reference.
+
+"""
+
+import argparse
+import random
+import sys
+import time
+from unittest.mock import patch
+
+from cmscommon.constants import \
+    SCORE_MODE_MAX, SCORE_MODE_MAX_SUBTASK, SCORE_MODE_MAX_TOKENED_LAST
+from cmsranking import Scoring
+from cmsranking.Scoring import ScoringStore
+from cmsranking.Store import Store
+from cmsranking.Subchange import Subchange
+from cmsranking.Submission import Submission
+from cmsranking.Task import Task
+
+
+class ListNumberSet:
+    """The list-based NumberSet that the heap-based one replaced."""
+
+    def __init__(self):
+        self._impl = list()
+
+    def insert(self, val):
+        self._impl.append(val)
+
+    def remove(self, val):
+        self._impl.remove(val)
+
+    def query(self):
+        return max(self._impl + [0.0])
+
+    def clear(self):
+        del self._impl[:]
+
+
+def contest_events(users, tasks, submissions, token_fraction, rng):
+    """Return the submissions and subchanges of a contest, by time.
+
+    return: a list of (time, kind, key, data) tuples, where kind is
+        "submission" or "subchange" and data is what RWS would receive.
+
+    """
+    events = []
+    for u in range(users):
+        for t in range(tasks):
+            times = sorted(rng.sample(range(5 * 3600), submissions))
+            for s, submission_time in enumerate(times):
+                key = "%d_%d_%d" % (u, t, s)
+                events.append((submission_time, "submission", key, {
+                    "user": "u%d" % u, "task": "t%d" % t,
+                    "time": submission_time}))
+                events.append((submission_time, "subchange", key + "s", {
+                    "submission": key, "time": submission_time,
+                    "score": float(rng.randrange(101)),
+                    "extra": ["%d" % rng.randrange(51),
+                              "%d" % rng.randrange(51)]}))
+                if rng.random() < token_fraction:
+                    token_time = submission_time + rng.randrange(1, 600)
+                    events.append((token_time, "subchange", key + "t", {
+                        "submission": key, "time": token_time,
+                        "token": True}))
+    # At the same time, submissions come before their subchanges.
+    events.sort(key=lambda event: (event[0], event[1] != "submission",
+                                   event[2]))
+    return events
+
+
+def replay(events, tasks, score_mode):
+    """Replay the events through a new ScoringStore.
+
+    return: the time in seconds spent in the ScoringStore, and the
+        final scores.
+
+    """
+    stores = {}
+    stores["task"] = Store(Task, "", stores)
+    stores["submission"] = Store(Submission, "", stores)
+    stores["subchange"] = Store(Subchange, "", stores)
+    scoring_store = ScoringStore(stores)
+    for t in range(tasks):
+        task = Task()
+        task.set({"name": "t%d" % t, "short_name": "t%d" % t,
+                  "contest": "c", "order": t, "max_score": 100.0,
+                  "extra_headers": [], "score_precision": 0,
+                  "score_mode": score_mode})
+        task.key = "t%d" % t
+        stores["task"]._store[task.key] = task
+
+    # Build the entities first, so that only the scoring is timed.
+    entities = []
+    for _, kind, key, data in events:
+        entity = Submission() if kind == "submission" else Subchange()
+        entity.set(data)
+        entity.key = key
+        entities.append((kind, key, entity))
+
+    elapsed = 0.0
+    for kind, key, entity in entities:
+        stores[kind]._store[key] = entity
+        start = time.perf_counter()
+        if kind == "submission":
+            scoring_store.create_submission(key, entity)
+        else:
+            scoring_store.create_subchange(key, entity)
+        elapsed += time.perf_counter() - start
+
+    scores = {(user, task): score.get_score()
+              for user, by_task in scoring_store._scores.items()
+              for task, score in by_task.items()}
+    return elapsed, scores
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the scoring of RWS.")
+    parser.add_argument(
+        "-u", "--users", type=int, default=50,
+        help="number of users (default 50)")
+    parser.add_argument(
+        "-t", "--tasks", type=int, default=6,
+        help="number of tasks (default 6)")
+    parser.add_argument(
+        "-s", "--submissions", type=int, default=1000,
+        help="submissions of each user on each task (default 1000)")
+    parser.add_argument(
+        "--token-fraction", type=float, default=0.5,
+        help="fraction of the submissions with a token (default 0.5)")
+    parser.add_argument(
+        "-m", "--score-mode", default=SCORE_MODE_MAX_TOKENED_LAST,
+        choices=[SCORE_MODE_MAX_TOKENED_LAST, SCORE_MODE_MAX,
+                 SCORE_MODE_MAX_SUBTASK],
+        help="score mode of the tasks (default %s)"
+        % SCORE_MODE_MAX_TOKENED_LAST)
+    parser.add_argument(
+        "--no-legacy", action="store_true",
+        help="do not measure the list-based NumberSet")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    events = contest_events(args.users, args.tasks, args.submissions,
+                            args.token_fraction, rng)
+    subchanges = sum(1 for event in events if event[1] == "subchange")
+    print("%d submissions, %d subchanges"
+          % (len(events) - subchanges, subchanges))
+
+    implementations = [("heap", Scoring.NumberSet)]
+    if not args.no_legacy:
+        implementations.append(("legacy", ListNumberSet))
+
+    print("%-10s %10s %16s" % ("NumberSet", "time (s)", "us per event"))
+    results = []
+    for name, number_set in implementations:
+        with patch.object(Scoring, "NumberSet", number_set):
+            elapsed, scores = replay(events, args.tasks, args.score_mode)
+        results.append(scores)
+        print("%-10s %10.3f %16.1f"
+              % (name, elapsed, elapsed * 1e6 / len(events)))
+    if any(scores != results[0] for scores in results):
+        print("The final scores differ!")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+
+# Contest Management System - http://cms-dev.github.io/
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Benchmark RPC round trips carrying job groups, as between ES and the
+workers, with each of the available encodings.
+
+Latency is measured with one request at a time, throughput with many
+requests in flight on the same connection.
+
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from unittest.mock import patch
+
+import gevent
+from gevent.server import StreamServer
+
+from cms import Address, ServiceCoord
+from cms.io import RemoteServiceClient, RemoteServiceServer, rpc_method
+from cms.io.rpc import _encode
+
+
+class EchoService:
+    """A service returning the job group it receives, as a worker
+    returns it filled with the results.
+
+    """
+
+    @rpc_method
+    def execute_job_group(self, job_group_dict):
+        return job_group_dict
+
+
+def evaluation_job(i):
+    """Return a dict like the export of an evaluation job."""
+    return {
+        "type": "evaluation",
+        "operation": {"type_": "evaluation", "object_id": 1000 + i,
+                      "dataset_id": 7, "testcase_codename": "%03d" % i},
+        "task_type": "Batch",
+        "task_type_parameters": ["alone", ["", ""], "comparator"],
+        "language": "C++17 / g++",
+        "multithreaded_sandbox": False,
+        "archive_sandbox": False,
+        "shard": 3,
+        "keep_sandbox": False,
+        "sandboxes": ["/tmp/cms-sandbox-%d" % i],
+        "sandbox_digests": {},
+        "info": "evaluate submission 1000 on testcase %03d" % i,
+        "success": True,
+        "text": ["Output is correct"],
+        "files": {"batch.%l": "%040x" % (i + 1)},
+        "managers": {"checker": "%040x" % 2, "grader.cpp": "%040x" % 3},
+        "executables": {"batch": "%040x" % 4},
+        "input": "%040x" % (i + 5),
+        "output": "%040x" % (i + 6),
+        "time_limit": 1.5,
+        "memory_limit": 256 * 1024 * 1024,
+        "outcome": "1.0",
+        "user_output": None,
+        "plus": {"execution_time": 0.123, "execution_wall_clock_time": 0.2,
+                 "execution_memory": 12345678, "exit_status": "ok",
+                 "tombstone": False},
+        "only_execution": False,
+        "get_output": False,
+    }
+
+
+def job_group(size):
+    return {"jobs": [evaluation_job(i) for i in range(size)]}
+
+
+def connect(address, encodings):
+    """Return a client connected to address, using the first of the
+    given encodings.
+
+    """
+    with patch.object(RemoteServiceClient, "ENCODINGS", encodings), \
+            patch("cms.io.rpc.get_service_address", return_value=address):
+        client = RemoteServiceClient(ServiceCoord("Bench", 0))
+        client.connect()
+        client._connection_event.wait()
+        while client._encoding != encodings[0]:
+            gevent.sleep(0.001)
+    return client
+
+
+def measure(client, payload, rounds, in_flight):
+    """Time round trips of payload.
+
+    return: the median and 95th percentile latency in seconds, and
+        the throughput in round trips per second.
+
+    """
+    latencies = []
+    for _ in range(rounds):
+        start = time.monotonic()
+        client.execute_job_group(job_group_dict=payload).get()
+        latencies.append(time.monotonic() - start)
+    latencies.sort()
+
+    start = time.monotonic()
+    for _ in range(max(1, rounds // in_flight)):
+        results = [client.execute_job_group(job_group_dict=payload)
+                   for _ in range(in_flight)]
+        for result in results:
+            result.get()
+    throughput = max(1, rounds // in_flight) * in_flight \
+        / (time.monotonic() - start)
+
+    return statistics.median(latencies), \
+        latencies[int(0.95 * (len(latencies) - 1))], throughput
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark RPC round trips of job groups.")
+    parser.add_argument(
+        "-s", "--sizes", type=int, nargs="+", default=[1, 25, 100],
+        help="numbers of jobs per job group (default 1 25 100)")
+    parser.add_argument(
+        "-r", "--rounds", type=int, default=500,
+        help="round trips per measure (default 500)")
+    parser.add_argument(
+        "-f", "--in-flight", type=int, default=10,
+        help="concurrent requests when measuring throughput (default 10)")
+    args = parser.parse_args()
+
+    server = StreamServer(
+        ("127.0.0.1", 0),
+        lambda sock, address:
+            RemoteServiceServer(EchoService(), address).handle(sock))
+    server.start()
+    address = Address(server.server_host, server.server_port)
+
+    print("%-8s %5s %10s %12s %12s %12s"
+          % ("encoding", "jobs", "size (KiB)", "median (ms)", "p95 (ms)",
+             "rt/s"))
+    for encoding in RemoteServiceServer.ENCODINGS:
+        client = connect(address, [encoding])
+        for size in args.sizes:
+            payload = job_group(size)
+            message = {"__id": "0" * 32, "__method": "execute_job_group",
+                       "__data": {"job_group_dict": payload}}
+            length = len(_encode(message, encoding))
+            median, p95, throughput = measure(
+                client, payload, args.rounds, args.in_flight)
+            print("%-8s %5d %10.1f %12.3f %12.3f %12.0f"
+                  % (encoding, size, length / 1024, median * 1000,
+                     p95 * 1000, throughput))
+        client.disconnect()
+
+    server.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+
+# Contest Management System - http://cms-dev.github.io/
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Benchmark the time needed to put the files of a testcase in a
+sandbox, copying them or linking them from the local cache.
+
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from unittest.mock import patch
+
+from cms import config
+from cms.db.filecacher import FileCacher
+from cms.grading.Sandbox import StupidSandbox
+
+
+class HardlinkingSandbox(StupidSandbox):
+    """A stupid sandbox pretending to be safe to populate with hard
+    links, to measure them without needing isolate.
+
+    """
+    HARDLINK_SAFE = True
+
+
+MODES = {
+    "copy": (StupidSandbox, False),
+    "reflink": (StupidSandbox, True),
+    "hardlink": (HardlinkingSandbox, True),
+}
+
+
+def populate(file_cacher, sandbox_class, digests):
+    """Create a sandbox and put the given files in it.
+
+    return: the sandbox.
+
+    """
+    sandbox = sandbox_class(file_cacher, name="bench",
+                            temp_dir=file_cacher.temp_dir)
+    for i, digest in enumerate(digests):
+        sandbox.create_file_from_storage("file%d" % i, digest)
+    return sandbox
+
+
+def bench(file_cacher, mode, digests, repetitions):
+    """Time populating a sandbox in the given mode.
+
+    return: the average time in seconds, and whether the files were
+        actually linked.
+
+    """
+    sandbox_class, link = MODES[mode]
+    elapsed = 0.0
+    linked = False
+    with patch.object(config.sandbox, "link_cached_files", link):
+        for _ in range(repetitions):
+            start = time.monotonic()
+            sandbox = populate(file_cacher, sandbox_class, digests)
+            elapsed += time.monotonic() - start
+            # A reflink or a copy are new inodes, a hard link is not;
+            # a reflink shows up as shared extents that we cannot
+            # easily detect, so we only tell copies and hard links
+            # apart.
+            linked = os.stat(sandbox.relative_path("file0")).st_nlink > 1
+            sandbox.cleanup(delete=True)
+    return elapsed / repetitions, linked
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark sandbox population from the file cache.")
+    parser.add_argument(
+        "-s", "--size-mib", type=int, default=64,
+        help="size of each file, in MiB (default 64)")
+    parser.add_argument(
+        "-n", "--files", type=int, default=2,
+        help="number of files per sandbox (default 2, like input and "
+        "expected output)")
+    parser.add_argument(
+        "-r", "--repetitions", type=int, default=10,
+        help="number of sandboxes to populate per mode (default 10)")
+    parser.add_argument(
+        "-m", "--modes", nargs="+", choices=sorted(MODES),
+        default=["copy", "reflink", "hardlink"],
+        help="modes to benchmark (default all)")
+    args = parser.parse_args()
+
+    storage = tempfile.mkdtemp(dir=config.global_.temp_dir)
+    try:
+        file_cacher = FileCacher(path=storage)
+        digests = []
+        for _ in range(args.files):
+            with tempfile.TemporaryFile() as f:
+                for _ in range(args.size_mib):
+                    f.write(os.urandom(1024 * 1024))
+                f.seek(0)
+                digests.append(file_cacher.put_file_from_fobj(f))
+        # Make sure every mode starts with a warm cache.
+        file_cacher.cache_files(digests)
+
+        print("%d files of %d MiB, %d repetitions"
+              % (args.files, args.size_mib, args.repetitions))
+        for mode in args.modes:
+            avg, linked = bench(file_cacher, mode, digests, args.repetitions)
+            print("%-8s  %8.2f ms per sandbox%s"
+                  % (mode, avg * 1000, " (hard links)" if linked else ""))
+    finally:
+        shutil.rmtree(storage, ignore_errors=True)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+
+# Contest Management System - http://cms-dev.github.io/
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Benchmark the white-diff comparator on outputs of realistic shapes.
+
+Each shape is compared against an identical copy, against a copy with
+different whitespace, and against a copy with a wrong last token. The
+line-based algorithm used before the streaming one is measured too, as
+a reference.
+
+"""
+
+import argparse
+import io
+import random
+import sys
+import time
+import tracemalloc
+
+from cms.grading.steps import _white_diff
+
+
+def legacy_white_diff(output, res):
+    """The line-based algorithm that _white_diff replaced."""
+    whites = [b' ', b'\t', b'\n', b'\x0b', b'\x0c', b'\r']
+
+    def canonicalize(string):
+        for char in whites[1:]:
+            string = string.replace(char, whites[0])
+        return whites[0].join([x for x in string.split(whites[0])
+                               if len(x) > 0])
+
+    while True:
+        lout = output.readline()
+        lres = res.readline()
+        if len(lres) == 0 and len(lout) == 0:
+            return True
+        elif len(lres) == 0 or len(lout) == 0:
+            lout = lout.strip(b''.join(whites))
+            lres = lres.strip(b''.join(whites))
+            if len(lout) > 0 or len(lres) > 0:
+                return False
+        else:
+            if canonicalize(lout) != canonicalize(lres):
+                return False
+
+
+def numbers(size, rng):
+    """Return about size bytes of random numbers, as lists of tokens."""
+    tokens = []
+    length = 0
+    while length < size:
+        token = b"%d" % rng.randrange(10 ** 9)
+        tokens.append(token)
+        length += len(token) + 1
+    return tokens
+
+
+SHAPES = {
+    # One number per line.
+    "column": lambda tokens: b"\n".join(tokens) + b"\n",
+    # A single line with all the numbers, like a printed array.
+    "array": lambda tokens: b" ".join(tokens) + b"\n",
+    # Lines of 1000 numbers each, like a printed matrix.
+    "matrix": lambda tokens: b"\n".join(
+        b" ".join(tokens[i:i + 1000])
+        for i in range(0, len(tokens), 1000)) + b"\n",
+}
+
+
+VARIANTS = {
+    "identical": lambda content: content,
+    "whitespace": lambda content: content.replace(b" ", b"  ")
+    .replace(b"\n", b" \r\n") + b"\n\n",
+    "wrong": lambda content: content[:-2] + b"x\n",
+}
+
+
+def measure(function, a, b):
+    """Time one comparison and measure its peak memory usage (in a
+    second run, as tracing allocations slows the comparison down).
+
+    return: the result, the time in seconds and the peak memory in
+        bytes.
+
+    """
+    start = time.monotonic()
+    result = function(io.BytesIO(a), io.BytesIO(b))
+    elapsed = time.monotonic() - start
+    tracemalloc.start()
+    function(io.BytesIO(a), io.BytesIO(b))
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the white-diff comparator.")
+    parser.add_argument(
+        "-s", "--size-mib", type=int, default=50,
+        help="approximate size of each output, in MiB (default 50)")
+    parser.add_argument(
+        "--no-legacy", action="store_true",
+        help="do not measure the line-based algorithm")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    tokens = numbers(args.size_mib * 1024 * 1024, rng)
+    functions = [("streaming", _white_diff)]
+    if not args.no_legacy:
+        functions.append(("legacy", legacy_white_diff))
+
+    print("%-8s %-11s %-10s %6s %10s %12s"
+          % ("shape", "variant", "algorithm", "result", "time (s)",
+             "peak (MiB)"))
+    for shape_name, shape in SHAPES.items():
+        content = shape(tokens)
+        for variant_name, variant in VARIANTS.items():
+            other = variant(content)
+            for function_name, function in functions:
+                result, elapsed, peak = measure(function, content, other)
+                print("%-8s %-11s %-10s %6s %10.3f %12.1f"
+                      % (shape_name, variant_name, function_name, result,
+                         elapsed, peak / (1024 * 1024)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+
+# Contest Management System - http://cms-dev.github.io/
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Benchmark the bookkeeping of the worker pool of ES as the number of
+workers grows.
+
+The workers are fake, in the spirit of a Worker started with
+fake_worker_time: they never run anything, and ES is not involved
+either. Only the CPU time spent by the pool to dispatch operations,
+to answer whether an operation is being executed, and to release the
+workers is measured, with all workers busy but one, as when the queue
+is deep.
+
+"""
+
+import argparse
+import contextlib
+import logging
+import sys
+import time
+from unittest.mock import patch
+
+from cms import ServiceCoord
+from cms.service.esoperations import ESOperation
+from cms.service.workerpool import WorkerPool
+
+
+class FakeWorker:
+    """A connected worker that never answers."""
+
+    connected = True
+
+    def execute_job_group(self, job_group_dict, callback, plus):
+        pass
+
+
+class FakeJobGroup:
+    """A job group not needing the DB."""
+
+    @staticmethod
+    def from_operations(operations, session):
+        return FakeJobGroup()
+
+    def export_to_dict(self):
+        return {"jobs": []}
+
+
+class FakeService:
+    """The parts of ES the pool uses."""
+
+    contest_id = None
+
+    def connect_to(self, coord, on_connect=None):
+        return FakeWorker()
+
+    def action_finished(self, data, shard, error=None):
+        pass
+
+
+def operation(i):
+    return ESOperation(ESOperation.EVALUATION, i, 1, "%03d" % (i % 100))
+
+
+def measure(num_workers, rounds):
+    """Time the dispatch of rounds operations to num_workers workers.
+
+    return: the average time in seconds of one acquire, one lookup
+        of an operation and one release.
+
+    """
+    pool = WorkerPool(FakeService())
+    for shard in range(num_workers):
+        pool.add_worker(ServiceCoord("Worker", shard))
+
+    next_operation = 0
+    for _ in range(num_workers - 1):
+        pool.acquire_worker([operation(next_operation)])
+        next_operation += 1
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        shard = pool.acquire_worker([operation(next_operation)])
+        assert operation(0) in pool
+        pool.release_worker(shard)
+        next_operation += 1
+    return (time.perf_counter() - start) / rounds
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the worker pool of ES.")
+    parser.add_argument(
+        "-w", "--workers", type=int, nargs="+", default=[10, 100, 1000],
+        help="numbers of workers (default 10 100 1000)")
+    parser.add_argument(
+        "-r", "--rounds", type=int, default=10000,
+        help="operations dispatched per measure (default 10000)")
+    args = parser.parse_args()
+
+    # The pool logs each dispatch.
+    logging.getLogger("cms.service.workerpool").setLevel(logging.WARNING)
+
+    print("%8s %16s" % ("workers", "dispatch (us)"))
+    with patch("cms.service.workerpool.SessionGen", contextlib.nullcontext), \
+            patch("cms.service.workerpool.JobGroup", FakeJobGroup):
+        for num_workers in args.workers:
+            print("%8d %16.2f"
+                  % (num_workers, measure(num_workers, args.rounds) * 1e6))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
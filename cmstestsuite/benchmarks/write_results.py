@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+
+# Contest Management System - http://cms-dev.github.io/
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Benchmark the writing to the DB of the evaluation results received
+by EvaluationService, as during a re-evaluation.
+
+A throwaway contest is created in the configured DB, N evaluation
+results are replayed through write_results in batches as large as the
+result cache, and the contest is deleted at the end.
+
+"""
+
+import argparse
+import logging
+import sys
+import time
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+from cms.db import Contest, Dataset, Participation, SessionGen, Submission, \
+    SubmissionResult, Task, Testcase, User
+from cms.grading.Job import EvaluationJob
+from cms.service.EvaluationService import EvaluationService, Result
+from cms.service.esoperations import ESOperation
+
+
+def create_contest(session, num_submissions, num_testcases):
+    """Create a contest with one task and compiled submissions.
+
+    return: the user, the contest, the dataset, the submissions and
+        the codenames of the testcases.
+
+    """
+    name = "bench%d" % time.time_ns()
+    contest = Contest(name=name, description=name)
+    user = User(first_name=name, last_name=name, username=name,
+                password="")
+    participation = Participation(contest=contest, user=user)
+    task = Task(contest=contest, name=name, title=name)
+    dataset = Dataset(task=task, description=name, task_type="Batch",
+                      task_type_parameters=["alone", ["", ""], "diff"],
+                      score_type="Sum", score_type_parameters=100)
+    task.active_dataset = dataset
+    codenames = ["%03d" % i for i in range(num_testcases)]
+    for codename in codenames:
+        session.add(Testcase(dataset=dataset, codename=codename,
+                             input="%040x" % 1, output="%040x" % 2))
+    submissions = []
+    for i in range(num_submissions):
+        submission = Submission(
+            task=task, participation=participation, opaque_id=i,
+            language="C++17 / g++",
+            timestamp=datetime.utcnow() - timedelta(seconds=i))
+        SubmissionResult(submission=submission, dataset=dataset,
+                         compilation_outcome="ok")
+        submissions.append(submission)
+    session.add(contest)
+    session.commit()
+    return user, contest, dataset, submissions, codenames
+
+
+def results(dataset, submissions, codenames):
+    """Yield the operations and results of evaluating the submissions
+    on all testcases.
+
+    """
+    for submission in submissions:
+        for codename in codenames:
+            operation = ESOperation(ESOperation.EVALUATION, submission.id,
+                                    dataset.id, codename)
+            job = EvaluationJob(
+                operation=operation, shard=0,
+                sandboxes=["/tmp/cms-sandbox-%s" % codename],
+                success=True, outcome="1.0",
+                text=["Output is correct"],
+                plus={"execution_time": 0.123,
+                      "execution_wall_clock_time": 0.2,
+                      "execution_memory": 12345678})
+            yield operation, Result(job, True)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark writing evaluation results to the DB.")
+    parser.add_argument(
+        "-n", "--results", type=int, default=10000,
+        help="number of results to write (default 10000)")
+    parser.add_argument(
+        "-t", "--testcases", type=int, default=20,
+        help="testcases per submission (default 20)")
+    parser.add_argument(
+        "-b", "--batch-size", type=int,
+        default=EvaluationService.RESULT_CACHE_SIZE,
+        help="results per call to write_results (default %d)"
+        % EvaluationService.RESULT_CACHE_SIZE)
+    args = parser.parse_args()
+
+    # write_results logs a few lines for each batch, or each result.
+    logging.getLogger("cms.service.EvaluationService").setLevel(
+        logging.WARNING)
+
+    with SessionGen() as session:
+        user, contest, dataset, submissions, codenames = create_contest(
+            session, -(-args.results // args.testcases), args.testcases)
+        items = list(results(dataset, submissions, codenames))[:args.results]
+        user_id, contest_id = user.id, contest.id
+
+    service = EvaluationService(0)
+    try:
+        with patch.object(service, "evaluation_ended"):
+            start = time.monotonic()
+            for i in range(0, len(items), args.batch_size):
+                service.write_results(items[i:i + args.batch_size])
+            elapsed = time.monotonic() - start
+    finally:
+        with SessionGen() as session:
+            session.delete(Contest.get_from_id(contest_id, session))
+            session.delete(User.get_from_id(user_id, session))
+            session.commit()
+
+    print("%d results in %.2f s: %.0f rows/s"
+          % (len(items), elapsed, len(items) / elapsed))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
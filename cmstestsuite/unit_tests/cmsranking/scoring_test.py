@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+
+# Contest Management System - http://cms-dev.github.io/
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests for the scoring of RWS.
+
+"""
+
+import random
+import unittest
+
+from cmsranking.Scoring import NumberSet
+
+
+class TestNumberSet(unittest.TestCase):
+
+    def setUp(self):
+        self.numbers = NumberSet()
+
+    def test_empty(self):
+        self.assertEqual(self.numbers.query(), 0.0)
+
+    def test_duplicates(self):
+        for val in [3.0, 5.0, 5.0, 1.0]:
+            self.numbers.insert(val)
+        self.assertEqual(self.numbers.query(), 5.0)
+        self.numbers.remove(5.0)
+        self.assertEqual(self.numbers.query(), 5.0)
+        self.numbers.remove(5.0)
+        self.assertEqual(self.numbers.query(), 3.0)
+
+    def test_negative_values(self):
+        self.numbers.insert(-2.0)
+        self.assertEqual(self.numbers.query(), 0.0)
+
+    def test_remove_missing(self):
+        self.numbers.insert(1.0)
+        self.numbers.remove(1.0)
+        with self.assertRaises(ValueError):
+            self.numbers.remove(1.0)
+        with self.assertRaises(ValueError):
+            self.numbers.remove(2.0)
+
+    def test_clear(self):
+        self.numbers.insert(4.0)
+        self.numbers.clear()
+        self.assertEqual(self.numbers.query(), 0.0)
+        self.numbers.insert(2.0)
+        self.assertEqual(self.numbers.query(), 2.0)
+
+    def test_same_as_list(self):
+        rng = random.Random(0)
+        values = []
+        for _ in range(10000):
+            if len(values) > 0 and rng.random() < 0.5:
+                val = rng.choice(values)
+                values.remove(val)
+                self.numbers.remove(val)
+            else:
+                val = float(rng.randrange(50))
+                values.append(val)
+                self.numbers.insert(val)
+            self.assertEqual(self.numbers.query(), max(values + [0.0]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -26,12 +26,16 @@
 import os
 import random
 import shutil
+import tempfile
 import unittest
 from io import BytesIO
+from unittest.mock import patch
 
 from cmstestsuite.unit_tests.databasemixin import DatabaseMixin
 
-from cms.db.filecacher import FileCacher
+from cms import config
+from cms.db import FSObject
+from cms.db.filecacher import FileCacher, ShardedFSBackend
 from cmscommon.digest import Digester, bytes_digest
 
 
@@ -358,6 +362,79 @@ class TestFileCacherBase:
         # Check that the file was stored correctly.
         self.check_stored_file(digest)
 
+    def test_cache_files(self):
+        """Put some files in the storage, drop them from the local cache
+        and cache them back all together.
+
+        """
+        contents = [os.urandom(100) for _ in range(5)]
+        digests = [self.file_cacher.put_file_content(content)
+                   for content in contents]
+        for digest in digests[1:]:
+            self.file_cacher.drop(digest)
+        missing_digest = bytes_digest(b"This file is not in the storage.")
+
+        missing = self.file_cacher.cache_files(
+            digests + [missing_digest, digests[2]], parallelism=2)
+
+        self.assertEqual(missing, {missing_digest})
+        for digest in digests:
+            self.assertTrue(
+                os.path.exists(os.path.join(self.cache_base_path, digest)))
+
+    def test_get_files(self):
+        """Get some files from the storage all together.
+
+        """
+        contents = [os.urandom(100) for _ in range(3)]
+        digests = [self.file_cacher.put_file_content(content)
+                   for content in contents]
+        for digest in digests:
+            self.file_cacher.drop(digest)
+
+        received = []
+        for digest, fobj in self.file_cacher.get_files(reversed(digests)):
+            with fobj:
+                received.append((digest, fobj.read()))
+
+        self.assertEqual(received,
+                         list(zip(reversed(digests), reversed(contents))))
+
+        with self.assertRaises(KeyError):
+            self.file_cacher.get_files(
+                [digests[0], bytes_digest(b"This file is not in the storage.")])
+
+    def test_link_file_to_path(self):
+        """Link a file from the cache without copying it.
+
+        """
+        content = os.urandom(100)
+        digest = self.file_cacher.put_file_content(content)
+        dst_dir = tempfile.mkdtemp(dir=self.file_cacher.temp_dir)
+        try:
+            # Without hard links we get a file only if the file system
+            # supports reflinks; either way the cache is untouched.
+            dst_path = os.path.join(dst_dir, "reflink")
+            if self.file_cacher.link_file_to_path(digest, dst_path):
+                with open(dst_path, "rb") as f:
+                    self.assertEqual(f.read(), content)
+                self.assertEqual(os.stat(dst_path).st_nlink, 1)
+            else:
+                self.assertFalse(os.path.exists(dst_path))
+
+            dst_path = os.path.join(dst_dir, "hardlink")
+            self.assertTrue(self.file_cacher.link_file_to_path(
+                digest, dst_path, allow_hardlink=True))
+            with open(dst_path, "rb") as f:
+                self.assertEqual(f.read(), content)
+
+            with self.assertRaises(KeyError):
+                self.file_cacher.link_file_to_path(
+                    bytes_digest(b"This file is not in the storage."),
+                    os.path.join(dst_dir, "missing"))
+        finally:
+            shutil.rmtree(dst_dir)
+
 
 class TestFileCacherDB(TestFileCacherBase, DatabaseMixin, unittest.TestCase):
     """Tests for the FileCacher service with a database backend."""
@@ -369,6 +446,22 @@ class TestFileCacherDB(TestFileCacherBase, DatabaseMixin, unittest.TestCase):
         DatabaseMixin.setUp(self)
         TestFileCacherBase.setUp(self, FileCacher())
 
+    def test_size_is_stored(self):
+        """Store a file and check that its size is recorded in the
+        database, and computed again if missing.
+
+        """
+        digest = self.file_cacher.put_file_content(os.urandom(1234))
+        fso = FSObject.get_from_digest(digest, self.session)
+        self.assertEqual(fso.size, 1234)
+
+        # Simulate a file stored before sizes were recorded.
+        fso.size = None
+        self.session.commit()
+        self.assertEqual(self.file_cacher.get_size(digest), 1234)
+        self.session.expire(fso)
+        self.assertEqual(fso.size, 1234)
+
 
 class TestFileCacherFS(TestFileCacherBase, unittest.TestCase):
     """Tests for the FileCacher service with a filesystem backend."""
@@ -383,5 +476,128 @@ class TestFileCacherFS(TestFileCacherBase, unittest.TestCase):
         shutil.rmtree("fs-storage", ignore_errors=True)
 
 
+class TestFileCacherShardedFS(TestFileCacherBase, unittest.TestCase):
+    """Tests for the FileCacher service with a sharded filesystem
+    backend.
+
+    """
+
+    # Tell pytest to collect this class as test
+    __test__ = True
+
+    def setUp(self):
+        with patch.object(config.file_cacher, "backend", "filesystem"), \
+                patch.object(config.file_cacher, "backend_path",
+                             "fs-storage"):
+            super().setUp(FileCacher())
+
+    def tearDown(self):
+        shutil.rmtree("fs-storage", ignore_errors=True)
+
+    def test_layout_and_descriptions(self):
+        """Check where files are stored and that their descriptions are
+        kept.
+
+        """
+        self.assertIsInstance(self.file_cacher.backend, ShardedFSBackend)
+        digest = self.file_cacher.put_file_content(b"content", "Test #010")
+
+        self.assertTrue(os.path.isfile(
+            os.path.join("fs-storage", digest[0:2], digest[2:4], digest)))
+        self.assertEqual(self.file_cacher.describe(digest), "Test #010")
+        self.assertEqual(self.file_cacher.list(), [(digest, "Test #010")])
+        self.assertEqual(os.listdir(os.path.join("fs-storage", ".tmp")), [])
+
+        self.file_cacher.delete(digest)
+        self.assertEqual(self.file_cacher.list(), [])
+
+    def test_list_skips_stray_files(self):
+        """Check that files outside of the shards are not listed.
+
+        """
+        digest = self.file_cacher.put_file_content(b"content", "Test #011")
+        for path in [os.path.join("fs-storage", "README"),
+                     os.path.join("fs-storage", digest[0:2], "README")]:
+            with open(path, "w") as f:
+                f.write("Not a shard.")
+
+        self.assertEqual(self.file_cacher.list(), [(digest, "Test #011")])
+
+
+class TestFileCacherEviction(unittest.TestCase):
+    """Tests for the size limit of the local cache of FileCacher."""
+
+    def setUp(self):
+        self.file_cacher = FileCacher(path="fs-storage")
+        self.file_cacher.max_cache_size = 1000
+        self.cache_base_path = self.file_cacher.file_dir
+
+    def tearDown(self):
+        shutil.rmtree("fs-storage", ignore_errors=True)
+
+    def is_cached(self, digest):
+        return os.path.exists(os.path.join(self.cache_base_path, digest))
+
+    def set_last_use(self, digest, timestamp):
+        path = os.path.join(self.cache_base_path, digest)
+        os.utime(path, (timestamp, timestamp))
+
+    def test_evict_least_recently_used(self):
+        digests = [self.file_cacher.put_file_content(os.urandom(300))
+                   for _ in range(3)]
+        for i, digest in enumerate(digests):
+            self.set_last_use(digest, 1000 + i)
+        # Using the oldest file makes it the most recently used.
+        self.file_cacher.get_file_content(digests[0])
+
+        # The cache now exceeds the limit, and enough files are evicted
+        # to bring it below 90% of it.
+        new_digest = self.file_cacher.put_file_content(os.urandom(300))
+
+        self.assertTrue(self.is_cached(digests[0]))
+        self.assertFalse(self.is_cached(digests[1]))
+        self.assertTrue(self.is_cached(digests[2]))
+        self.assertTrue(self.is_cached(new_digest))
+        stats = self.file_cacher.get_cache_stats()
+        self.assertEqual(stats["evictions"], 1)
+        self.assertEqual(stats["evicted_bytes"], 300)
+        self.assertEqual(stats["size"], 900)
+
+        # Evicted files are still available from the backend.
+        self.file_cacher.get_file_content(digests[1])
+        self.assertTrue(self.is_cached(digests[1]))
+
+    def test_hits_and_misses(self):
+        digest = self.file_cacher.put_file_content(b"content")
+        self.file_cacher.get_file_content(digest)
+        self.file_cacher.drop(digest)
+        self.file_cacher.get_file_content(digest)
+        self.file_cacher.cache_file(digest)
+
+        stats = self.file_cacher.get_cache_stats()
+        self.assertEqual(stats["hits"], 2)
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["evictions"], 0)
+
+    def test_other_files_are_not_evicted(self):
+        self.file_cacher.precache_lock().close()
+        for _ in range(5):
+            self.file_cacher.put_file_content(os.urandom(300))
+
+        self.assertTrue(os.path.exists(
+            os.path.join(self.cache_base_path, "cache_lock")))
+        self.assertTrue(os.path.isdir(self.file_cacher.temp_dir))
+        self.assertLessEqual(self.file_cacher.get_cache_stats()["size"], 1000)
+
+    def test_unbounded(self):
+        self.file_cacher.max_cache_size = None
+        digests = [self.file_cacher.put_file_content(os.urandom(300))
+                   for _ in range(5)]
+
+        for digest in digests:
+            self.assertTrue(self.is_cached(digest))
+        self.assertEqual(self.file_cacher.evict(), 0)
+
+
 if __name__ == "__main__":
     unittest.main()
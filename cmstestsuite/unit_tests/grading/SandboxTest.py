@@ -20,9 +20,15 @@
 """Tests for general utility functions."""
 
 import io
+import os
+import shutil
+import subprocess
 import unittest
+from unittest.mock import patch
 
-from cms.grading.Sandbox import Truncator
+from cms import config
+from cms.db.filecacher import FileCacher
+from cms.grading.Sandbox import IsolateSandbox, StupidSandbox, Truncator
 
 
 class TestTruncator(unittest.TestCase):
@@ -62,5 +68,119 @@ class TestTruncator(unittest.TestCase):
         self.perform_truncator_test(100, 40, 7)
 
 
+class TestCreateFileFromStorage(unittest.TestCase):
+    """Test populating a sandbox with files from the storage."""
+
+    def setUp(self):
+        self.file_cacher = FileCacher(path="fs-storage")
+        self.sandbox = StupidSandbox(self.file_cacher, name="test",
+                                     temp_dir=self.file_cacher.temp_dir)
+        self.content = os.urandom(100)
+        self.digest = self.file_cacher.put_file_content(self.content)
+
+    def tearDown(self):
+        self.sandbox.cleanup(delete=True)
+        shutil.rmtree("fs-storage", ignore_errors=True)
+
+    def assertFileInSandbox(self, path, executable):
+        real_path = self.sandbox.relative_path(path)
+        with open(real_path, "rb") as f:
+            self.assertEqual(f.read(), self.content)
+        self.assertEqual(os.access(real_path, os.X_OK), executable)
+        # The stupid sandbox runs code as ourselves, so a hard link
+        # would let it write to the cache.
+        self.assertEqual(os.stat(real_path).st_nlink, 1)
+
+    def test_copy(self):
+        self.sandbox.create_file_from_storage("input.txt", self.digest)
+        self.assertFileInSandbox("input.txt", False)
+
+    def test_link(self):
+        with patch.object(config.sandbox, "link_cached_files", True):
+            self.sandbox.create_file_from_storage("input.txt", self.digest)
+            self.sandbox.create_file_from_storage("run.sh", self.digest,
+                                                  executable=True)
+        self.assertFileInSandbox("input.txt", False)
+        self.assertFileInSandbox("run.sh", True)
+
+    def test_hard_link(self):
+        cache_path = os.path.join(self.file_cacher.file_dir, self.digest)
+        with patch.object(config.sandbox, "link_cached_files", True), \
+                patch.object(self.sandbox, "HARDLINK_SAFE", True), \
+                patch.object(self.file_cacher, "link_file_to_path",
+                             wraps=self.file_cacher.link_file_to_path) as link:
+            # Pretend that reflinks are not supported.
+            with patch("fcntl.ioctl", side_effect=OSError):
+                self.sandbox.create_file_from_storage("input.txt", self.digest)
+                self.sandbox.create_file_from_storage("run.sh", self.digest,
+                                                      executable=True)
+        self.assertEqual(
+            [call.kwargs["allow_hardlink"] for call in link.call_args_list],
+            [True, False])
+        self.assertTrue(os.path.samefile(
+            self.sandbox.relative_path("input.txt"), cache_path))
+        self.assertFalse(os.path.samefile(
+            self.sandbox.relative_path("run.sh"), cache_path))
+        self.assertTrue(os.access(self.sandbox.relative_path("run.sh"),
+                                  os.X_OK))
+        # The permissions of the cached file were not changed.
+        self.assertEqual(os.stat(cache_path).st_mode & 0o777,
+                         FileCacher.CACHED_FILE_MODE)
+
+
+class TestIsolateBoxIds(unittest.TestCase):
+    """Test the assignment of isolate box ids to sandboxes."""
+
+    def setUp(self):
+        self.file_cacher = FileCacher(path="fs-storage")
+        self.sandboxes = []
+        for patcher in [
+                patch.object(IsolateSandbox, "next_id", 0),
+                patch.object(IsolateSandbox, "box_ids_in_use", set()),
+                patch.object(IsolateSandbox, "detect_box_executable",
+                             return_value="isolate"),
+                patch.object(IsolateSandbox, "initialize_isolate"),
+                patch.object(IsolateSandbox, "_cleanup_box"),
+                patch.object(IsolateSandbox, "_make_home_deletable")]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        for sandbox in self.sandboxes:
+            shutil.rmtree(sandbox.get_root_path(), ignore_errors=True)
+        shutil.rmtree("fs-storage", ignore_errors=True)
+
+    def new_sandbox(self):
+        sandbox = IsolateSandbox(self.file_cacher, name="test",
+                                 temp_dir=self.file_cacher.temp_dir)
+        self.sandboxes.append(sandbox)
+        return sandbox
+
+    def test_ids_in_use_are_skipped(self):
+        first = self.new_sandbox()
+        IsolateSandbox.next_id = 0
+        second = self.new_sandbox()
+        self.assertEqual((first.box_id, second.box_id), (0, 1))
+
+        first.cleanup()
+        IsolateSandbox.next_id = 0
+        self.assertEqual(self.new_sandbox().box_id, 0)
+
+    def test_all_ids_in_use(self):
+        box_ids = [self.new_sandbox().box_id for _ in range(10)]
+        self.assertEqual(box_ids, list(range(10)))
+        # Like when ids were not tracked, they wrap around.
+        with self.assertLogs("cms.grading.Sandbox", "WARNING"):
+            self.assertEqual(self.new_sandbox().box_id, 0)
+
+    def test_failed_cleanup_frees_id(self):
+        sandbox = self.new_sandbox()
+        IsolateSandbox._cleanup_box.side_effect = \
+            subprocess.CalledProcessError(1, "isolate")
+        with self.assertRaises(subprocess.CalledProcessError):
+            sandbox.cleanup()
+        self.assertEqual(IsolateSandbox.box_ids_in_use, set())
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -26,11 +26,14 @@ from datetime import timedelta
 from cmstestsuite.unit_tests.databasemixin import DatabaseMixin
 
 from cms.db.scorecache import ParticipationTaskScore, ScoreHistory
+from cms.db import TrainingDay, TrainingProgram
 from cms.grading.scorecache import (
+    get_cached_score_entries,
     get_cached_score_entry,
     rebuild_score_cache,
     invalidate_score_cache,
     update_score_cache,
+    update_score_cache_batch,
 )
 from cmscommon.constants import (
     SCORE_MODE_MAX,
@@ -163,6 +166,137 @@ class TestGetCachedScoreEntry(ScoreCacheMixin, unittest.TestCase):
         self.assertTrue(cache_entry2.has_submissions)
 
 
+class TestGetCachedScoreEntries(ScoreCacheMixin, unittest.TestCase):
+    """Tests for get_cached_score_entries()."""
+
+    def setUp(self):
+        super().setUp()
+        self.task.score_mode = SCORE_MODE_MAX
+        self.contest = self.participation.contest
+
+    def test_creates_missing_entries(self):
+        """Test that entries are built for every participation and task."""
+        other_participation = self.add_participation(contest=self.contest)
+        other_task = self.add_task(contest=self.contest)
+        self.add_scored_submission(self.at(1), 30.0)
+        self.add_scored_submission(self.at(2), 60.0)
+        self.session.flush()
+
+        entries = get_cached_score_entries(self.session, self.contest)
+        self.assertCountEqual(entries, [
+            (self.participation.id, self.task.id),
+            (self.participation.id, other_task.id),
+            (other_participation.id, self.task.id),
+            (other_participation.id, other_task.id),
+        ])
+        entry = entries[(self.participation.id, self.task.id)]
+        self.assertEqual(entry.score, 60.0)
+        self.assertTrue(entry.has_submissions)
+        self.assertFalse(
+            entries[(other_participation.id, self.task.id)].has_submissions)
+        self.assertEqual([h.score for h in self.get_history_entries()],
+                         [30.0, 60.0])
+
+    def test_same_as_single_entry(self):
+        """Test that entries match those of get_cached_score_entry."""
+        self.task.score_mode = SCORE_MODE_MAX_TOKENED_LAST
+        self.add_scored_submission(self.at(1), 80.0, tokened=True)
+        self.add_scored_submission(self.at(2), 40.0)
+        self.session.flush()
+
+        entry = get_cached_score_entries(self.session, self.contest)[
+            (self.participation.id, self.task.id)]
+        self.assertEqual(entry.score, 80.0)
+        self.assertEqual(entry.max_tokened_score, 80.0)
+        self.assertEqual(entry.last_submission_score, 40.0)
+        self.assertIs(entry, get_cached_score_entry(
+            self.session, self.participation, self.task))
+
+    def test_valid_entries_are_not_rebuilt(self):
+        """Test that valid entries are returned as they are."""
+        self.add_scored_submission(self.at(1), 50.0)
+        self.session.flush()
+        cache_entry = rebuild_score_cache(
+            self.session, self.participation, self.task)
+        created_at = cache_entry.created_at
+        self.session.flush()
+
+        entry = get_cached_score_entries(self.session, self.contest)[
+            (self.participation.id, self.task.id)]
+        self.assertIs(entry, cache_entry)
+        self.assertEqual(entry.created_at, created_at)
+
+    def test_invalid_entries_are_rebuilt(self):
+        """Test that invalidated entries are rebuilt."""
+        self.add_scored_submission(self.at(1), 50.0)
+        self.session.flush()
+        rebuild_score_cache(self.session, self.participation, self.task)
+        self.add_scored_submission(self.at(2), 70.0)
+        invalidate_score_cache(
+            self.session, participation_id=self.participation.id)
+        self.session.flush()
+
+        entry = get_cached_score_entries(self.session, self.contest)[
+            (self.participation.id, self.task.id)]
+        self.assertEqual(entry.score, 70.0)
+        self.assertEqual(len(self.get_history_entries()), 2)
+
+    def test_restricted_to_participations_and_tasks(self):
+        """Test that only the requested pairs are read."""
+        self.add_participation(contest=self.contest)
+        self.add_task(contest=self.contest)
+        self.add_scored_submission(self.at(1), 30.0)
+        self.session.flush()
+
+        entries = get_cached_score_entries(
+            self.session, self.contest,
+            participations=[self.participation], tasks=[self.task])
+        self.assertEqual(list(entries), [(self.participation.id, self.task.id)])
+        self.assertEqual(self.session.query(ParticipationTaskScore).count(), 1)
+
+    def test_restricted_to_pairs(self):
+        """Test that only the requested pairs are built."""
+        other_participation = self.add_participation(contest=self.contest)
+        other_task = self.add_task(contest=self.contest)
+        self.session.flush()
+
+        entries = get_cached_score_entries(
+            self.session, self.contest,
+            pairs=[(self.participation, self.task),
+                   (other_participation, other_task)])
+        self.assertCountEqual(entries, [
+            (self.participation.id, self.task.id),
+            (other_participation.id, other_task.id),
+        ])
+        self.assertEqual(self.session.query(ParticipationTaskScore).count(), 2)
+
+    def test_training_day(self):
+        """Test that training day submissions are found in the managing
+        contest.
+
+        """
+        training_program = TrainingProgram(
+            name="program", description="Program",
+            managing_contest=self.contest)
+        day_contest = self.add_contest()
+        training_day = TrainingDay(
+            training_program=training_program, contest=day_contest,
+            position=0)
+        self.session.add_all([training_program, training_day])
+        self.task.training_day = training_day
+        td_participation = self.add_participation(
+            contest=day_contest, user=self.participation.user)
+        submission = self.add_scored_submission(self.at(1), 90.0)
+        submission.training_day = training_day
+        self.add_scored_submission(self.at(2), 100.0)
+        self.session.flush()
+
+        entries = get_cached_score_entries(self.session, day_contest)
+        self.assertEqual(list(entries), [(td_participation.id, self.task.id)])
+        self.assertEqual(entries[(td_participation.id, self.task.id)].score,
+                         90.0)
+
+
 class TestRebuildScoreCache(ScoreCacheMixin, unittest.TestCase):
     """Tests for rebuild_score_cache()."""
 
@@ -499,6 +633,54 @@ class TestUpdateScoreCache(ScoreCacheMixin, unittest.TestCase):
         self.assertEqual(cache_entry_after.last_submission_score, 40.0)
 
 
+class TestUpdateScoreCacheBatch(ScoreCacheMixin, unittest.TestCase):
+    """Tests for update_score_cache_batch()."""
+
+    def setUp(self):
+        super().setUp()
+        self.task.score_mode = SCORE_MODE_MAX
+
+    def test_batch_same_as_single_updates(self):
+        """Test that a batch gives the same cache as one update each."""
+        submissions = [self.add_scored_submission(self.at(1), 50.0),
+                       self.add_scored_submission(self.at(2), 75.0),
+                       self.add_scored_submission(self.at(3), 60.0)]
+        self.session.flush()
+        update_score_cache_batch(self.session, submissions)
+        cache_entry = self.get_cache_entry()
+        self.assertEqual(cache_entry.score, 75.0)
+        self.assertEqual(cache_entry.last_submission_score, 60.0)
+        self.assertEqual(cache_entry.last_submission_timestamp, self.at(3))
+        self.assertEqual([h.score for h in self.get_history_entries()],
+                         [50.0, 75.0])
+
+    def test_batch_applied_in_timestamp_order(self):
+        """Test that the order of the batch does not invalidate history."""
+        submission1 = self.add_scored_submission(self.at(1), 50.0)
+        submission2 = self.add_scored_submission(self.at(2), 60.0)
+        self.session.flush()
+        update_score_cache_batch(self.session, [submission2, submission1])
+        cache_entry = self.get_cache_entry()
+        self.assertTrue(cache_entry.history_valid)
+        self.assertEqual(cache_entry.last_submission_score, 60.0)
+
+    def test_batch_skips_ignored_submissions(self):
+        """Test that unofficial and unscored submissions are skipped."""
+        unofficial = self.add_scored_submission(self.at(1), 90.0)
+        unofficial.official = False
+        unscored = self.add_unscored_submission(self.at(2))
+        official = self.add_scored_submission(self.at(3), 40.0)
+        self.session.flush()
+        update_score_cache_batch(
+            self.session, [unofficial, unscored, official])
+        self.assertEqual(self.get_cache_entry().score, 40.0)
+
+    def test_empty_batch(self):
+        """Test that an empty batch does nothing."""
+        update_score_cache_batch(self.session, [])
+        self.assertIsNone(self.get_cache_entry())
+
+
 class TestScoreCacheAfterInvalidation(ScoreCacheMixin, unittest.TestCase):
     """Tests for score cache behavior after invalidation.
 
@@ -184,6 +184,19 @@ class TestGroupMin(ScoreTypeTestMixin, unittest.TestCase):
                 {"idx": 3}
             ])
 
+    def test_testcases_to_skip(self):
+        parameters = [[40, "1_*"], [60, "[12]_1"], [0, "3_*"]]
+        gmin = GroupMin(parameters, self._public_testcases)
+
+        # Nothing is decided while all outcomes are positive.
+        self.assertEqual(gmin.testcases_to_skip({"1_0": 0.5}), [])
+
+        # A testcase is skipped only if all its subtasks are decided
+        # (1_1 is also in the second subtask).
+        self.assertEqual(gmin.testcases_to_skip({"1_0": 0.0}), [])
+        self.assertEqual(gmin.testcases_to_skip({"1_1": 0.0}), ["1_0", "2_1"])
+        self.assertEqual(gmin.testcases_to_skip({"3_0": 0.0}), ["3_1"])
+
 
 if __name__ == "__main__":
     unittest.main()
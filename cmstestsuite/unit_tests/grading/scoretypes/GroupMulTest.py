@@ -184,6 +184,14 @@ class TestGroupMul(ScoreTypeTestMixin, unittest.TestCase):
                 {"idx": 3}
             ])
 
+    def test_testcases_to_skip(self):
+        parameters = [[40, "1_*"], [60, "2_*"]]
+        gmul = GroupMul(parameters, self._public_testcases)
+
+        self.assertEqual(gmul.testcases_to_skip({"1_0": 0.5}), [])
+        self.assertEqual(gmul.testcases_to_skip({"1_0": 0.0, "2_0": 0.1}),
+                         ["1_1"])
+
 
 if __name__ == "__main__":
     unittest.main()
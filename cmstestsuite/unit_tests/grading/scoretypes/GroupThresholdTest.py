@@ -201,6 +201,16 @@ class TestGroupThreshold(ScoreTypeTestMixin, unittest.TestCase):
                 {"idx": 3}
             ])
 
+    def test_testcases_to_skip(self):
+        parameters = [[40, "1_*", 1.0], [60, "2_*", 2.0]]
+        gthr = GroupThreshold(parameters, self._public_testcases)
+
+        self.assertEqual(gthr.testcases_to_skip({"1_0": 0.5, "2_0": 2.0}),
+                         [])
+        # Both a zero and an outcome above the threshold decide.
+        self.assertEqual(gthr.testcases_to_skip({"1_0": 0.0, "2_0": 2.5}),
+                         ["1_1", "2_1"])
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -25,7 +25,7 @@ from datetime import timedelta
 
 from cmstestsuite.unit_tests.databasemixin import DatabaseMixin
 
-from cms.grading.scoring import task_score
+from cms.grading.scoring import get_submissions_by_task, task_score
 from cmscommon.constants import \
     SCORE_MODE_MAX, SCORE_MODE_MAX_SUBTASK, SCORE_MODE_MAX_TOKENED_LAST
 from cmscommon.datetime import make_datetime
@@ -382,5 +382,57 @@ class TestTaskScoreMax(TaskScoreMixin, unittest.TestCase):
         self.assertEqual(self.call(rounded=True), (44.44, False))
 
 
+class TestSubmissionsByTask(TaskScoreMixin, unittest.TestCase):
+    """Tests for get_submissions_by_task() and its use in task_score()."""
+
+    def setUp(self):
+        super().setUp()
+        self.task.score_mode = SCORE_MODE_MAX
+        self.other_task = self.add_task(contest=self.participation.contest)
+        self.other_task.active_dataset = \
+            self.add_dataset(task=self.other_task)
+
+    def test_index(self):
+        self.add_result(self.at(2), 66.6)
+        self.add_result(self.at(1), 44.4)
+        unofficial = self.add_submission(participation=self.participation,
+                                         task=self.task, official=False)
+        other = self.add_submission(participation=self.participation,
+                                    task=self.other_task)
+        self.session.flush()
+        index = get_submissions_by_task(self.participation)
+        self.assertCountEqual(index, [self.task.id, self.other_task.id])
+        self.assertEqual(
+            [(s.timestamp, sr.score) for s, sr in index[self.task.id]],
+            [(self.at(1), 44.4), (self.at(2), 66.6)])
+        self.assertNotIn(unofficial, [s for s, _ in index[self.task.id]])
+        self.assertEqual(index[self.other_task.id], [(other, None)])
+
+    def test_index_restricted_to_tasks(self):
+        self.add_result(self.at(1), 44.4)
+        self.add_submission(participation=self.participation,
+                            task=self.other_task)
+        self.session.flush()
+        index = get_submissions_by_task(self.participation, tasks=[self.task])
+        self.assertEqual(list(index), [self.task.id])
+
+    def test_task_score_with_index(self):
+        self.add_result(self.at(1), 44.4, public_score=10.0)
+        self.add_result(self.at(2), 66.6, tokened=True, public_score=20.0)
+        self.add_submission(participation=self.participation,
+                            task=self.other_task)
+        self.session.flush()
+        index = get_submissions_by_task(self.participation)
+        for kwargs in [{}, {"public": True}, {"only_tokened": True}]:
+            self.assertEqual(
+                task_score(self.participation, self.task,
+                           submissions_by_task=index, **kwargs),
+                task_score(self.participation, self.task, **kwargs))
+        self.assertEqual(
+            task_score(self.participation, self.other_task,
+                       submissions_by_task=index),
+            (0.0, True))
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -36,6 +36,8 @@ class FakeIsolateSandbox(IsolateSandbox):
     """
     def __init__(self, file_cacher, name=None, temp_dir=None):
         super().__init__(file_cacher, name, temp_dir)
+        # Nothing runs in the box, so other sandboxes can take its id.
+        IsolateSandbox.box_ids_in_use.discard(self.box_id)
         self._fake_files = {}
 
         self._fake_execute_data = deque()
@@ -141,5 +143,8 @@ class FakeIsolateSandbox(IsolateSandbox):
     def initialize_isolate(self):
         pass
 
+    def _cleanup_box(self):
+        pass
+
     def cleanup(self):
         pass
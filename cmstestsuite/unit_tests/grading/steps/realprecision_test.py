@@ -18,8 +18,11 @@
 
 """Tests for realprecision.py."""
 
+import random
+import re
 import unittest
 from io import BytesIO
+from unittest.mock import patch
 
 from cms.grading.steps.realprecision import _DEFAULT_EXP, _real_numbers_compare
 
@@ -185,5 +188,120 @@ class TestRealPrecision(unittest.TestCase):
         self.assertFalse(self._cmp(large_number, "0"))
         self.assertFalse(self._cmp(large_number, "-1000000"))
 
+
+def _split_real_numbers_compare(output, correct, exponent=_DEFAULT_EXP):
+    """The original implementation of _real_numbers_compare, reading
+    the whole files, used as a reference for the streaming one.
+
+    """
+    pattern = rb'([+-]?(?:\d+(?:\.\d*)?|\.\d+))'
+    out_parts = re.split(pattern, output.read())
+    cor_parts = re.split(pattern, correct.read())
+    if len(out_parts) != len(cor_parts):
+        return False
+    eps = 10 ** (-exponent)
+    for i, (out_part, cor_part) in enumerate(zip(out_parts, cor_parts)):
+        if i % 2 == 0:
+            if b" ".join(out_part.split()) != b" ".join(cor_part.split()):
+                return False
+        elif abs(float(out_part) - float(cor_part)) \
+                > eps * max(1.0, abs(float(cor_part))):
+            return False
+    return True
+
+
+class TestRealPrecisionStreaming(unittest.TestCase):
+    """Check that the chunked implementation agrees with the one
+    splitting the whole files, whatever the chunk boundaries.
+
+    """
+
+    ALPHABET = [b"1", b"0", b"25", b"7", b".", b"+", b"-", b"a", b"x:",
+                b" ", b"\t", b"\n", b"\r"]
+
+    def setUp(self):
+        super().setUp()
+        self.random = random.Random(42)
+
+    def random_output(self):
+        return b"".join(self.random.choice(self.ALPHABET)
+                        for _ in range(self.random.randint(0, 12)))
+
+    def perturb(self, content):
+        """Return a string similar to content, to get many equal pairs."""
+        result = bytearray()
+        for char in content:
+            if chr(char).isspace() and self.random.random() < 0.3:
+                result += self.random.choice([b"", b" ", b"\n", b" \t"])
+            else:
+                result.append(char)
+        if self.random.random() < 0.3:
+            result += b"0" * self.random.randint(1, 3)
+        return bytes(result)
+
+    def assertSameResult(self, a, b, chunk_size):
+        expected = _split_real_numbers_compare(BytesIO(a), BytesIO(b))
+        with patch("cms.grading.steps.realprecision._CHUNK_SIZE",
+                   chunk_size):
+            self.assertEqual(_real_numbers_compare(BytesIO(a), BytesIO(b)),
+                             expected, (a, b, chunk_size))
+
+    def test_random(self):
+        for _ in range(2000):
+            a = self.random_output()
+            if self.random.random() < 0.5:
+                b = self.perturb(a)
+            else:
+                b = self.random_output()
+            for chunk_size in [1, 2, 3, 7, 1024]:
+                self.assertSameResult(a, b, chunk_size)
+
+    def test_random_numeric(self):
+        # Exercise the fast path for outputs made only of numbers.
+        for _ in range(500):
+            values = [self.random.uniform(-10, 10)
+                      for _ in range(self.random.randint(0, 20))]
+            a = b" ".join(b"%.*f" % (self.random.randint(0, 8), value)
+                          for value in values)
+            b = self.perturb(a)
+            for chunk_size in [1, 5, 16, 1024]:
+                self.assertSameResult(a, b, chunk_size)
+
+    def test_number_split_across_chunks(self):
+        for chunk_size in [1, 2, 3]:
+            self.assertSameResult(b"12.5 -.25", b"12.5 -0.25", chunk_size)
+            self.assertSameResult(b"1.2.3", b"1.2 .3", chunk_size)
+            self.assertSameResult(b"a+.5b", b"a 0.5b", chunk_size)
+            self.assertSameResult(b"a+.b", b"a+.b", chunk_size)
+            self.assertSameResult(b"1-2", b"1 -2", chunk_size)
+            self.assertSameResult(b"12", b"1 2", chunk_size)
+
+    def test_long_numbers(self):
+        with patch("cms.grading.steps.realprecision._CHUNK_SIZE", 100):
+            # Too large for a float, whatever the digits.
+            self.assertFalse(_real_numbers_compare(
+                BytesIO(b"9" * 10000), BytesIO(b"1")))
+            self.assertTrue(_real_numbers_compare(
+                BytesIO(b"0" * 10000 + b"1." + b"0" * 10000),
+                BytesIO(b"1")))
+            self.assertTrue(_real_numbers_compare(
+                BytesIO(b"." + b"0" * 10000 + b"1"), BytesIO(b"0")))
+            # 2^53 + 1 is a tie between two floats, which the digits far
+            # away must break.
+            self.assertTrue(_real_numbers_compare(
+                BytesIO(b"9007199254740993." + b"0" * 10000 + b"1"),
+                BytesIO(b"9007199254740994")))
+
+    def test_long_line(self):
+        line = b" ".join(b"%d.5" % i for i in range(100000))
+        with patch("cms.grading.steps.realprecision._CHUNK_SIZE", 4096):
+            self.assertTrue(_real_numbers_compare(
+                BytesIO(line), BytesIO(line.replace(b" ", b"\n"))))
+            self.assertFalse(_real_numbers_compare(
+                BytesIO(line), BytesIO(line[:-1] + b"6")))
+            self.assertFalse(_real_numbers_compare(
+                BytesIO(line), BytesIO(line[:-4])))
+
+
 if __name__ == "__main__":
     unittest.main()
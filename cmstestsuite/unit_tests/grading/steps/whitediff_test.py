@@ -18,8 +18,10 @@
 
 """Tests for whitediff.py."""
 
+import random
 import unittest
 from io import BytesIO
+from unittest.mock import patch
 
 from cms.grading.steps import _WHITES, _white_diff
 
@@ -68,5 +70,91 @@ class TestWhiteDiff(unittest.TestCase):
         self.assertFalse(self._diff("1\n\n2", "1\n2"))
 
 
+def _line_white_diff(output, res):
+    """The original line-based implementation of _white_diff, used as a
+    reference for the streaming one.
+
+    """
+    def canonicalize(line):
+        return b" ".join(line.split())
+
+    while True:
+        lout = output.readline()
+        lres = res.readline()
+        if len(lres) == 0 and len(lout) == 0:
+            return True
+        if canonicalize(lout) != canonicalize(lres):
+            return False
+
+
+class UnseekableBytesIO(BytesIO):
+    def seekable(self):
+        return False
+
+
+class TestWhiteDiffStreaming(unittest.TestCase):
+    """Check that the chunked implementation agrees with the line-based
+    one, whatever the chunk boundaries.
+
+    """
+
+    ALPHABET = [b"1", b"23", b"a", b"x" * 10] + _WHITES
+
+    def setUp(self):
+        super().setUp()
+        self.random = random.Random(42)
+
+    def random_output(self):
+        return b"".join(self.random.choice(TestWhiteDiffStreaming.ALPHABET)
+                        for _ in range(self.random.randint(0, 12)))
+
+    def perturb(self, content):
+        """Return a string similar to content, to get many equal pairs."""
+        tokens = content.split(b"\n")
+        for i in range(len(tokens)):
+            if self.random.random() < 0.3:
+                tokens[i] = self.random.choice(_WHITES[:2]).join(
+                    tokens[i].split())
+        result = b"\n".join(tokens)
+        if self.random.random() < 0.3:
+            result += self.random.choice(_WHITES) * self.random.randint(1, 3)
+        return result
+
+    def assertSameResult(self, a, b, chunk_size):
+        expected = _line_white_diff(BytesIO(a), BytesIO(b))
+        with patch("cms.grading.steps.whitediff._CHUNK_SIZE", chunk_size):
+            self.assertEqual(_white_diff(BytesIO(a), BytesIO(b)), expected,
+                             (a, b, chunk_size))
+            self.assertEqual(
+                _white_diff(UnseekableBytesIO(a), UnseekableBytesIO(b)),
+                expected, (a, b, chunk_size))
+
+    def test_random(self):
+        for _ in range(2000):
+            a = self.random_output()
+            if self.random.random() < 0.5:
+                b = self.perturb(a)
+            else:
+                b = self.random_output()
+            for chunk_size in [1, 2, 3, 7, 1024]:
+                self.assertSameResult(a, b, chunk_size)
+
+    def test_token_split_across_chunks(self):
+        for chunk_size in [1, 2, 3]:
+            self.assertSameResult(b"12 345", b"12 345", chunk_size)
+            self.assertSameResult(b"12 345", b"123 45", chunk_size)
+            self.assertSameResult(b"12\n345", b"12 345", chunk_size)
+            self.assertSameResult(b"\n\n12", b"12", chunk_size)
+            self.assertSameResult(b"12\n\n\n\n", b"12  ", chunk_size)
+
+    def test_long_line(self):
+        line = b" ".join(b"%d" % i for i in range(100000))
+        with patch("cms.grading.steps.whitediff._CHUNK_SIZE", 4096):
+            self.assertTrue(_white_diff(BytesIO(line),
+                                        BytesIO(line.replace(b" ", b"\t"))))
+            self.assertFalse(_white_diff(BytesIO(line),
+                                         BytesIO(line[:-1])))
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -18,10 +18,19 @@
 
 """Tests for the utilities for task types."""
 
+import os
+import shutil
 import unittest
+from unittest.mock import MagicMock, patch
 
+from cms import config
+from cms.db.filecacher import FileCacher
 from cms.grading import Language
-from cms.grading.tasktypes import is_manager_for_compilation
+from cms.grading.Sandbox import StupidSandbox
+from cms.grading.tasktypes import create_sandbox, delete_sandbox, \
+    is_manager_for_compilation, sandbox_pool
+from cms.grading.tasktypes.util import SandboxPool
+from cms.service.esoperations import ESOperation
 
 
 class TestLanguage(Language):
@@ -91,5 +100,110 @@ class TestIsManagerForCompilation(unittest.TestCase):
         self.assertIsNotForCompilation("test.srcext1.")
 
 
+class TestSandboxPool(unittest.TestCase):
+    """Test the reuse of sandboxes through sandbox_pool."""
+
+    def setUp(self):
+        super().setUp()
+        self.file_cacher = FileCacher(path="fs-storage")
+        self.job = MagicMock(archive_sandbox=False, keep_sandbox=False,
+                             success=True)
+        for patcher in [
+                patch("cms.grading.tasktypes.util.Sandbox", StupidSandbox),
+                patch.object(config.worker, "keep_sandbox", False),
+                patch.object(config.worker, "reuse_sandboxes", True)]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree("fs-storage", ignore_errors=True)
+        super().tearDown()
+
+    def test_reuse(self):
+        with sandbox_pool() as pool:
+            sandbox = create_sandbox(self.file_cacher, name="evaluate")
+            path = sandbox.get_root_path()
+            sandbox.create_file_from_string("output.txt", b"42")
+            sandbox.stdout_file = "output.txt"
+            delete_sandbox(sandbox, self.job)
+            # Still there, but empty and with the default parameters.
+            self.assertTrue(os.path.isdir(path))
+            self.assertEqual(os.listdir(path), [])
+            self.assertIsNone(sandbox.stdout_file)
+
+            self.assertIs(
+                create_sandbox(self.file_cacher, name="evaluate"), sandbox)
+            other = create_sandbox(self.file_cacher, name="compile")
+            self.assertIsNot(other, sandbox)
+            delete_sandbox(sandbox, self.job)
+            delete_sandbox(other, self.job)
+            self.assertEqual((pool.created, pool.reused), (2, 1))
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(os.path.exists(other.get_root_path()))
+
+    def test_failed_jobs_are_kept(self):
+        self.job.success = False
+        with sandbox_pool():
+            sandbox = create_sandbox(self.file_cacher, name="evaluate")
+            sandbox.create_file_from_string("output.txt", b"42")
+            delete_sandbox(sandbox, self.job)
+            self.assertIsNot(
+                create_sandbox(self.file_cacher, name="evaluate"), sandbox)
+        self.assertTrue(os.path.exists(sandbox.relative_path("output.txt")))
+        sandbox.cleanup(delete=True)
+
+    def test_max_idle(self):
+        with sandbox_pool():
+            sandboxes = [create_sandbox(self.file_cacher, name="evaluate")
+                         for _ in range(SandboxPool.MAX_IDLE_SANDBOXES + 1)]
+            for sandbox in sandboxes:
+                delete_sandbox(sandbox, self.job)
+            # The last one did not fit in the pool and was deleted.
+            self.assertFalse(os.path.exists(sandboxes[-1].get_root_path()))
+            self.assertTrue(os.path.exists(sandboxes[0].get_root_path()))
+
+    def test_not_shared_among_submissions(self):
+        with sandbox_pool() as pool:
+            self.job.operation = ESOperation(ESOperation.EVALUATION, 1, 1, "0")
+            pool.start_job(self.job)
+            sandbox = create_sandbox(self.file_cacher, name="evaluate")
+            delete_sandbox(sandbox, self.job)
+            pool.start_job(self.job)
+            self.assertIs(
+                create_sandbox(self.file_cacher, name="evaluate"), sandbox)
+            delete_sandbox(sandbox, self.job)
+
+            self.job.operation = ESOperation(ESOperation.EVALUATION, 2, 1, "0")
+            pool.start_job(self.job)
+            self.assertFalse(os.path.exists(sandbox.get_root_path()))
+            self.assertIsNot(
+                create_sandbox(self.file_cacher, name="evaluate"), sandbox)
+
+    def test_unreleased_sandboxes_are_cleaned_up(self):
+        with sandbox_pool() as pool:
+            self.job.operation = ESOperation(ESOperation.EVALUATION, 1, 1, "0")
+            pool.start_job(self.job)
+            sandbox = create_sandbox(self.file_cacher, name="evaluate")
+            with patch.object(sandbox, "cleanup") as cleanup:
+                pool.start_job(self.job)
+                cleanup.assert_called_once_with()
+            # It is not handed out again.
+            self.assertIsNot(
+                create_sandbox(self.file_cacher, name="evaluate"), sandbox)
+        # Kept on disk, to help debugging.
+        self.assertTrue(os.path.exists(sandbox.get_root_path()))
+        sandbox.cleanup(delete=True)
+
+    def test_disabled(self):
+        with patch.object(config.worker, "reuse_sandboxes", False):
+            with sandbox_pool() as pool:
+                sandbox = create_sandbox(self.file_cacher, name="evaluate")
+                delete_sandbox(sandbox, self.job)
+                self.assertFalse(os.path.exists(sandbox.get_root_path()))
+                self.assertIsNot(
+                    create_sandbox(self.file_cacher, name="evaluate"),
+                    sandbox)
+                self.assertEqual(pool.reused, 0)
+
 if __name__ == "__main__":
     unittest.main()
@@ -26,7 +26,7 @@ import gevent
 import gevent.event
 import gevent.socket
 
-from cms.io import FakeQueueItem, PriorityQueue
+from cms.io import FairPriorityQueue, FakeQueueItem, PriorityQueue
 from cmscommon.datetime import make_datetime
 
 
@@ -176,5 +176,126 @@ class TestPriorityQueue(unittest.TestCase):
         self.queue._verify()
 
 
+class TestFairPriorityQueue(unittest.TestCase):
+
+    def setUp(self):
+        # Items are "tenant:title".
+        self.weights = {}
+        self.queue = FairPriorityQueue(
+            lambda item: str(item).split(":")[0],
+            lambda tenant: self.weights.get(tenant, 1.0))
+
+    def push(self, tenant, count, priority=PriorityQueue.PRIORITY_MEDIUM,
+             start=0):
+        for i in range(start, start + count):
+            self.queue.push(FakeQueueItem("%s:%03d" % (tenant, i)), priority,
+                            timestamp=make_datetime(i))
+
+    def pop_tenants(self, count):
+        return "".join(str(self.queue.pop().item).split(":")[0]
+                       for _ in range(count))
+
+    def test_order_in_tenant(self):
+        self.queue.push(FakeQueueItem("a:low"), PriorityQueue.PRIORITY_LOW)
+        self.queue.push(FakeQueueItem("a:late"),
+                        PriorityQueue.PRIORITY_MEDIUM,
+                        timestamp=make_datetime(10))
+        self.queue.push(FakeQueueItem("a:early"),
+                        PriorityQueue.PRIORITY_MEDIUM,
+                        timestamp=make_datetime(5))
+        self.assertTrue(self.queue._verify())
+
+        self.assertEqual(str(self.queue.top().item), "a:early")
+        self.assertEqual([str(self.queue.pop().item) for _ in range(3)],
+                         ["a:early", "a:late", "a:low"])
+        self.assertTrue(self.queue._verify())
+        with self.assertRaises(LookupError):
+            self.queue.pop()
+
+    def test_share(self):
+        # The big tenant came first, with older items.
+        self.push("a", 100)
+        self.push("b", 10, start=1000)
+        self.assertEqual(self.pop_tenants(6), "ababab")
+
+        self.weights["a"] = 2.0
+        self.assertEqual(self.pop_tenants(6), "abaaba")
+        self.assertEqual(self.queue.get_tenants_status(), {
+            "a": {"length": 93, "weight": 2.0, "virtual_time": 5.0},
+            "b": {"length": 5, "weight": 1.0, "virtual_time": 5.0}})
+        self.assertTrue(self.queue._verify())
+
+    def test_priority_first(self):
+        self.push("a", 10, PriorityQueue.PRIORITY_EXTRA_LOW)
+        self.push("b", 5, PriorityQueue.PRIORITY_HIGH, start=100)
+        self.assertEqual(self.pop_tenants(7), "bbbbbaa")
+
+    def test_no_credit_when_idle(self):
+        self.push("a", 100)
+        self.assertEqual(self.pop_tenants(50), "a" * 50)
+
+        # A tenant arriving late shares from then on, it does not get
+        # the workers until it catches up.
+        self.push("b", 10, start=1000)
+        self.assertEqual(self.pop_tenants(4), "baba")
+
+    def test_continue_last(self):
+        self.push("a", 5)
+        self.push("b", 5, start=100)
+        self.queue.push(FakeQueueItem("b:high"), PriorityQueue.PRIORITY_HIGH)
+
+        def pop_batch(size):
+            return [str(self.queue.pop(continue_last=i > 0).item)
+                    for i in range(size)]
+
+        # Priorities still come first, then the batch goes on with the
+        # same tenant.
+        self.assertEqual(pop_batch(3), ["b:high", "b:100", "b:101"])
+        # Each batch is charged once.
+        self.assertEqual(pop_batch(3), ["a:000", "a:001", "a:002"])
+        # When the tenant has no more items, the batch goes on with the
+        # next one (ties are broken by age).
+        self.assertEqual(pop_batch(4), ["a:003", "a:004", "b:102", "b:103"])
+        self.assertTrue(self.queue._verify())
+
+    def test_empty_tenants_are_forgotten(self):
+        self.push("a", 1)
+        self.push("b", 1)
+        self.assertEqual(self.pop_tenants(2), "ab")
+        self.assertEqual(self.queue._virtual_times, {})
+
+        self.push("b", 1, start=10)
+        self.push("a", 1, start=20)
+        self.assertEqual(self.pop_tenants(2), "ba")
+        self.assertTrue(self.queue._verify())
+
+    def test_remove(self):
+        self.push("a", 2)
+        self.push("b", 1)
+        self.assertIn(FakeQueueItem("b:000"), self.queue)
+
+        self.queue.remove(FakeQueueItem("b:000"))
+        self.assertNotIn(FakeQueueItem("b:000"), self.queue)
+        self.assertEqual(list(self.queue.get_tenants_status()), ["a"])
+        self.assertTrue(self.queue._verify())
+
+        self.queue.set_priority(FakeQueueItem("a:001"),
+                                PriorityQueue.PRIORITY_HIGH)
+        self.assertEqual(str(self.queue.pop().item), "a:001")
+        self.queue.remove(FakeQueueItem("a:000"))
+        self.assertTrue(self.queue.empty())
+        self.assertTrue(self.queue._verify())
+
+    def test_pop_waiting(self):
+        greenlet = gevent.spawn(self.queue.pop, wait=True)
+        gevent.sleep(0.01)
+        self.assertFalse(greenlet.ready())
+
+        self.push("a", 1)
+        gevent.sleep(0.01)
+        self.assertEqual(str(greenlet.get().item), "a:000")
+        self.assertTrue(self.queue._verify())
+
+
 if __name__ == "__main__":
     unittest.main()
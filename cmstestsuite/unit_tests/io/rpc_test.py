@@ -22,7 +22,9 @@
 
 """
 
+import json
 import socket
+import struct
 import unittest
 from unittest.mock import Mock, patch
 
@@ -34,6 +36,7 @@ from gevent.server import StreamServer
 from cms import Address, ServiceCoord
 from cms.io import RPCError, rpc_method, RemoteServiceServer, \
     RemoteServiceClient
+from cms.io.rpc import ENCODING_JSON, ENCODING_MSGPACK, msgpack
 
 
 class MockService:
@@ -431,6 +434,90 @@ class TestRPC(unittest.TestCase):
         self.assertFalse(self.servers[0].connected)
         sock.close()
 
+    def test_send_too_long_frame(self):
+        sock = gevent.socket.create_connection((self.host, self.port))
+        sock.sendall(struct.pack("!cI", b"M", 2 ** 31))
+        self.sleep()
+        self.assertFalse(self.servers[0].connected)
+        sock.close()
+
+    def test_json_client_does_not_negotiate(self):
+        with patch.object(RemoteServiceClient, "ENCODINGS", [ENCODING_JSON]):
+            client = self.get_client(ServiceCoord("Foo", 0))
+            self.sleep()
+            self.assertEqual(client._encoding, ENCODING_JSON)
+            result = client.echo(value={"a": [1, 2.5, None]})
+            result.wait()
+            self.assertTrue(result.successful())
+            self.assertEqual(result.value, {"a": [1, 2.5, None]})
+
+
+@unittest.skipIf(msgpack is None, "msgpack is not installed")
+class TestRPCMsgpack(TestRPC):
+    """Run all the RPC tests again, with msgpack requests."""
+
+    def get_client(self, coord, block=True, auto_retry=None):
+        client = super().get_client(coord, block, auto_retry)
+        if block and client.ENCODINGS[0] == ENCODING_MSGPACK:
+            # The negotiation takes one round trip after connecting.
+            for _ in range(200):
+                if client._encoding == ENCODING_MSGPACK:
+                    break
+                self.sleep()
+            self.assertEqual(client._encoding, ENCODING_MSGPACK)
+        return client
+
+    def test_method_return_dict(self):
+        client = self.get_client(ServiceCoord("Foo", 0))
+        value = {"jobs": [{"files": {"a.c": "0" * 40}, "plus": None,
+                           "time_limit": 1.5, "success": True}]}
+        result = client.echo(value=value)
+        result.wait()
+        self.assertTrue(result.successful())
+        self.assertEqual(result.value, value)
+
+    def test_old_server(self):
+        # Servers that predate the negotiation do not have the method,
+        # and must keep receiving JSON.
+        with patch.object(RemoteServiceServer, "_negotiate_encoding",
+                          lambda self, encodings: None):
+            client = TestRPC.get_client(self, ServiceCoord("Foo", 0))
+            self.sleep()
+            self.assertEqual(client._encoding, ENCODING_JSON)
+            result = client.echo(value=42)
+            result.wait()
+            self.assertTrue(result.successful())
+            self.assertEqual(result.value, 42)
+
+    def test_old_client(self):
+        # Clients that predate the negotiation send JSON, and must
+        # receive JSON.
+        sock = gevent.socket.create_connection((self.host, self.port))
+        sock.sendall(json.dumps({"__id": "foo", "__method": "echo",
+                                 "__data": {"value": 42}}).encode() + b"\r\n")
+        response = sock.makefile("rb").readline()
+        self.assertEqual(json.loads(response),
+                         {"__id": "foo", "__data": 42, "__error": None})
+        sock.close()
+
+    def test_server_without_msgpack(self):
+        with patch.object(RemoteServiceServer, "ENCODINGS", [ENCODING_JSON]):
+            client = TestRPC.get_client(self, ServiceCoord("Foo", 0))
+            self.sleep()
+            self.assertEqual(client._encoding, ENCODING_JSON)
+
+    def test_send_frame(self):
+        sock = gevent.socket.create_connection((self.host, self.port))
+        payload = msgpack.packb({"__id": "foo", "__method": "echo",
+                                 "__data": {"value": [1, "a"]}})
+        sock.sendall(struct.pack("!cI", b"M", len(payload)) + payload)
+        reader = sock.makefile("rb")
+        tag, length = struct.unpack("!cI", reader.read(5))
+        self.assertEqual(tag, b"M")
+        self.assertEqual(msgpack.unpackb(reader.read(length)),
+                         {"__id": "foo", "__data": [1, "a"], "__error": None})
+        sock.close()
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+
+# Contest Management System - http://cms-dev.github.io/
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests for the ranking snapshots of AWS.
+
+"""
+
+import unittest
+from unittest.mock import patch
+
+from cmstestsuite.unit_tests.databasemixin import DatabaseMixin
+
+from cms.db import StatementView
+from cms.grading.scorecache import invalidate_score_cache, update_score_cache
+from cms.server.admin import rankingsnapshot
+from cms.server.admin.rankingsnapshot import competition_ranks, \
+    get_ranking_snapshot
+from cmscommon.constants import SCORE_MODE_MAX
+
+
+class TestCompetitionRanks(unittest.TestCase):
+
+    def test_ties_share_the_best_rank(self):
+        self.assertEqual(
+            competition_ranks({1: 5.0, 2: 10.0, 3: 7.0, 4: 7.0}),
+            {2: 1, 3: 2, 4: 2, 1: 4})
+
+    def test_empty(self):
+        self.assertEqual(competition_ranks({}), {})
+
+
+class TestGetRankingSnapshot(DatabaseMixin, unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        rankingsnapshot.clear_ranking_snapshots()
+        self.contest = self.add_contest()
+        self.task = self.add_task(contest=self.contest, score_mode=SCORE_MODE_MAX)
+        self.task.active_dataset = self.add_dataset(task=self.task)
+        self.p1 = self.add_participation(contest=self.contest)
+        self.p2 = self.add_participation(contest=self.contest)
+        self.session.flush()
+
+    def tearDown(self):
+        rankingsnapshot.clear_ranking_snapshots()
+        super().tearDown()
+
+    def add_scored_submission(self, participation, score):
+        submission = self.add_submission(
+            participation=participation, task=self.task)
+        self.add_submission_result(
+            submission, self.task.active_dataset,
+            score=score, public_score=score,
+            score_details=[], public_score_details=[],
+            ranking_score_details=[])
+        self.session.flush()
+        update_score_cache(self.session, submission)
+        return submission
+
+    def snapshot(self):
+        return get_ranking_snapshot(self.session, self.contest, {})
+
+    def snapshot_with_updates(self):
+        """Return the snapshot and the participations updated for it."""
+        with patch.object(rankingsnapshot, "get_cached_score_entries",
+                          wraps=rankingsnapshot.get_cached_score_entries) \
+                as get_entries:
+            snapshot = self.snapshot()
+        updated = set()
+        for call in get_entries.call_args_list:
+            updated.update(p.id for p in call.kwargs["participations"])
+        return snapshot, updated
+
+    def test_build(self):
+        self.add_scored_submission(self.p1, 40.0)
+        self.add_scored_submission(self.p2, 60.0)
+
+        snapshot = self.snapshot()
+        self.assertEqual(snapshot.total_scores,
+                         {self.p1.id: (40.0, False), self.p2.id: (60.0, False)})
+        self.assertEqual(snapshot.ranks, {self.p2.id: 1, self.p1.id: 2})
+        status = snapshot.task_statuses[self.p1.id][0]
+        self.assertTrue(status.has_submissions)
+        self.assertFalse(status.has_opened)
+        self.assertTrue(status.can_access)
+
+    def test_reused_when_unchanged(self):
+        self.add_scored_submission(self.p1, 40.0)
+        snapshot = self.snapshot()
+        etag = snapshot.etag
+
+        new_snapshot, updated = self.snapshot_with_updates()
+        self.assertIs(new_snapshot, snapshot)
+        self.assertEqual(updated, set())
+        self.assertEqual(new_snapshot.etag, etag)
+
+    def test_score_update(self):
+        self.add_scored_submission(self.p1, 40.0)
+        self.add_scored_submission(self.p2, 60.0)
+        etag = self.snapshot().etag
+
+        self.add_scored_submission(self.p1, 80.0)
+        snapshot, updated = self.snapshot_with_updates()
+        self.assertEqual(updated, {self.p1.id})
+        self.assertEqual(snapshot.total_scores[self.p1.id], (80.0, False))
+        self.assertEqual(snapshot.ranks, {self.p1.id: 1, self.p2.id: 2})
+        self.assertNotEqual(snapshot.etag, etag)
+
+    def test_new_submission_is_partial(self):
+        self.snapshot()
+
+        submission = self.add_submission(
+            participation=self.p2, task=self.task)
+        self.add_submission_result(submission, self.task.active_dataset)
+        self.session.flush()
+        snapshot, updated = self.snapshot_with_updates()
+        self.assertEqual(updated, {self.p2.id})
+        self.assertEqual(snapshot.total_scores[self.p2.id], (0.0, True))
+
+    def test_invalidation(self):
+        submission = self.add_scored_submission(self.p1, 40.0)
+        self.snapshot()
+
+        submission.get_result(self.task.active_dataset).score = 20.0
+        invalidate_score_cache(self.session, participation_id=self.p1.id,
+                               task_id=self.task.id)
+        self.session.flush()
+        snapshot, updated = self.snapshot_with_updates()
+        self.assertEqual(updated, {self.p1.id})
+        self.assertEqual(snapshot.total_scores[self.p1.id], (20.0, False))
+
+    def test_statement_view(self):
+        self.snapshot()
+
+        self.session.add(StatementView(participation=self.p1, task=self.task))
+        self.session.flush()
+        snapshot, updated = self.snapshot_with_updates()
+        self.assertEqual(updated, {self.p1.id})
+        self.assertTrue(snapshot.task_statuses[self.p1.id][0].has_opened)
+        self.assertFalse(snapshot.task_statuses[self.p2.id][0].has_opened)
+
+    def test_structure_change(self):
+        snapshot = self.snapshot()
+
+        p3 = self.add_participation(contest=self.contest)
+        self.session.flush()
+        self.session.expire(self.contest, ["participations"])
+        new_snapshot = self.snapshot()
+        self.assertIsNot(new_snapshot, snapshot)
+        self.assertIn(p3.id, new_snapshot.total_scores)
+        self.assertNotEqual(new_snapshot.etag, snapshot.etag)
+
+    def test_task_access(self):
+        self.snapshot()
+
+        snapshot = get_ranking_snapshot(
+            self.session, self.contest, {(self.p1.id, self.task.id): False})
+        self.assertFalse(snapshot.task_statuses[self.p1.id][0].can_access)
+        self.assertTrue(snapshot.task_statuses[self.p2.id][0].can_access)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -47,7 +47,6 @@ class TestFileByDigestMiddleware(unittest.TestCase):
         self.file_cacher = Mock()
         self.file_cacher.get_file = Mock(
             side_effect=lambda digest: io.BytesIO(self.content))
-        self.file_cacher.get_size = Mock(return_value=len(self.content))
 
         self.serve_file = True
         self.provide_filename = True
@@ -91,6 +90,7 @@ class TestFileByDigestMiddleware(unittest.TestCase):
         self.assertEqual(response.get_data(), self.content)
 
         self.file_cacher.get_file.assert_called_once_with(self.digest)
+        self.file_cacher.get_size.assert_not_called()
 
     def test_not_a_file(self):
         self.serve_file = False
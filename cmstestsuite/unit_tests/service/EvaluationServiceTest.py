@@ -0,0 +1,490 @@
+#!/usr/bin/env python3
+
+# Contest Management System - http://cms-dev.github.io/
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests for the evaluation service.
+
+"""
+
+import unittest
+from datetime import datetime
+from unittest.mock import patch
+
+from sqlalchemy import text
+
+from cmstestsuite.unit_tests.databasemixin import DatabaseMixin
+
+from cms import config
+from cms.db import Evaluation
+from cms.grading.Job import EvaluationJob
+from cms.service.EvaluationService import EvaluationExecutor, \
+    EvaluationService, Result
+from cms.service.esoperations import ESOperation
+
+
+class TestWriteResults(DatabaseMixin, unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+
+        self.contest = self.add_contest()
+        self.participation = self.add_participation(contest=self.contest)
+        self.task = self.add_task(contest=self.contest)
+        self.dataset = self.add_dataset(task=self.task)
+        self.testcases = [self.add_testcase(self.dataset) for _ in range(3)]
+        self.session.commit()
+
+        self.service = EvaluationService(0)
+        patcher = patch.object(self.service, "evaluation_ended")
+        self.evaluation_ended = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def new_submission_result(self):
+        submission = self.add_submission(
+            task=self.task, participation=self.participation)
+        sr = self.add_submission_result(
+            submission=submission, dataset=self.dataset,
+            compilation_outcome="ok")
+        self.session.commit()
+        return sr
+
+    def result(self, sr, testcase, success=True, outcome="1.0"):
+        operation = ESOperation(ESOperation.EVALUATION, sr.submission_id,
+                                sr.dataset_id, testcase.codename)
+        job = EvaluationJob(
+            operation=operation, shard=1, sandboxes=["/tmp/sandbox"],
+            success=success, outcome=outcome, text=["Output is correct"],
+            plus={"execution_time": 0.5, "execution_memory": 1024})
+        return operation, Result(job, success)
+
+    def evaluations(self, sr):
+        return self.session.query(Evaluation) \
+            .filter(Evaluation.submission_id == sr.submission_id) \
+            .filter(Evaluation.dataset_id == sr.dataset_id).all()
+
+    def test_write_evaluations(self):
+        sr_a = self.new_submission_result()
+        sr_b = self.new_submission_result()
+
+        self.service.write_results(
+            [self.result(sr_a, testcase) for testcase in self.testcases]
+            + [self.result(sr_b, self.testcases[0])])
+
+        evaluations = self.evaluations(sr_a)
+        self.assertCountEqual([e.testcase for e in evaluations],
+                              self.testcases)
+        for e in evaluations:
+            self.assertEqual(e.outcome, "1.0")
+            self.assertEqual(e.text, ["Output is correct"])
+            self.assertEqual(e.execution_time, 0.5)
+            self.assertEqual(e.execution_memory, 1024)
+            self.assertEqual(e.evaluation_shard, 1)
+            self.assertEqual(e.evaluation_sandbox_paths, ["/tmp/sandbox"])
+        self.assertEqual([e.testcase for e in self.evaluations(sr_b)],
+                         self.testcases[:1])
+
+        # Only the complete submission result is evaluated.
+        self.session.expire_all()
+        self.assertTrue(sr_a.evaluated())
+        self.assertFalse(sr_b.evaluated())
+        self.evaluation_ended.assert_called_once()
+
+    def test_write_evaluations_across_batches(self):
+        sr = self.new_submission_result()
+
+        self.service.write_results(
+            [self.result(sr, testcase) for testcase in self.testcases[:2]])
+        self.session.expire_all()
+        self.assertFalse(sr.evaluated())
+
+        self.service.write_results([self.result(sr, self.testcases[2])])
+        self.session.expire_all()
+        self.assertEqual(len(self.evaluations(sr)), 3)
+        self.assertTrue(sr.evaluated())
+
+    def test_write_evaluations_already_in_db(self):
+        sr = self.new_submission_result()
+        self.add_evaluation(sr, self.testcases[0], outcome="0.0")
+        self.session.commit()
+
+        self.service.write_results(
+            [self.result(sr, testcase) for testcase in self.testcases])
+
+        # The existing evaluation is kept, the others are written.
+        self.session.expire_all()
+        self.assertCountEqual([e.outcome for e in self.evaluations(sr)],
+                              ["0.0", "1.0", "1.0"])
+        self.assertTrue(sr.evaluated())
+
+    def test_write_evaluations_unknown_testcase(self):
+        sr = self.new_submission_result()
+        operation, result = self.result(sr, self.testcases[0])
+        operation.testcase_codename = "unknown"
+
+        self.service.write_results(
+            [self.result(sr, testcase) for testcase in self.testcases[1:]]
+            + [(operation, result)])
+
+        # The bad result is isolated, the good ones are written.
+        self.assertCountEqual([e.testcase for e in self.evaluations(sr)],
+                              self.testcases[1:])
+
+    def test_write_evaluations_insert_fails(self):
+        sr = self.new_submission_result()
+
+        # The failed statement is rolled back to its savepoint, and the
+        # evaluations are then written one at a time.
+        with patch("cms.service.EvaluationService.insert") as insert:
+            insert.return_value.values.return_value \
+                .on_conflict_do_nothing.return_value \
+                .returning.return_value = text("SELECT * FROM no_such_table")
+            self.service.write_results(
+                [self.result(sr, testcase) for testcase in self.testcases])
+
+        self.session.expire_all()
+        self.assertEqual(len(self.evaluations(sr)), 3)
+        self.assertTrue(sr.evaluated())
+
+    def test_write_evaluations_with_failures(self):
+        sr = self.new_submission_result()
+
+        self.service.write_results(
+            [self.result(sr, testcase) for testcase in self.testcases[:2]]
+            + [self.result(sr, self.testcases[2], success=False)])
+
+        self.session.expire_all()
+        self.assertEqual(len(self.evaluations(sr)), 2)
+        self.assertEqual(sr.evaluation_tries, 1)
+        self.assertFalse(sr.evaluated())
+
+    def test_skip_decided_subtask(self):
+        # The first testcase is a subtask, the others another one.
+        self.dataset.score_type = "GroupMin"
+        self.dataset.score_type_parameters = [[40, 1], [60, 2]]
+        self.dataset.short_circuit_evaluation = True
+        first, second, third = sorted(self.testcases,
+                                      key=lambda tc: tc.codename)
+        sr = self.new_submission_result()
+        pending = ESOperation(ESOperation.EVALUATION, sr.submission_id,
+                              sr.dataset_id, third.codename)
+        self.service.enqueue(pending, 1, datetime.utcnow())
+
+        self.service.write_results([self.result(sr, second, outcome="0.0")])
+
+        # The other testcase of the subtask is skipped and dequeued.
+        self.session.expire_all()
+        skipped = {e.testcase: e for e in self.evaluations(sr)}[third]
+        self.assertEqual(skipped.outcome, "0.0")
+        self.assertEqual(skipped.text, ["Evaluation skipped"])
+        self.assertNotIn(pending, self.service.get_executor())
+        self.assertFalse(sr.evaluated())
+
+        self.service.write_results([self.result(sr, first)])
+        self.session.expire_all()
+        self.assertTrue(sr.evaluated())
+
+    def test_skip_only_with_short_circuit(self):
+        self.dataset.score_type = "GroupMin"
+        self.dataset.score_type_parameters = [[100, 3]]
+        sr = self.new_submission_result()
+
+        self.service.write_results(
+            [self.result(sr, self.testcases[0], outcome="0.0")])
+
+        self.assertEqual(len(self.evaluations(sr)), 1)
+
+    def compiled_submission_result(self):
+        self.task.active_dataset = self.dataset
+        self.dataset.task_type = "Batch"
+        self.dataset.task_type_parameters = ["alone", ["", ""], "diff"]
+        submission = self.add_submission(
+            task=self.task, participation=self.participation,
+            language="C++17 / g++")
+        sr = self.add_submission_result(
+            submission=submission, dataset=self.dataset,
+            compilation_outcome="ok")
+        self.add_executable(sr, filename="batch", digest="%040x" % 1)
+        self.session.commit()
+        return sr
+
+    def worker_result(self, sr, testcase):
+        operation = ESOperation(ESOperation.EVALUATION, sr.submission_id,
+                                sr.dataset_id, testcase.codename)
+        job = EvaluationJob.from_submission(
+            operation, sr.submission, sr.dataset)
+        job.success = True
+        job.outcome = "0.5"
+        job.text = ["Output is partially correct"]
+        job.plus = {"execution_time": 0.5, "execution_memory": 1024}
+        return operation, Result(job, True)
+
+    def test_copy_identical_executables(self):
+        sr_a = self.compiled_submission_result()
+        sr_b = self.compiled_submission_result()
+        self.dataset.deduplicate_evaluations = True
+        self.session.commit()
+        self.service.write_results(
+            [self.worker_result(sr_a, testcase)
+             for testcase in self.testcases])
+
+        self.assertEqual(
+            self.service.submission_enqueue_operations(sr_b.submission), 0)
+
+        self.session.expire_all()
+        self.assertCountEqual(
+            [(e.testcase, e.outcome, e.execution_time)
+             for e in self.evaluations(sr_b)],
+            [(testcase, "0.5", 0.5) for testcase in self.testcases])
+        self.assertTrue(sr_b.evaluated())
+        self.assertEqual(self.service.evaluation_memo_status(),
+                         {"size": 3, "hits": 3, "misses": 0})
+
+    def test_copy_disabled_by_default(self):
+        sr_a = self.compiled_submission_result()
+        sr_b = self.compiled_submission_result()
+        self.service.write_results(
+            [self.worker_result(sr_a, testcase)
+             for testcase in self.testcases])
+
+        self.assertEqual(
+            self.service.submission_enqueue_operations(sr_b.submission), 3)
+        self.assertEqual(len(self.evaluations(sr_b)), 0)
+
+
+
+class TestMissingOperations(DatabaseMixin, unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+
+        self.contest = self.add_contest()
+        self.participation = self.add_participation(contest=self.contest)
+        self.task = self.add_task(contest=self.contest)
+        self.task.active_dataset = self.add_dataset(task=self.task)
+        self.session.commit()
+
+        self.service = EvaluationService(0, self.contest.id)
+        patcher = patch.object(self.service, "enqueue")
+        self.enqueue = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def add_submission_to_compile(self):
+        submission = self.add_submission(
+            task=self.task, participation=self.participation)
+        self.session.commit()
+        return submission
+
+    def swept_submission_ids(self):
+        self.enqueue.reset_mock()
+        self.service._missing_operations()
+        return set(call.args[0].object_id
+                   for call in self.enqueue.call_args_list)
+
+    def test_incremental(self):
+        old = self.add_submission_to_compile()
+        self.assertEqual(self.swept_submission_ids(), {old.id})
+
+        # The old submission is still pending, the new one is found.
+        new = self.add_submission_to_compile()
+        self.assertEqual(self.swept_submission_ids(), {old.id, new.id})
+
+        # Once compiled, the submissions are not looked at anymore.
+        for submission in [old, new]:
+            self.add_submission_result(
+                submission=submission, dataset=self.task.active_dataset,
+                compilation_outcome="fail")
+        self.session.commit()
+        self.assertEqual(self.swept_submission_ids(), set())
+
+        # So a submission losing its result without ES knowing...
+        self.session.delete(old.get_result(self.task.active_dataset))
+        self.session.commit()
+        self.assertEqual(self.swept_submission_ids(), set())
+
+        # ...is found only by the next full sweep.
+        self.service.search_operations_not_done()
+        self.assertEqual(self.swept_submission_ids(), {old.id})
+
+    def test_full_sweep_interval(self):
+        submission = self.add_submission_to_compile()
+        self.swept_submission_ids()
+        self.service._pending_submission_ids.clear()
+        self.assertEqual(self.swept_submission_ids(), set())
+
+        self.service._last_full_sweep -= \
+            EvaluationService.FULL_SWEEP_INTERVAL.total_seconds()
+        self.assertEqual(self.swept_submission_ids(), {submission.id})
+
+    def test_enqueued_by_es(self):
+        submission = self.add_submission_to_compile()
+        self.swept_submission_ids()
+        self.service._pending_submission_ids.clear()
+
+        # Submissions ES enqueues operations for are looked at.
+        self.service.new_submission(submission.id)
+        self.assertEqual(self.swept_submission_ids(), {submission.id})
+
+
+class TestBatchSize(DatabaseMixin, unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+
+        self.dataset = self.add_dataset(task=self.add_task(
+            contest=self.add_contest()))
+        self.session.commit()
+
+        self.service = EvaluationService(0)
+        self.executor = self.service.get_executor()
+        self.workers = len(self.executor.pool)
+        self.first = self.operation(0)
+        # Look up the contest now, as it yields to the executor.
+        self.executor.get_contest_name(self.first)
+
+    def operation(self, i, dataset_id=None):
+        if dataset_id is None:
+            dataset_id = self.dataset.id
+        return ESOperation(ESOperation.EVALUATION, 1, dataset_id, "%03d" % i)
+
+    def fill_queue(self, num_operations):
+        for i in range(1, num_operations + 1):
+            self.executor.enqueue(self.operation(i), 0, datetime.now())
+
+    def test_spread_over_enabled_workers(self):
+        self.fill_queue(3 * self.workers)
+        self.assertEqual(self.executor.max_operations_per_batch(self.first), 4)
+
+        for shard in range(self.workers // 2):
+            self.executor.pool.disable_worker(shard)
+        self.assertEqual(self.executor.max_operations_per_batch(self.first),
+                         3 * self.workers // (self.workers
+                                              - self.workers // 2) + 1)
+
+    def test_capped(self):
+        self.fill_queue(100 * self.workers)
+        self.assertEqual(self.executor.max_operations_per_batch(self.first),
+                         EvaluationExecutor.MAX_OPERATIONS_PER_BATCH)
+
+    def test_target_duration(self):
+        self.fill_queue(100 * self.workers)
+
+        self.executor.add_duration(self.operation(0), 2.0)
+        self.executor.add_duration(self.operation(1), 2.0)
+        self.assertEqual(self.executor.max_operations_per_batch(self.first),
+                         int(EvaluationExecutor.TARGET_BATCH_DURATION / 2.0))
+
+        # Slower than the target, alone in the batch.
+        for _ in range(100):
+            self.executor.add_duration(self.operation(0), 100.0)
+        self.assertEqual(self.executor.max_operations_per_batch(self.first), 1)
+
+        # Other datasets are not affected.
+        other = self.operation(0, dataset_id=self.dataset.id + 1)
+        self.assertIsNone(self.executor.estimate_duration(other))
+        self.assertEqual(self.executor.max_operations_per_batch(other),
+                         EvaluationExecutor.MAX_OPERATIONS_PER_BATCH)
+
+    def test_status(self):
+        self.fill_queue(1)
+        self.executor.add_duration(self.operation(0), 2.0)
+
+        self.assertEqual(
+            [entry["estimated_duration"]
+             for entry in self.service.queue_status()], [2.0])
+        for worker_status in self.service.workers_status().values():
+            self.assertIsNone(worker_status["estimated_duration"])
+
+
+class TestContestsQueue(DatabaseMixin, unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+
+        self.contests = [self.add_contest() for _ in range(2)]
+        self.datasets = [self.add_dataset(task=self.add_task(contest=c))
+                         for c in self.contests]
+        self.session.commit()
+
+        self.names = [contest.name for contest in self.contests]
+
+        self.service = EvaluationService(0)
+        self.executor = self.service.get_executor()
+        # Look up the contests now, as it yields to the executor.
+        for dataset in self.datasets:
+            self.executor.get_contest_name(self.operation(dataset, 0))
+
+    @staticmethod
+    def operation(dataset, i):
+        return ESOperation(ESOperation.EVALUATION, 1, dataset.id, "%03d" % i)
+
+    def fill_queue(self, dataset, num_operations):
+        for i in range(num_operations):
+            self.executor.enqueue(self.operation(dataset, i), 0,
+                                  datetime.now())
+
+    def test_contest_name(self):
+        self.assertEqual(
+            self.executor.get_contest_name(self.operation(self.datasets[1], 0)),
+            self.names[1])
+        self.assertEqual(
+            self.executor.get_contest_name(
+                ESOperation(ESOperation.EVALUATION, 1,
+                            self.datasets[1].id + 1, "000")),
+            "")
+
+    def test_contest_name_refreshed(self):
+        deleted_id = self.datasets[0].id
+        self.contests[1].name = "renamed"
+        self.session.delete(self.datasets[0].task)
+        self.session.commit()
+        self.executor.load_contest_names(self.session)
+
+        self.assertEqual(
+            self.executor.get_contest_name(self.operation(self.datasets[1], 0)),
+            "renamed")
+        self.assertNotIn(deleted_id, self.executor._dataset_contest)
+
+    def test_batch_from_one_contest(self):
+        self.fill_queue(self.datasets[0], 3)
+        self.fill_queue(self.datasets[1], 3)
+
+        batch = [self.executor._pop()] + [
+            self.executor._pop(continue_batch=True) for _ in range(2)]
+        self.assertEqual(
+            {entry.item.dataset_id for entry in batch}, {self.datasets[0].id})
+        self.assertEqual(
+            self.executor._pop().item.dataset_id, self.datasets[1].id)
+
+    def test_status(self):
+        self.fill_queue(self.datasets[0], 3)
+        self.fill_queue(self.datasets[1], 1)
+
+        self.assertCountEqual(
+            [(entry["contest"], entry["item"]["multiplicity"])
+             for entry in self.service.queue_status()],
+            [(self.names[0], 3), (self.names[1], 1)])
+
+        with patch.object(config.evaluation_service, "contest_weights",
+                          {self.names[0]: 3.0}):
+            self.assertEqual(self.service.contests_queue_status(), {
+                self.names[0]: {
+                    "length": 3, "weight": 3.0, "virtual_time": 0.0},
+                self.names[1]: {
+                    "length": 1, "weight": 1.0, "virtual_time": 0.0}})
+
+
+if __name__ == "__main__":
+    unittest.main()
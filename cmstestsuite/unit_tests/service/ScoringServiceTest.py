@@ -28,13 +28,16 @@ import gevent.monkey
 gevent.monkey.patch_all()  # noqa
 
 import unittest
-from unittest.mock import patch, PropertyMock
+from unittest.mock import Mock, patch, PropertyMock
 
 import gevent
 
 from cmstestsuite.unit_tests.databasemixin import DatabaseMixin
 
-from cms.service.ScoringService import ScoringService
+from cms.db import ParticipationTaskScore
+from cms.io.priorityqueue import PriorityQueue, QueueEntry
+from cms.service.ScoringService import ScoringExecutor, ScoringService
+from cms.service.scoringoperations import ScoringOperation
 from cmscommon.datetime import make_datetime
 from cmstestsuite.unit_tests.testidgenerator import unique_long_id, \
     unique_unicode_id
@@ -141,6 +144,90 @@ class TestScoringService(DatabaseMixin, unittest.TestCase):
         self.score_type.compute_score.assert_not_called()
         self.assertEqual(current_time, sr.scored_at)
 
+    # Testing batches of operations.
+
+    def execute_batch(self, ids):
+        """Score a batch of (submission_id, dataset_id) pairs directly.
+
+        return: the mock of ProxyService notified by the executor.
+
+        """
+        proxy_service = Mock()
+        executor = ScoringExecutor(proxy_service)
+        executor.execute([
+            QueueEntry(ScoringOperation(submission_id, dataset_id),
+                       PriorityQueue.PRIORITY_MEDIUM, make_datetime(), index)
+            for index, (submission_id, dataset_id) in enumerate(ids)])
+        return proxy_service
+
+    def test_batch_skips_failures(self):
+        """Failing operations do not prevent scoring the others.
+
+        """
+        sr_a = self.new_sr_to_score()
+        sr_b = self.new_sr_to_score()
+        sr_c = self.new_sr_to_score()
+        self.session.commit()
+
+        def compute_score(sr):
+            if sr.submission_id == sr_b.submission_id:
+                raise ValueError("Broken score type.")
+            return self.compute_score(sr)
+        self.score_type.compute_score.side_effect = compute_score
+
+        self.execute_batch([(sr_a.submission_id, sr_a.dataset_id),
+                            (unique_long_id(), sr_a.dataset_id),
+                            (sr_b.submission_id, sr_b.dataset_id),
+                            (sr_c.submission_id, sr_c.dataset_id)])
+
+        self.assertCountEqual(self.call_args,
+                              [(sr_a.submission_id, sr_a.dataset_id),
+                               (sr_c.submission_id, sr_c.dataset_id)])
+        for sr in [sr_a, sr_b, sr_c]:
+            self.session.expire(sr)
+        self.assertIsNotNone(sr_a.scored_at)
+        self.assertIsNone(sr_b.scored_at)
+        self.assertIsNotNone(sr_c.scored_at)
+
+    def test_batch_updates_score_cache(self):
+        """Scoring on the active dataset updates the score cache.
+
+        """
+        self.score_info = (100.0,) + self.score_info[1:]
+        sr_a = self.new_sr_to_score()
+        sr_b = self.new_sr_to_score()
+        for sr in [sr_a, sr_b]:
+            sr.submission.task.active_dataset = sr.dataset
+        self.session.commit()
+
+        proxy_service = self.execute_batch(
+            [(sr_a.submission_id, sr_a.dataset_id),
+             (sr_b.submission_id, sr_b.dataset_id)])
+
+        self.assertEqual(proxy_service.submission_scored.call_count, 2)
+        self.assertEqual(
+            self.session.query(ParticipationTaskScore.task_id)
+            .order_by(ParticipationTaskScore.task_id).all(),
+            sorted([(sr_a.submission.task_id,), (sr_b.submission.task_id,)]))
+
+    def test_batch_fallback(self):
+        """If the batch cannot be stored, results are scored one by one.
+
+        """
+        sr_a = self.new_sr_to_score()
+        sr_b = self.new_sr_to_score()
+        self.session.commit()
+
+        with patch("cms.service.ScoringService.update_score_cache_batch",
+                   side_effect=[RuntimeError("Lost connection."),
+                                None, None]):
+            self.execute_batch([(sr_a.submission_id, sr_a.dataset_id),
+                                (sr_b.submission_id, sr_b.dataset_id)])
+
+        for sr in [sr_a, sr_b]:
+            self.session.expire(sr)
+            self.assertIsNotNone(sr.scored_at)
+
 
 if __name__ == "__main__":
     unittest.main()
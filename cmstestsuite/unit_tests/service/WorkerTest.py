@@ -22,13 +22,15 @@
 """
 
 import unittest
-from unittest.mock import Mock, call
+from unittest.mock import Mock, call, patch
 
 import gevent
 
 import cms.service.Worker
 from cms.grading import JobException
-from cms.grading.Job import JobGroup, EvaluationJob
+from cms import config
+from cms.db import Executable, File, Manager
+from cms.grading.Job import CompilationJob, JobGroup, EvaluationJob
 from cms.service.Worker import Worker
 from cms.service.esoperations import ESOperation
 from cmstestsuite.unit_tests.testidgenerator import \
@@ -130,34 +132,43 @@ class TestWorker(unittest.TestCase):
         self.assertEqual(task_type_b.call_count, n_jobs_b)
 
     def test_execute_job_subsequent_locked(self):
-        """Executes a long job, then another one that should fail
-        because of the lock.
+        """Executes a long job, accepts another one to execute next,
+        then declines a third one because of the lock.
 
         """
         # Because of how gevent works, the interval here can be very small.
-        task_type = FakeTaskType([0.01])
+        task_type = FakeTaskType([0.01, True])
         cms.service.Worker.get_task_type = Mock(return_value=task_type)
 
         jobs_a, calls_a = TestWorker.new_jobs(1, prefix="a")
         jobs_b, calls_b = TestWorker.new_jobs(1, prefix="b")
+        jobs_c, calls_c = TestWorker.new_jobs(1, prefix="c")
 
-        def first_call():
-            job_group = JobGroup([jobs_a[0]])
-            JobGroup.import_from_dict(
-                self.service.execute_job_group(job_group.export_to_dict()))
+        def call(jobs):
+            return JobGroup.import_from_dict(
+                self.service.execute_job_group(
+                    JobGroup(jobs).export_to_dict()))
 
-        first_greenlet = gevent.spawn(first_call)
+        first_greenlet = gevent.spawn(call, jobs_a)
         gevent.sleep(0)  # To ensure we call jobgroup_a first.
+        second_greenlet = gevent.spawn(call, jobs_b)
+        gevent.sleep(0)
+        self.assertTrue(self.service.work_stats()["look_ahead_pending"])
 
         with self.assertRaises(JobException):
-            job_group = JobGroup([jobs_b[0]])
-            JobGroup.import_from_dict(
-                self.service.execute_job_group(job_group.export_to_dict()))
+            call(jobs_c)
 
         first_greenlet.get()
-        self.assertNotIn(calls_b[0],
+        self.assertTrue(second_greenlet.get().jobs[0].success)
+        self.assertNotIn(calls_c[0],
                          cms.service.Worker.get_task_type.mock_calls)
-        cms.service.Worker.get_task_type.assert_has_calls(calls_a)
+        cms.service.Worker.get_task_type.assert_has_calls(calls_a + calls_b)
+        self.assertEqual(task_type.call_count, 2)
+
+        stats = self.service.work_stats()
+        self.assertFalse(stats["look_ahead_pending"])
+        self.assertEqual(stats["job_groups"], 3)
+        self.assertGreater(stats["busy_time"], 0.0)
 
     def test_execute_job_failure_releases_lock(self):
         """After a failure, the worker should be able to accept another job.
@@ -249,6 +260,136 @@ class TestWorker(unittest.TestCase):
             JobGroup.import_from_dict(
                 self.service.execute_job_group(job_groups[0].export_to_dict()))
 
+    def test_execute_job_group_shared_context(self):
+        """Executes a job group whose jobs share their context.
+
+        """
+        jobs = [EvaluationJob(
+            ESOperation(ESOperation.EVALUATION, 1, 2, "%d" % i),
+            "fake_task_type", "fake_parameters", language="C",
+            managers={"checker": Manager("checker", "digest")},
+            input="input%d" % i, time_limit=1.5, info="%d" % i)
+            for i in range(3)]
+        jobs.append(EvaluationJob(
+            ESOperation(ESOperation.EVALUATION, 3, 2, "0"),
+            "fake_task_type", "fake_parameters", language="Java",
+            input="input0", time_limit=1.5, info="3"))
+        task_type = FakeTaskType([True] * len(jobs))
+        cms.service.Worker.get_task_type = Mock(return_value=task_type)
+        self.service.file_cacher = Mock()
+
+        job_group_dict = JobGroup(jobs).export_to_dict()
+        self.assertEqual(len(job_group_dict["contexts"]), 2)
+        self.assertEqual([job["context"] for job in job_group_dict["jobs"]],
+                         [0, 0, 0, 1])
+
+        result = JobGroup.import_from_dict(
+            self.service.execute_job_group(job_group_dict))
+        for job, original in zip(result.jobs, jobs):
+            self.assertTrue(job.success)
+            self.assertEqual(job.language, original.language)
+            self.assertEqual(job.input, original.input)
+            self.assertEqual(job.info, original.info)
+            self.assertEqual(job.time_limit, 1.5)
+            self.assertEqual(
+                {name: manager.digest
+                 for name, manager in job.managers.items()},
+                {name: manager.digest
+                 for name, manager in original.managers.items()})
+
+    def test_export_job_group_contexts(self):
+        """Exports jobs whose contexts differ only in one field.
+
+        """
+        jobs = [EvaluationJob(
+            ESOperation(ESOperation.EVALUATION, 1, 2, "%d" % i),
+            "fake_task_type", ["alone", ["", ""], "diff"], language="C",
+            input="input%d" % i, time_limit=time_limit, info="%d" % i)
+            for i, time_limit in enumerate([1.5, 1.5, 2.0])]
+
+        job_group_dict = JobGroup(jobs).export_to_dict()
+        self.assertEqual([context["time_limit"]
+                          for context in job_group_dict["contexts"]],
+                         [1.5, 2.0])
+        self.assertEqual([job["context"] for job in job_group_dict["jobs"]],
+                         [0, 0, 1])
+        self.assertNotIn("language", job_group_dict["jobs"][0])
+        self.assertEqual(
+            [job.export_to_dict() for job in
+             JobGroup.import_from_dict(job_group_dict).jobs],
+            [job.export_to_dict() for job in jobs])
+
+    def test_import_job_group_without_contexts(self):
+        """Imports a job group in the format without contexts.
+
+        """
+        jobs, unused_calls = TestWorker.new_jobs(2)
+        job_group = JobGroup.import_from_dict(
+            {"jobs": [job.export_to_dict() for job in jobs]})
+        self.assertEqual([job.info for job in job_group.jobs], ["0", "1"])
+
+    def compile(self, jobs):
+        """Execute compilation jobs whose compilation produces an
+        executable named after the job.
+
+        return: the executed jobs.
+
+        """
+        def compile_job(job, file_cacher):
+            job.success = True
+            job.compilation_success = True
+            job.text = ["OK"]
+            job.plus = {"execution_time": 0.5}
+            job.executables = {"exe": Executable("exe", job.info)}
+
+        task_type = Mock()
+        task_type.execute_job.side_effect = compile_job
+        cms.service.Worker.get_task_type = Mock(return_value=task_type)
+        self.service.file_cacher = Mock()
+
+        result = JobGroup.import_from_dict(self.service.execute_job_group(
+            JobGroup(jobs).export_to_dict()))
+        self.compile_count = task_type.execute_job.call_count
+        return result.jobs
+
+    @staticmethod
+    def new_compilation_job(i, source="source", archive_sandbox=False):
+        return CompilationJob(
+            ESOperation(ESOperation.COMPILATION, i, 2), "fake_task_type",
+            "fake_parameters", language="C", info="%d" % i,
+            files={"sol.%l": File("sol.%l", source)},
+            managers={"grader.c": Manager("grader.c", "grader")},
+            archive_sandbox=archive_sandbox)
+
+    def test_compilation_cache(self):
+        """Compiles the same sources twice, and different ones."""
+        jobs = self.compile([self.new_compilation_job(0),
+                             self.new_compilation_job(1),
+                             self.new_compilation_job(2, source="other")])
+
+        self.assertEqual(self.compile_count, 2)
+        self.assertEqual([job.executables["exe"].digest for job in jobs],
+                         ["0", "0", "2"])
+        for job in jobs:
+            self.assertTrue(job.success)
+            self.assertTrue(job.compilation_success)
+            self.assertEqual(job.text, ["OK"])
+        self.assertEqual(self.service.compilation_cache_stats(),
+                         {"size": 2, "max_size": 1000, "hits": 1,
+                          "misses": 2, "enabled": True})
+
+    def test_compilation_cache_archive_sandbox(self):
+        """Compiles again when the sandbox is to be archived."""
+        self.compile([self.new_compilation_job(0),
+                      self.new_compilation_job(1, archive_sandbox=True)])
+        self.assertEqual(self.compile_count, 2)
+
+    def test_compilation_cache_disabled(self):
+        with patch.object(config.worker, "compilation_cache", False):
+            self.compile([self.new_compilation_job(0),
+                          self.new_compilation_job(1)])
+        self.assertEqual(self.compile_count, 2)
+
     @staticmethod
     def new_jobs(number_of_jobs, prefix=None):
         prefix = prefix if prefix is not None else ""
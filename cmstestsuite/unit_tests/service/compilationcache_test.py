@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+
+# Contest Management System - http://cms-dev.github.io/
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests for the compilation cache of the workers.
+
+"""
+
+import unittest
+from unittest.mock import patch
+
+from cms.db import Executable, File, Manager
+from cms.grading.Job import CompilationJob
+from cms.grading.languagemanager import get_language
+from cms.service.compilationcache import CompilationCache
+from cms.service.esoperations import ESOperation
+
+
+class TestCompilationCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = CompilationCache(2)
+
+    @staticmethod
+    def job(source="source", language="C", grader="grader",
+            compilation_success=None):
+        job = CompilationJob(
+            ESOperation(ESOperation.COMPILATION, 1, 2), "Batch",
+            ["grader", ["", ""], "diff"], language=language,
+            files={"sol.%l": File("sol.%l", source)},
+            managers={"grader.%l": Manager("grader.%l", grader)})
+        if compilation_success is not None:
+            job.success = True
+            job.compilation_success = compilation_success
+            job.text = ["OK"]
+            job.plus = {"execution_time": 0.5}
+            job.executables = {"sol": Executable("sol", "executable")}
+        return job
+
+    def test_fill(self):
+        self.cache.add(self.job(compilation_success=True))
+        job = self.job()
+        self.assertTrue(self.cache.fill(job))
+        self.assertTrue(job.success)
+        self.assertTrue(job.compilation_success)
+        self.assertEqual(job.text, ["OK"])
+        self.assertEqual(job.plus, {"execution_time": 0.5})
+        self.assertEqual(job.executables["sol"].digest, "executable")
+
+    def test_different_key(self):
+        self.cache.add(self.job(compilation_success=True))
+        self.assertFalse(self.cache.fill(self.job(source="other")))
+        self.assertFalse(self.cache.fill(self.job(language="C++")))
+        self.assertFalse(self.cache.fill(self.job(grader="other")))
+        self.assertEqual(self.cache.get_status(),
+                         {"size": 1, "max_size": 2, "hits": 0, "misses": 3})
+
+    def test_compilation_commands(self):
+        language = get_language("C11 / gcc")
+        job = self.job(language=language.name, compilation_success=True)
+        self.cache.add(job)
+        self.assertTrue(self.cache.fill(self.job(language=language.name)))
+        # The compiler flags changed.
+        with patch.object(type(language), "get_compilation_commands",
+                          return_value=[["/usr/bin/gcc", "-O3"]]):
+            self.assertFalse(self.cache.fill(self.job(language=language.name)))
+
+    def test_only_successful(self):
+        self.cache.add(self.job(compilation_success=False))
+        self.assertEqual(len(self.cache), 0)
+
+    def test_least_recently_used(self):
+        for source in ["a", "b"]:
+            self.cache.add(self.job(source=source, compilation_success=True))
+        self.assertTrue(self.cache.fill(self.job(source="a")))
+        self.cache.add(self.job(source="c", compilation_success=True))
+        self.assertEqual(len(self.cache), 2)
+        self.assertFalse(self.cache.fill(self.job(source="b")))
+        self.assertTrue(self.cache.fill(self.job(source="a")))
+
+
+if __name__ == "__main__":
+    unittest.main()
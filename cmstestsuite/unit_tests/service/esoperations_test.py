@@ -239,6 +239,29 @@ class TestESOperations(DatabaseMixin, unittest.TestCase):
             set(get_submissions_operations(self.session, self.contest.id)),
             expected_operations)
 
+    def test_get_submissions_operations_since(self):
+        """Test looking only at new and pending submissions."""
+        old = self.add_submission(self.tasks[0], self.participation)
+        pending = self.add_submission(self.tasks[0], self.participation)
+        self.session.flush()
+        since_id = max(old.id, pending.id)
+        new = self.add_submission(self.tasks[0], self.participation)
+        self.session.flush()
+
+        expected_operations = set(
+            self.submission_compilation_operation(submission, dataset)
+            for submission in [pending, new]
+            for dataset in submission.task.datasets if self.to_judge(dataset))
+
+        self.assertEqual(
+            set(get_submissions_operations(
+                self.session, self.contest.id, since_id, [pending.id])),
+            expected_operations)
+        self.assertEqual(
+            set(get_submissions_operations(
+                self.session, self.contest.id, new.id)),
+            set())
+
     def submission_compilation_operation(
             self, submission, dataset, result=None):
         active_priority = PriorityQueue.PRIORITY_HIGH \
@@ -394,6 +417,27 @@ class TestESOperations(DatabaseMixin, unittest.TestCase):
             set(get_user_tests_operations(self.session, self.contest.id)),
             expected_operations)
 
+    def test_get_user_tests_operations_since(self):
+        """Test looking only at new and pending user tests."""
+        old, _ = self.add_user_test_with_results(True)
+        pending, results = self.add_user_test_with_results(True)
+        self.session.flush()
+        since_id = max(old.id, pending.id)
+        new = self.add_user_test(self.tasks[0], self.participation)
+        self.session.flush()
+
+        expected_operations = set(
+            self.user_test_evaluation_operation(result)
+            for result in results if self.to_judge(result.dataset))
+        expected_operations.update(
+            self.user_test_compilation_operation(new, dataset)
+            for dataset in new.task.datasets if self.to_judge(dataset))
+
+        self.assertEqual(
+            set(get_user_tests_operations(
+                self.session, self.contest.id, since_id, [pending.id])),
+            expected_operations)
+
     def user_test_compilation_operation(self, user_test, dataset, result=None):
         active_priority = PriorityQueue.PRIORITY_HIGH \
             if result is None or result.compilation_tries == 0 \
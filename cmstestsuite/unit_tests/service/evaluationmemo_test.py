@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+
+# Contest Management System - http://cms-dev.github.io/
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests for the memo of the evaluation results of ES.
+
+"""
+
+import unittest
+from unittest.mock import Mock, patch
+
+from cms.db import Executable, Manager
+from cms.grading.Job import EvaluationJob
+from cms.service.esoperations import ESOperation
+from cms.service.evaluationmemo import EvaluationMemo
+
+
+class TestEvaluationMemo(unittest.TestCase):
+
+    def setUp(self):
+        self.memo = EvaluationMemo()
+
+    @staticmethod
+    def job(submission_id=1, codename="000", executable="%040x" % 1,
+            time_limit=1.0, outcome="1.0"):
+        operation = ESOperation(ESOperation.EVALUATION, submission_id, 7,
+                                codename)
+        executables = {} if executable is None \
+            else {"batch": Executable("batch", executable)}
+        return EvaluationJob(
+            operation=operation, task_type="Batch",
+            task_type_parameters=["alone", ["", ""], "diff"],
+            language="C++17 / g++", shard=2, sandboxes=["/tmp/sandbox"],
+            managers={"checker": Manager("checker", "%040x" % 2)},
+            executables=executables, input="%040x" % 3, output="%040x" % 4,
+            time_limit=time_limit, memory_limit=256 * 1024 * 1024,
+            success=True, outcome=outcome, text=["Output is correct"],
+            plus={"execution_time": 0.5, "execution_memory": 1024})
+
+    def test_identical_executables(self):
+        self.memo.add(self.job(submission_id=1))
+        self.assertEqual(self.memo.get(self.job(submission_id=2)), {
+            "text": ["Output is correct"],
+            "outcome": "1.0",
+            "execution_time": 0.5,
+            "execution_wall_clock_time": None,
+            "execution_memory": 1024,
+        })
+        self.assertEqual(self.memo.get_status(),
+                         {"size": 1, "hits": 1, "misses": 0})
+
+    def test_different_key(self):
+        self.memo.add(self.job())
+        self.assertIsNone(self.memo.get(self.job(codename="001")))
+        self.assertIsNone(self.memo.get(self.job(executable="%040x" % 5)))
+        self.assertIsNone(self.memo.get(self.job(time_limit=2.0)))
+        self.assertEqual(self.memo.get_status(),
+                         {"size": 1, "hits": 0, "misses": 3})
+
+    def test_no_executables(self):
+        self.memo.add(self.job(executable=None))
+        self.assertEqual(len(self.memo), 0)
+        self.assertIsNone(self.memo.get(self.job(executable=None)))
+
+    def test_latest_result(self):
+        self.memo.add(self.job(outcome="0.0"))
+        self.memo.add(self.job(outcome="1.0"))
+        self.assertEqual(self.memo.get(self.job())["outcome"], "1.0")
+
+    def test_least_recently_used(self):
+        with patch.object(EvaluationMemo, "MAX_SIZE", 2):
+            for codename in ["000", "001"]:
+                self.memo.add(self.job(codename=codename))
+            self.memo.get(self.job(codename="000"))
+            self.memo.add(self.job(codename="002"))
+        self.assertEqual(len(self.memo), 2)
+        self.assertIsNone(self.memo.get(self.job(codename="001")))
+        self.assertIsNotNone(self.memo.get(self.job(codename="000")))
+
+    def test_enabled_for(self):
+        dataset = Mock(task_type="Batch", deduplicate_evaluations=True)
+        self.assertTrue(EvaluationMemo.enabled_for(dataset))
+        dataset.deduplicate_evaluations = False
+        self.assertFalse(EvaluationMemo.enabled_for(dataset))
+        self.assertFalse(EvaluationMemo.enabled_for(
+            Mock(task_type="OutputOnly", deduplicate_evaluations=True)))
+        self.assertFalse(EvaluationMemo.enabled_for(
+            Mock(task_type="Unknown", deduplicate_evaluations=True)))
+
+
+if __name__ == "__main__":
+    unittest.main()
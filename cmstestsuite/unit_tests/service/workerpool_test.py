@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+
+# Contest Management System - http://cms-dev.github.io/
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests for the worker pool of ES.
+
+"""
+
+import unittest
+from datetime import datetime
+from unittest.mock import Mock, patch
+
+from cms import ServiceCoord, config
+from cms.service.esoperations import ESOperation
+from cms.service.workerpool import WorkerPool
+
+
+class WorkerPoolMixin:
+
+    def setUp(self):
+        self.service = Mock(contest_id=None)
+        self.service.connect_to.side_effect = \
+            lambda coord, on_connect: Mock(connected=True)
+        self.pool = WorkerPool(self.service)
+        for shard in range(3):
+            self.pool.add_worker(ServiceCoord("Worker", shard))
+
+        for target in ["SessionGen", "JobGroup"]:
+            patcher = patch("cms.service.workerpool.%s" % target)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        # Workers execute one group at a time, except in the tests
+        # about look-ahead.
+        patcher = patch.object(config.evaluation_service,
+                               "worker_look_ahead", False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @staticmethod
+    def operation(i):
+        return ESOperation(ESOperation.EVALUATION, i, 1, "%03d" % i)
+
+    def assertStatus(self, inactive, busy, disabled):
+        self.assertEqual(self.pool._inactive, set(inactive))
+        self.assertEqual(self.pool._busy, set(busy))
+        self.assertEqual(self.pool._disabled, set(disabled))
+        for shard in inactive:
+            self.assertIs(self.pool._operations[shard],
+                          WorkerPool.WORKER_INACTIVE)
+        for shard in busy:
+            self.assertIsInstance(self.pool._operations[shard], list)
+        for shard in disabled:
+            self.assertEqual(self.pool._operations[shard],
+                             WorkerPool.WORKER_DISABLED)
+
+
+class TestWorkerPool(WorkerPoolMixin, unittest.TestCase):
+
+    def test_acquire_release(self):
+        shards = [self.pool.acquire_worker([self.operation(i)])
+                  for i in range(3)]
+        self.assertCountEqual(shards, range(3))
+        self.assertStatus([], range(3), [])
+        self.assertIn(self.operation(0), self.pool)
+
+        # No workers left.
+        self.assertIsNone(self.pool.acquire_worker([self.operation(3)]))
+
+        self.pool.release_worker(shards[0])
+        self.assertStatus([shards[0]], shards[1:], [])
+        self.assertNotIn(self.operation(0), self.pool)
+        self.assertEqual(
+            self.pool.acquire_worker([self.operation(3)]), shards[0])
+
+    def test_acquire_only_connected(self):
+        self.pool._worker[0].connected = False
+        self.pool._worker[2].connected = False
+        self.assertEqual(self.pool.acquire_worker([self.operation(0)]), 1)
+        self.assertIsNone(self.pool.acquire_worker([self.operation(1)]))
+        self.assertStatus([0, 2], [1], [])
+
+    def test_disable_enable(self):
+        shard = self.pool.acquire_worker([self.operation(0)])
+        self.assertEqual(self.pool.disable_worker(shard), [self.operation(0)])
+        self.pool.disable_worker((shard + 1) % 3)
+        self.assertStatus([(shard + 2) % 3], [],
+                          [shard, (shard + 1) % 3])
+        self.assertEqual(self.pool.find_worker(WorkerPool.WORKER_DISABLED,
+                                               random_worker=False),
+                         min(shard, (shard + 1) % 3))
+
+        self.pool.enable_worker(shard)
+        self.assertStatus([shard, (shard + 2) % 3], [], [(shard + 1) % 3])
+
+    def test_check_connections(self):
+        busy = self.pool.acquire_worker([self.operation(0)])
+        self.pool._worker[busy].connected = False
+        self.pool._worker[(busy + 1) % 3].connected = False
+
+        self.assertEqual(self.pool.check_connections(), [self.operation(0)])
+        self.assertStatus(range(3), [], [])
+
+    def test_affinity(self):
+        # Each worker gets a different submission.
+        shards = [self.pool.acquire_worker([self.operation(i)])
+                  for i in range(3)]
+        for shard in shards:
+            self.pool.release_worker(shard)
+
+        # Operations go to the worker that had their submission.
+        for i in [2, 0, 1]:
+            operation = ESOperation(ESOperation.EVALUATION, i, 1, "other")
+            self.assertEqual(self.pool.acquire_worker([operation]),
+                             shards[i])
+
+        status = self.pool.get_status()
+        for shard in shards:
+            self.assertEqual(status["%d" % shard]["affinity"],
+                             {"operations": 2, "object_hits": 1,
+                              "dataset_hits": 1})
+
+    def test_affinity_prefers_submission_to_dataset(self):
+        shard = self.pool.acquire_worker([
+            ESOperation(ESOperation.EVALUATION, 1, 1, "000"),
+            ESOperation(ESOperation.EVALUATION, 2, 1, "000")])
+        other_shard = self.pool.acquire_worker([
+            ESOperation(ESOperation.EVALUATION, 3, 2, "000")])
+        self.pool.release_worker(shard)
+        self.pool.release_worker(other_shard)
+
+        self.assertEqual(self.pool.acquire_worker([
+            ESOperation(ESOperation.EVALUATION, 3, 1, "001")]), other_shard)
+
+    def test_affinity_only_inactive(self):
+        shard = self.pool.acquire_worker([self.operation(0)])
+        self.assertNotEqual(self.pool.acquire_worker([self.operation(0)]),
+                            shard)
+
+    def test_affinity_memory(self):
+        shard = self.pool.acquire_worker([
+            ESOperation(ESOperation.EVALUATION, i, i, "000")
+            for i in range(WorkerPool.AFFINITY_MEMORY)])
+        self.assertEqual(len(self.pool._affinity[shard]),
+                         WorkerPool.AFFINITY_MEMORY)
+        self.assertNotIn(("submission", 0), self.pool._affinity[shard])
+        self.assertIn(("dataset", WorkerPool.AFFINITY_MEMORY - 1),
+                      self.pool._affinity[shard])
+
+
+class TestWorkerPoolLookAhead(WorkerPoolMixin, unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        patcher = patch.object(config.evaluation_service,
+                               "worker_look_ahead", True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.shards = [self.pool.acquire_worker([self.operation(i)])
+                       for i in range(3)]
+        for i, shard in enumerate(self.shards):
+            self.pool._start_time[shard] = datetime(2026, 1, 1, 0, 0, i)
+
+    def test_look_ahead(self):
+        # Busy workers get the operations to do next, the one that
+        # started first first.
+        look_ahead = [self.pool.acquire_worker([self.operation(i)])
+                      for i in range(3, 6)]
+        self.assertEqual(look_ahead, self.shards)
+        self.assertIsNone(self.pool.acquire_worker([self.operation(6)]))
+        self.assertIn(self.operation(3), self.pool)
+        self.assertEqual(
+            self.pool.get_status()["%d" % self.shards[0]]["look_ahead"],
+            [self.operation(3).to_dict()])
+
+        # On release, the worker goes on with the look-ahead.
+        self.assertFalse(self.pool.release_worker(self.shards[0]))
+        self.assertNotIn(self.operation(0), self.pool)
+        self.assertIn(self.operation(3), self.pool)
+        self.assertEqual(self.pool._operations[self.shards[0]],
+                         [self.operation(3)])
+        self.assertIsNone(self.pool._look_ahead[self.shards[0]])
+        self.assertStatus([], self.shards, [])
+
+        self.pool.release_worker(self.shards[0])
+        self.assertStatus([self.shards[0]], self.shards[1:], [])
+        self.assertNotIn(self.operation(3), self.pool)
+
+    def test_look_ahead_ignore(self):
+        shard = self.shards[0]
+        self.pool.acquire_worker([self.operation(3), self.operation(4)])
+        self.pool.ignore_operation(self.operation(0))
+        self.pool.ignore_operation(self.operation(4))
+
+        self.assertEqual(self.pool.release_worker(shard), [self.operation(0)])
+        self.assertEqual(self.pool.release_worker(shard), [self.operation(4)])
+
+    def test_look_ahead_lost(self):
+        shard = self.shards[0]
+        self.pool.acquire_worker([self.operation(3)])
+        self.pool._worker[shard].connected = False
+
+        self.assertCountEqual(self.pool.check_connections(),
+                              [self.operation(0), self.operation(3)])
+        self.assertNotIn(self.operation(3), self.pool)
+        self.assertIsNone(self.pool._look_ahead[shard])
+
+    def test_look_ahead_disable(self):
+        shard = self.shards[0]
+        self.pool.acquire_worker([self.operation(3)])
+
+        self.assertEqual(self.pool.disable_worker(shard),
+                         [self.operation(0), self.operation(3)])
+        self.assertNotIn(self.operation(3), self.pool)
+        # Both results are ignored.
+        self.assertTrue(self.pool.release_worker(shard))
+        self.assertTrue(self.pool.release_worker(shard))
+
+
+if __name__ == "__main__":
+    unittest.main()